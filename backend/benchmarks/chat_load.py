@@ -0,0 +1,456 @@
+"""Load test of the chat WebSocket against a running API.
+
+Opens authenticated connections to `/api/chat/ws`, with the access token as
+second WebSocket subprotocol like the frontend does, in growing steps, e.g.
+10, then 50, then 100 connections. In every step each connection sends
+`--rate` messages per second for `--duration` seconds. Every message is
+broadcast to all connections, so it is expected `clients` times. For each
+step the report contains:
+- The fan-out latency percentiles, from sending a message until a
+  connection receives it.
+- The messages that were never received, and connections that failed.
+- The CPU utilisation and resident memory of the server, read from its
+  /metrics endpoint, so they only cover the worker that answers the
+  scrape. Run the server with one worker for meaningful numbers.
+
+All connections run in this one process. If its own CPU is saturated, the
+latencies include the client's delays, so watch it with `top` at large
+steps.
+
+The accounts are created for real and named after the run, e.g.
+`chat_1a2b3c_17`, so use a test database. The chat is keyed by the name of
+the user, so every account gets a distinct one.
+
+`--output` writes the report as JSON. `--baseline` prints the change of the
+p99 latency, the drops and the server CPU per step against an earlier
+report, e.g. of the previous release.
+
+Requires httpx and websockets (`pip install httpx websockets`).
+
+Usage (from the backend directory, with the API running):
+    python -m benchmarks.chat_load --clients 10 50 100 --rate 0.5
+    python -m benchmarks.chat_load --output chat.json --baseline old.json
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import time
+
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+import httpx
+import websockets
+
+PASSWORD = "load-test-password"
+
+
+class StepStats:
+    """Messages sent and received during one step.
+
+    Attributes:
+        step (int): Number of the step, part of every message.
+        sent (int): Messages sent.
+        received (int): Copies of the step's messages received.
+        latencies (List[float]): Fan-out latency of every received copy.
+    """
+
+    def __init__(self, step: int) -> None:
+        """Start counting a step.
+
+        Args:
+            step (int): Number of the step.
+        """
+        self.step = step
+        self.sent = 0
+        self.received = 0
+        self.latencies: List[float] = []
+
+
+class ChatClient:
+    """One authenticated chat connection.
+
+    Attributes:
+        number (int): Number of the client, part of its messages.
+        token (str): Access token of its account.
+        run_id (str): Id of the run, filters foreign messages.
+        connection (Any): The open WebSocket.
+        stats (Optional[StepStats]): Counters of the running step.
+        _reader (Optional[asyncio.Task]): Task receiving the broadcasts.
+    """
+
+    def __init__(self, number: int, token: str, run_id: str) -> None:
+        """Create the client, it connects with `connect`.
+
+        Args:
+            number (int): Number of the client.
+            token (str): Access token.
+            run_id (str): Id of the run.
+        """
+        self.number = number
+        self.token = token
+        self.run_id = run_id
+        self.connection: Any = None
+        self.stats: Optional[StepStats] = None
+        self._reader: Optional[asyncio.Task] = None
+
+
+    async def connect(self, url: str) -> None:
+        """Open the WebSocket and start receiving.
+
+        Args:
+            url (str): URL of the chat WebSocket.
+        """
+        self.connection = await websockets.connect(
+            url, subprotocols=["authorization", self.token],
+            max_queue=None,
+        )
+        self._reader = asyncio.create_task(self._read())
+
+
+    async def send(self, seq: int) -> None:
+        """Send a timestamped message.
+
+        Args:
+            seq (int): Number of the message within the step.
+        """
+        stats = self.stats
+        text = (f"{self.run_id}:{stats.step}:{self.number}:{seq}:"
+                f"{time.perf_counter()}")
+        await self.connection.send(json.dumps({"message": text}))
+        stats.sent += 1
+
+
+    async def close(self) -> None:
+        """Close the WebSocket."""
+        if self._reader is not None:
+            self._reader.cancel()
+
+        if self.connection is not None:
+            await self.connection.close()
+
+
+    async def _read(self) -> None:
+        """Count the received messages of the running step."""
+        async for raw in self.connection:
+            now = time.perf_counter()
+            parts = json.loads(raw).get("message", "").split(":")
+            stats = self.stats
+
+            if (len(parts) != 5 or parts[0] != self.run_id or stats is None
+                    or int(parts[1]) != stats.step):
+                continue
+
+            stats.received += 1
+            stats.latencies.append(now - float(parts[4]))
+
+
+async def create_accounts(client: httpx.AsyncClient, run_id: str,
+                          count: int, concurrency: int) -> List[str]:
+    """Register and log in the accounts of the run.
+
+    Args:
+        client (httpx.AsyncClient): Client of the API.
+        run_id (str): Id of the run.
+        count (int): Number of accounts.
+        concurrency (int): Maximum requests in flight.
+
+    Returns:
+        List[str]: Their access tokens.
+    """
+    limit = asyncio.Semaphore(concurrency)
+
+    async def create(number: int) -> str:
+        username = f"chat_{run_id}_{number}"
+        email = f"{username}@example.com"
+
+        async with limit:
+            response = await client.post("/api/auth/register", json={
+                "username": username,
+                "email": email,
+                "password": PASSWORD,
+                "name": username,
+                "surname": "Load",
+            })
+            response.raise_for_status()
+            response = await client.post("/api/auth/login", json={
+                "email": email,
+                "password": PASSWORD,
+            })
+            response.raise_for_status()
+
+        return response.json()["accessToken"]
+
+    return await asyncio.gather(*(create(number) for number in range(count)))
+
+
+async def scrape(client: httpx.AsyncClient) -> Dict[str, float]:
+    """Read the process metrics of the server.
+
+    Args:
+        client (httpx.AsyncClient): Client of the API.
+
+    Returns:
+        Dict[str, float]: Metric name -> value, empty if unavailable.
+    """
+    try:
+        response = await client.get("/metrics")
+        response.raise_for_status()
+    except httpx.HTTPError:
+        return {}
+
+    values = {}
+
+    for line in response.text.splitlines():
+        if line.startswith("process_"):
+            name, value = line.split(" ", 1)
+            values[name] = float(value)
+
+    return values
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Return the value below which the fraction of the values fall.
+
+    Args:
+        values (List[float]): Sorted values.
+        fraction (float): Wanted fraction, between 0 and 1.
+
+    Returns:
+        float: The percentile.
+    """
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+async def run_step(clients: List[ChatClient], step: int,
+                   args: argparse.Namespace) -> StepStats:
+    """Let every client send messages for the duration of the step.
+
+    Args:
+        clients (List[ChatClient]): The connected clients.
+        step (int): Number of the step.
+        args (argparse.Namespace): Parsed command line arguments.
+
+    Returns:
+        StepStats: The counters of the step.
+    """
+    stats = StepStats(step)
+
+    for client in clients:
+        client.stats = stats
+
+    interval = 1 / args.rate
+    count = int(args.duration * args.rate)
+
+    async def send_all(client: ChatClient) -> None:
+        # Spread the clients over the interval instead of sending in bursts.
+        await asyncio.sleep(interval * client.number / len(clients))
+
+        for seq in range(count):
+            await client.send(seq)
+            await asyncio.sleep(interval)
+
+    await asyncio.gather(*(send_all(client) for client in clients))
+    await asyncio.sleep(args.drain)
+
+    return stats
+
+
+def summarize(clients: int, stats: StepStats, failures: int,
+              elapsed: float, before: Dict[str, float],
+              after: Dict[str, float]) -> Dict[str, Any]:
+    """Build the report entry of a step.
+
+    Args:
+        clients (int): Connected clients.
+        stats (StepStats): Counters of the step.
+        failures (int): Connections that could not be opened.
+        elapsed (float): Wall time of the step in seconds.
+        before (Dict[str, float]): Server metrics before the step.
+        after (Dict[str, float]): Server metrics after the step.
+
+    Returns:
+        Dict[str, Any]: The entry.
+    """
+    latencies = sorted(stats.latencies)
+    expected = stats.sent * clients
+    entry: Dict[str, Any] = {
+        "clients": clients,
+        "connect_failures": failures,
+        "sent": stats.sent,
+        "expected": expected,
+        "received": stats.received,
+        "dropped": expected - stats.received,
+        "latency_ms": {},
+        "server_cpu": None,
+        "server_rss_mb": None,
+    }
+
+    if latencies:
+        entry["latency_ms"] = {
+            name: round(percentile(latencies, fraction) * 1000, 3)
+            for name, fraction in (("p50", 0.50), ("p90", 0.90),
+                                   ("p99", 0.99), ("max", 1.0))
+        }
+
+    cpu = "process_cpu_seconds_total"
+
+    if cpu in before and cpu in after:
+        entry["server_cpu"] = round((after[cpu] - before[cpu]) / elapsed, 3)
+
+    rss = after.get("process_resident_memory_bytes")
+
+    if rss is not None:
+        entry["server_rss_mb"] = round(rss / 2**20, 1)
+
+    return entry
+
+
+def print_entry(entry: Dict[str, Any]) -> None:
+    """Print one step of the report.
+
+    Args:
+        entry (Dict[str, Any]): The step.
+    """
+    latency = entry["latency_ms"]
+    print(f"{entry['clients']:6d} clients: "
+          f"p50 {latency.get('p50', 0):8.2f} ms  "
+          f"p99 {latency.get('p99', 0):8.2f} ms  "
+          f"max {latency.get('max', 0):8.2f} ms  "
+          f"dropped {entry['dropped']}/{entry['expected']}  "
+          f"failed {entry['connect_failures']}  "
+          f"cpu {entry['server_cpu']}  rss {entry['server_rss_mb']} MiB")
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Print the change of every step against the baseline.
+
+    Args:
+        report (Dict[str, Any]): The current report.
+        baseline (Dict[str, Any]): The earlier report.
+    """
+    before = {entry["clients"]: entry for entry in baseline["steps"]}
+    print(f"\nCompared with the run from {baseline['meta']['created_at']}:")
+
+    for entry in report["steps"]:
+        old = before.get(entry["clients"])
+
+        if old is None:
+            continue
+
+        changes = []
+
+        for label, new_value, old_value in (
+            ("p99", entry["latency_ms"].get("p99"),
+             old["latency_ms"].get("p99")),
+            ("cpu", entry["server_cpu"], old["server_cpu"]),
+        ):
+            if new_value is not None and old_value:
+                changes.append(
+                    f"{label} {(new_value / old_value - 1) * 100:+.1f} %")
+
+        changes.append(f"dropped {old['dropped']} -> {entry['dropped']}")
+        print(f"{entry['clients']:6d} clients: " + ", ".join(changes))
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run all steps.
+
+    Args:
+        args (argparse.Namespace): Parsed command line arguments.
+
+    Returns:
+        Dict[str, Any]: The report.
+    """
+    run_id = uuid4().hex[:6]
+    ws_url = args.url.replace("http", "ws", 1) + "/api/chat/ws"
+    steps = sorted(args.clients)
+    clients: List[ChatClient] = []
+    failures = 0
+    report: Dict[str, Any] = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "url": args.url,
+            "rate": args.rate,
+            "duration": args.duration,
+            "python": platform.python_version(),
+        },
+        "steps": [],
+    }
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as http:
+        tokens = await create_accounts(http, run_id, steps[-1],
+                                       args.concurrency)
+
+        try:
+            for step, count in enumerate(steps):
+                new = [ChatClient(number, tokens[number], run_id)
+                       for number in range(len(clients), count)]
+                results = await asyncio.gather(
+                    *(client.connect(ws_url) for client in new),
+                    return_exceptions=True,
+                )
+
+                for client, result in zip(new, results):
+                    if isinstance(result, Exception):
+                        failures += 1
+                    else:
+                        clients.append(client)
+
+                # Let the server register the new connections.
+                await asyncio.sleep(1)
+
+                before = await scrape(http)
+                start = time.perf_counter()
+                stats = await run_step(clients, step, args)
+                elapsed = time.perf_counter() - start
+                after = await scrape(http)
+
+                entry = summarize(len(clients), stats, failures, elapsed,
+                                  before, after)
+                report["steps"].append(entry)
+                print_entry(entry)
+        finally:
+            await asyncio.gather(*(client.close() for client in clients),
+                                 return_exceptions=True)
+
+    return report
+
+
+def main() -> None:
+    """Parse the arguments, run the load test and compare the report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000",
+                        help="base URL of the API")
+    parser.add_argument("--clients", type=int, nargs="+",
+                        default=[10, 50, 100, 200],
+                        help="connections of each step")
+    parser.add_argument("--rate", type=float, default=0.5,
+                        help="messages per second of every connection")
+    parser.add_argument("--duration", type=float, default=10,
+                        help="seconds every step sends messages")
+    parser.add_argument("--drain", type=float, default=2,
+                        help="seconds to wait for late messages after a "
+                             "step")
+    parser.add_argument("--concurrency", type=int, default=20,
+                        help="maximum registrations in flight")
+    parser.add_argument("--output", help="write the report to this file")
+    parser.add_argument("--baseline", help="compare with this report")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            compare(report, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Load test of concurrent registrations against a running API.
+
+Every simulated user is registered several times at once, some attempts
+with the same username and email, others with only the same email. Exactly
+one attempt per user has to succeed with 201, all others have to fail with
+409, which only holds if the unique indexes, not lookups before the insert,
+reject the duplicates.
+
+The accounts are created for real and named after the run, e.g.
+`load_1a2b3c_17`, so use a test database.
+
+Requires httpx (`pip install httpx`).
+
+Usage (from the backend directory, with the API running):
+    python -m benchmarks.registration --users 100 --attempts 4
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from collections import Counter
+from typing import List, Tuple
+from uuid import uuid4
+
+import httpx
+
+
+async def register(
+    client: httpx.AsyncClient,
+    limit: asyncio.Semaphore,
+    username: str,
+    email: str,
+) -> Tuple[int, str, float]:
+    """Send one registration.
+
+    Args:
+        client (httpx.AsyncClient): Client of the API.
+        limit (asyncio.Semaphore): Bounds the requests in flight.
+        username (str): Username of the new account.
+        email (str): Email of the new account.
+
+    Returns:
+        Tuple[int, str, float]: Status code, error detail and latency in
+        seconds.
+    """
+    body = {
+        "username": username,
+        "email": email,
+        "password": "load-test-password",
+        "name": "Load",
+        "surname": "Test",
+    }
+
+    async with limit:
+        start = time.perf_counter()
+        response = await client.post("/api/auth/register", json=body)
+        latency = time.perf_counter() - start
+
+    detail = ""
+
+    if response.status_code != 201:
+        detail = response.json().get("detail", "")
+
+    return response.status_code, str(detail), latency
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Return the value below which the fraction of the values fall.
+
+    Args:
+        values (List[float]): Sorted values.
+        fraction (float): Wanted fraction, between 0 and 1.
+
+    Returns:
+        float: The percentile.
+    """
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+async def run(args: argparse.Namespace) -> bool:
+    """Fire all registrations and print the results.
+
+    Args:
+        args (argparse.Namespace): Parsed command line arguments.
+
+    Returns:
+        bool: True if exactly one registration per user succeeded.
+    """
+    run_id = uuid4().hex[:6]
+    limit = asyncio.Semaphore(args.concurrency)
+    requests = []
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        for user in range(args.users):
+            email = f"load_{run_id}_{user}@example.com"
+
+            for attempt in range(args.attempts):
+                # Odd attempts only collide on the email.
+                username = f"load_{run_id}_{user}"
+
+                if attempt % 2:
+                    username += f"_{attempt}"
+
+                requests.append(register(client, limit, username, email))
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*requests)
+        elapsed = time.perf_counter() - start
+
+    statuses = Counter(status for status, _, _ in results)
+    details = Counter(detail for _, detail, _ in results if detail)
+    latencies = sorted(latency for _, _, latency in results)
+
+    print(f"{len(results)} registrations of {args.users} users in "
+          f"{elapsed:.2f} s ({len(results) / elapsed:.0f} req/s)")
+    print("statuses: " + ", ".join(f"{status}: {count}" for status, count
+                                   in sorted(statuses.items())))
+
+    for detail, count in details.most_common():
+        print(f"  {count:6d} x {detail}")
+
+    print(f"latency: mean {statistics.mean(latencies) * 1000:.1f} ms, "
+          f"p50 {percentile(latencies, 0.50) * 1000:.1f} ms, "
+          f"p95 {percentile(latencies, 0.95) * 1000:.1f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms")
+
+    expected_conflicts = args.users * (args.attempts - 1)
+    ok = (statuses[201] == args.users
+          and statuses[409] == expected_conflicts)
+
+    if not ok:
+        print(f"FAILED: expected {args.users} x 201 and "
+              f"{expected_conflicts} x 409")
+
+    return ok
+
+
+def main() -> None:
+    """Parse the arguments and run the load test."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000",
+                        help="base URL of the API")
+    parser.add_argument("--users", type=int, default=50,
+                        help="number of distinct accounts")
+    parser.add_argument("--attempts", type=int, default=4,
+                        help="concurrent registrations per account")
+    parser.add_argument("--concurrency", type=int, default=100,
+                        help="maximum requests in flight")
+    args = parser.parse_args()
+
+    if not asyncio.run(run(args)):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
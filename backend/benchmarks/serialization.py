@@ -0,0 +1,151 @@
+"""Benchmark of the idea list serialization paths.
+
+Compares the way `GET /api/ideas` used to build its body, validating every
+document into `IdeaGet` and letting FastAPI validate and serialize the list
+again, with the trusted path that reads the documents into plain dicts and
+encodes them directly, and with the streaming path that keeps the documents
+as raw BSON until the projected fields are encoded. No database is needed,
+the documents are generated and encoded to BSON, and every path decodes them
+like the driver would.
+
+Usage (from the backend directory):
+    python -m benchmarks.serialization --count 10000
+"""
+
+import argparse
+import bson
+import json
+import timeit
+import tracemalloc
+
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+from pydantic import TypeAdapter
+from typing import List
+
+from internals.serialization import TrustedReader, dumps, orjson
+from models.idea import IdeaGet
+
+IDEA_LIST_ADAPTER = TypeAdapter(List[IdeaGet])
+READER = TrustedReader(IdeaGet)
+
+
+def make_documents(count: int) -> List[bytes]:
+    """Generate idea documents encoded as BSON.
+
+    Args:
+        count (int): Number of documents.
+
+    Returns:
+        List[bytes]: The documents.
+    """
+    return [
+        bson.encode({
+            "_id": ObjectId(),
+            "title": f"Idea number {i}",
+            "userId": str(ObjectId()),
+            "author": "benchmark",
+            "description": "A short description of the idea. " * 4,
+            "likedByUser": [str(ObjectId()) for _ in range(i % 8)],
+        })
+        for i in range(count)
+    ]
+
+
+def validated_path(docs: List[bytes]) -> bytes:
+    """Build the body like `get_all_ideas` and FastAPI's response_model do.
+
+    Args:
+        docs (List[bytes]): BSON documents.
+
+    Returns:
+        bytes: Response body.
+    """
+    ideas = [IdeaGet.model_validate(bson.decode(doc)) for doc in docs]
+    ideas = IDEA_LIST_ADAPTER.validate_python(ideas)
+    content = IDEA_LIST_ADAPTER.dump_python(ideas, mode="json", by_alias=True)
+
+    return json.dumps(content, ensure_ascii=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def trusted_path(docs: List[bytes]) -> bytes:
+    """Build the body like `get_all_ideas_trusted` and `dumps` do.
+
+    Args:
+        docs (List[bytes]): BSON documents.
+
+    Returns:
+        bytes: Response body.
+    """
+    return dumps([READER(bson.decode(doc)) for doc in docs])
+
+
+def streaming_path(docs: List[bytes], chunk_size: int = 500) -> bytes:
+    """Build the body like `stream_json_array` does.
+
+    The chunks are joined here to compare the bodies, so the measured peak
+    memory includes the whole output, unlike a real streamed response.
+
+    Args:
+        docs (List[bytes]): BSON documents.
+        chunk_size (int): Documents per chunk.
+
+    Returns:
+        bytes: All the chunks joined.
+    """
+    chunks = []
+    chunk = []
+
+    for doc in docs:
+        chunk.append(dumps(READER(bson.decode(RawBSONDocument(doc).raw))))
+
+        if len(chunk) == chunk_size:
+            chunks.append(b",".join(chunk))
+            chunk = []
+
+    if chunk:
+        chunks.append(b",".join(chunk))
+
+    return b"[" + b",".join(chunks) + b"]"
+
+
+def main() -> None:
+    """Run the benchmark and print the timings."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=10000,
+                        help="number of generated ideas")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="number of timed runs, the best one is shown")
+    args = parser.parse_args()
+
+    docs = make_documents(args.count)
+
+    expected = json.loads(validated_path(docs))
+
+    if any(json.loads(path(docs)) != expected
+           for path in (trusted_path, streaming_path)):
+        raise SystemExit("The paths produce different bodies")
+
+    print(f"{args.count} ideas, encoder: {'orjson' if orjson else 'json'}")
+
+    baseline = None
+
+    for name, path in (("validated", validated_path),
+                       ("trusted", trusted_path),
+                       ("streaming", streaming_path)):
+        best = min(timeit.repeat(lambda: path(docs), number=1,
+                                 repeat=args.repeat))
+        baseline = baseline or best
+
+        tracemalloc.start()
+        path(docs)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        print(f"{name:>10}: {best * 1000:8.2f} ms  ({baseline / best:.1f}x)"
+              f"  peak {peak / 2**20:7.2f} MiB")
+
+
+if __name__ == "__main__":
+    main()
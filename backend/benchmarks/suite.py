@@ -0,0 +1,538 @@
+"""Benchmark suite of the hot paths, with a JSON report and baseline check.
+
+Cases without a database run everywhere:
+- `startup.*`: a fresh interpreter doing nothing, importing `main` and
+  also building the app with `create_app`, the cold start of a worker.
+- `validate.*`: Pydantic validation of `Idea` and `IdeaGet` documents.
+- `auth.decode_token`: JWT decoding done for every authenticated request.
+- `upload.save`: copying an uploaded image to disk.
+
+Cases with a database run against the STORAGE_BACKEND setting. With
+"mongo" they need a reachable mongod at `MONGODB_URI` and are reported as
+skipped otherwise, with "memory" they run without any service:
+- `get_all_ideas[N]`: reading all ideas for every size of `--sizes`.
+- `like_unlike`: the like and unlike round-trip of one idea.
+- `auth.get_current_user`: token decoding plus the user lookup.
+- `upload.request`: `POST /api/upload-images/{idea_id}` through the app.
+
+With MongoDB they seed and finally drop the `MONGODB_DB` database, which
+defaults to "brain_bridge_bench" here. Never point it at real data. Reports
+of the two backends measure different things, so do not compare them.
+
+Every case reports the median and best seconds per call over `--repeat`
+runs, and items per second where a call handles several items. `--output`
+writes the report as JSON. `--baseline` compares the medians with an earlier
+report and exits with 1 if a case got slower by more than `--threshold`.
+`--save-baseline` writes the report as the new baseline, e.g. to
+`benchmarks/baseline.json`. Baselines are machine specific, so compare
+only reports taken on the same machine.
+
+Usage (from the backend directory):
+    python -m benchmarks.suite --output report.json
+    python -m benchmarks.suite --baseline benchmarks/baseline.json
+    python -m benchmarks.suite --only validation --save-baseline base.json
+"""
+
+import os
+
+# The crud modules bind their repositories on import, so the database has to
+# be chosen first.
+os.environ.setdefault("MONGODB_DB", "brain_bridge_bench")
+
+import argparse
+import asyncio
+import inspect
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bson import ObjectId
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List
+
+from models.idea import Idea, IdeaGet
+from repositories import uses_memory
+from settings import Settings
+
+APP_DATABASE = "brain_bridge"
+IMAGE_SIZE = 256 * 1024
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+settings = Settings()
+
+
+def make_idea(number: int) -> Dict[str, Any]:
+    """Generate an idea document like the ones stored in MongoDB.
+
+    Args:
+        number (int): Number of the idea, varies the number of likes.
+
+    Returns:
+        Dict[str, Any]: The document.
+    """
+    return {
+        "_id": ObjectId(),
+        "title": f"Idea number {number}",
+        "userId": str(ObjectId()),
+        "author": "benchmark",
+        "description": "A short description of the idea. " * 4,
+        "longDescription": "A longer description of the idea. " * 20,
+        "links": [{"url": "https://example.com", "text": "Example"}],
+        "wantedContributors": "Anyone",
+        "images": [],
+        "likedByUser": [str(ObjectId()) for _ in range(number % 8)],
+    }
+
+
+class Bench:
+    """Runs the timed calls and collects the results.
+
+    Attributes:
+        repeat (int): Timed runs per measurement.
+        results (Dict[str, Dict[str, Any]]): Case name -> result.
+    """
+
+    def __init__(self, repeat: int) -> None:
+        """Create an empty collection of results.
+
+        Args:
+            repeat (int): Timed runs per measurement.
+        """
+        self.repeat = repeat
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+
+    async def measure(
+        self,
+        name: str,
+        function: Callable[[], Any],
+        number: int = 1,
+        items: int = 1,
+    ) -> None:
+        """Time the function and store the result under the name.
+
+        Args:
+            name (str): Name of the case.
+            function (Callable[[], Any]): Function without arguments, its
+            result is awaited if it is awaitable.
+            number (int): Calls per timed run.
+            items (int): Items one call handles, for the throughput.
+        """
+        timings = []
+
+        # One untimed call warms up caches, connections and lazy imports.
+        await self._call(function)
+
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+
+            for _ in range(number):
+                await self._call(function)
+
+            timings.append((time.perf_counter() - start) / number)
+
+        median = statistics.median(timings)
+        self.results[name] = {
+            "median": median,
+            "best": min(timings),
+            "items_per_second": items / median if median else None,
+        }
+        print(f"{name:>32}: {median * 1000:10.3f} ms"
+              f"  (best {min(timings) * 1000:.3f} ms)")
+
+
+    def skip(self, name: str, reason: str) -> None:
+        """Record a case that could not run.
+
+        Args:
+            name (str): Name of the case.
+            reason (str): Why it was skipped.
+        """
+        self.results[name] = {"skipped": reason}
+        print(f"{name:>32}: skipped, {reason}")
+
+
+    @staticmethod
+    async def _call(function: Callable[[], Any]) -> None:
+        """Call the function, awaiting its result if needed.
+
+        Args:
+            function (Callable[[], Any]): Function to call.
+        """
+        result = function()
+
+        if inspect.isawaitable(result):
+            await result
+
+
+async def bench_startup(bench: Bench, args: argparse.Namespace) -> None:
+    """Start fresh interpreters importing the app.
+
+    Args:
+        bench (Bench): Collects the results.
+        args (argparse.Namespace): Parsed command line arguments.
+    """
+    scripts = {
+        "startup.interpreter": "pass",
+        "startup.import_main": "import main",
+        "startup.create_app": "import main; main.create_app()",
+    }
+
+    for name, script in scripts.items():
+        command = [sys.executable, "-c", script]
+
+        await bench.measure(name, lambda: asyncio.to_thread(
+            subprocess.run, command, cwd=BACKEND_DIR, check=True,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        ))
+
+
+async def bench_validation(bench: Bench, args: argparse.Namespace) -> None:
+    """Validate generated documents into `Idea` and `IdeaGet`.
+
+    Args:
+        bench (Bench): Collects the results.
+        args (argparse.Namespace): Parsed command line arguments.
+    """
+    docs = [make_idea(number) for number in range(1000)]
+
+    for model in (Idea, IdeaGet):
+        await bench.measure(
+            f"validate.{model.__name__}[1000]",
+            lambda: [model.model_validate(doc) for doc in docs],
+            items=len(docs),
+        )
+
+
+async def bench_decode_token(bench: Bench, args: argparse.Namespace) -> None:
+    """Decode an access token like `get_current_user` does.
+
+    Args:
+        bench (Bench): Collects the results.
+        args (argparse.Namespace): Parsed command line arguments.
+    """
+    from internals.auth import create_token, decode_token
+
+    token = create_token({"sub": "bench@example.com", "type": "access"})
+    await bench.measure("auth.decode_token", lambda: decode_token(token),
+                        number=1000)
+
+
+async def bench_save_upload(bench: Bench, args: argparse.Namespace) -> None:
+    """Copy an uploaded image to disk like `upload_image` does.
+
+    Args:
+        bench (Bench): Collects the results.
+        args (argparse.Namespace): Parsed command line arguments.
+    """
+    from routers.uploads import _save_upload
+
+    image = os.urandom(IMAGE_SIZE)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "image.png")
+
+        await bench.measure(
+            "upload.save",
+            lambda: asyncio.to_thread(_save_upload, io.BytesIO(image), path),
+            number=20,
+            items=IMAGE_SIZE,
+        )
+
+
+async def bench_get_all_ideas(bench: Bench, args: argparse.Namespace) -> None:
+    """Read all ideas for every size, seeding the collection up to it.
+
+    Args:
+        bench (Bench): Collects the results.
+        args (argparse.Namespace): Parsed command line arguments.
+    """
+    from crud.ideas import get_all_ideas, ideas
+
+    await ideas.clear()
+    seeded = 0
+
+    for size in sorted(args.sizes):
+        while seeded < size:
+            batch = min(size - seeded, 10000)
+            await ideas.insert_many(
+                [make_idea(seeded + number) for number in range(batch)])
+            seeded += batch
+
+        await bench.measure(f"get_all_ideas[{size}]", get_all_ideas,
+                            items=size)
+
+
+async def bench_like_unlike(bench: Bench, args: argparse.Namespace) -> None:
+    """Like and unlike one idea.
+
+    Args:
+        bench (Bench): Collects the results.
+        args (argparse.Namespace): Parsed command line arguments.
+    """
+    from crud.ideas import ideas, like_idea, unlike_idea
+
+    doc = make_idea(0)
+    await ideas.insert(doc)
+    idea_id = str(doc["_id"])
+    user_id = str(ObjectId())
+
+    async def round_trip() -> None:
+        await like_idea(idea_id, user_id)
+        await unlike_idea(idea_id, user_id)
+
+    await bench.measure("like_unlike", round_trip, number=20)
+
+
+async def bench_current_user(bench: Bench, args: argparse.Namespace) -> None:
+    """Authenticate a request with `get_current_user`.
+
+    Args:
+        bench (Bench): Collects the results.
+        args (argparse.Namespace): Parsed command line arguments.
+    """
+    from fastapi.security import HTTPAuthorizationCredentials
+
+    from crud.user import users
+    from internals.auth import create_token, get_current_user
+
+    email = f"bench_{ObjectId()}@example.com"
+    await users.insert({
+        "username": f"bench_{ObjectId()}",
+        "email": email,
+        "password": "not-a-hash",
+        "name": "Bench",
+        "surname": "Mark",
+        "isAdmin": False,
+    })
+    credentials = HTTPAuthorizationCredentials(
+        scheme="Bearer",
+        credentials=create_token({"sub": email, "type": "access"}),
+    )
+
+    await bench.measure("auth.get_current_user",
+                        lambda: get_current_user(credentials), number=50)
+
+
+async def bench_upload_request(bench: Bench,
+                               args: argparse.Namespace) -> None:
+    """Upload an image through the application.
+
+    Args:
+        bench (Bench): Collects the results.
+        args (argparse.Namespace): Parsed command line arguments.
+    """
+    import httpx
+
+    from crud.ideas import ideas
+    from main import create_app
+    from routers.uploads import UPLOAD_DIR
+
+    doc = make_idea(0)
+    await ideas.insert(doc)
+    files = [("images", ("image.png", os.urandom(IMAGE_SIZE), "image/png"))]
+    # The transport does not run the lifespan, which creates the directory.
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    transport = httpx.ASGITransport(app=create_app())
+
+    async with httpx.AsyncClient(transport=transport,
+                                 base_url="http://bench") as client:
+        async def upload() -> None:
+            response = await client.post(
+                f"/api/upload-images/{doc['_id']}", files=files)
+            response.raise_for_status()
+
+        await bench.measure("upload.request", upload, number=10,
+                            items=IMAGE_SIZE)
+
+    # Every upload replaces the images of the idea, so only the files of the
+    # last one are still referenced.
+    stored = await ideas.get(doc["_id"])
+
+    for path in stored.get("images", []):
+        os.remove(path)
+
+
+Case = Callable[[Bench, argparse.Namespace], Awaitable[None]]
+
+CASES: List[Case] = [bench_startup, bench_validation, bench_decode_token,
+                     bench_save_upload]
+DB_CASES: List[Case] = [bench_get_all_ideas, bench_like_unlike,
+                        bench_current_user, bench_upload_request]
+
+
+async def database_available() -> bool:
+    """Check if mongod answers within a second.
+
+    Returns:
+        bool: True if the database can be used.
+    """
+    from pymongo import AsyncMongoClient
+    from pymongo.errors import PyMongoError
+
+    client = AsyncMongoClient(settings.MONGODB_URI,
+                              serverSelectionTimeoutMS=1000)
+
+    try:
+        await client.admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+    finally:
+        await client.close()
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the selected cases.
+
+    Args:
+        args (argparse.Namespace): Parsed command line arguments.
+
+    Returns:
+        Dict[str, Any]: The report.
+    """
+    bench = Bench(args.repeat)
+
+    def selected(case: Case) -> bool:
+        return not args.only or any(name in case.__name__
+                                    for name in args.only)
+
+    for case in filter(selected, CASES):
+        await case(bench, args)
+
+    db_cases = list(filter(selected, DB_CASES))
+
+    if uses_memory():
+        for case in db_cases:
+            await case(bench, args)
+
+        return {"meta": metadata(args), "results": bench.results}
+
+    if db_cases and settings.MONGODB_DB == APP_DATABASE:
+        raise SystemExit(f"Refusing to seed the '{APP_DATABASE}' database, "
+                         "set MONGODB_DB to a scratch database")
+
+    if db_cases and await database_available():
+        from crud.mongodb_connector import MongoDBConnector
+
+        connector = MongoDBConnector()
+
+        try:
+            for case in db_cases:
+                await case(bench, args)
+        finally:
+            await connector.get_db().client.drop_database(
+                settings.MONGODB_DB)
+            await connector.close()
+    else:
+        for case in db_cases:
+            bench.skip(case.__name__.removeprefix("bench_"),
+                       f"no mongod at {settings.MONGODB_URI}")
+
+    return {"meta": metadata(args), "results": bench.results}
+
+
+def metadata(args: argparse.Namespace) -> Dict[str, Any]:
+    """Describe the environment of the run.
+
+    Args:
+        args (argparse.Namespace): Parsed command line arguments.
+
+    Returns:
+        Dict[str, Any]: Time, commit, interpreter, machine and storage
+        backend.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "repeat": args.repeat,
+        "storage": settings.STORAGE_BACKEND,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any],
+            threshold: float) -> List[str]:
+    """Compare the medians of the report with the baseline.
+
+    Args:
+        report (Dict[str, Any]): The current report.
+        baseline (Dict[str, Any]): The earlier report.
+        threshold (float): Allowed slowdown, 0.1 for 10 %.
+
+    Returns:
+        List[str]: Names of the cases that got slower than allowed.
+    """
+    regressions = []
+    print(f"\nCompared with {baseline['meta'].get('commit')} "
+          f"from {baseline['meta'].get('created_at')}:")
+
+    for name, result in report["results"].items():
+        before = baseline["results"].get(name, {}).get("median")
+
+        if before is None or "median" not in result:
+            continue
+
+        change = result["median"] / before - 1
+        regressed = change > threshold
+
+        if regressed:
+            regressions.append(name)
+
+        print(f"{name:>32}: {change * 100:+7.1f} %"
+              + ("  REGRESSION" if regressed else ""))
+
+    return regressions
+
+
+def main() -> None:
+    """Parse the arguments, run the suite and check the baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="timed runs per case, the median is compared")
+    parser.add_argument("--sizes", type=lambda value: [
+                            int(size) for size in value.split(",")],
+                        default=[1000, 10000, 100000],
+                        help="comma separated collection sizes of "
+                             "get_all_ideas")
+    parser.add_argument("--only", nargs="*", default=[],
+                        help="run only cases whose name contains one of "
+                             "these, e.g. validation like")
+    parser.add_argument("--output", help="write the report to this file")
+    parser.add_argument("--baseline", help="compare with this report")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="allowed slowdown against the baseline")
+    parser.add_argument("--save-baseline",
+                        help="write the report as baseline to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Command line tool granting and revoking the admin rights of users.
+
+Usage (from the backend directory):
+    python -m cli.admin grant alice@example.com
+    python -m cli.admin revoke alice@example.com
+
+Registration never creates admins, this is the only way to get one. The
+memory storage backend is refused, its users only exist inside the API
+process.
+"""
+
+import argparse
+import asyncio
+import sys
+
+from crud.mongodb_connector import MongoDBConnector
+from crud.user import set_admin
+from repositories import uses_memory
+
+
+async def run(email: str, is_admin: bool) -> bool:
+    """Change the admin rights of the user.
+
+    Args:
+        email (str): Email of the user.
+        is_admin (bool): Whether the user is an admin afterwards.
+
+    Returns:
+        bool: False if there is no user with the email.
+    """
+    try:
+        user = await set_admin(email, is_admin)
+    finally:
+        await MongoDBConnector().close()
+
+    return user is not None
+
+
+def main() -> None:
+    """Parse the arguments and change the admin rights."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=("grant", "revoke"))
+    parser.add_argument("email", help="email of the user")
+    args = parser.parse_args()
+
+    if uses_memory():
+        parser.error("STORAGE_BACKEND=memory has no users outside of the "
+                     "API process")
+
+    if not asyncio.run(run(args.email, args.command == "grant")):
+        print(f"No user with the email {args.email}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
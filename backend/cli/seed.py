@@ -0,0 +1,558 @@
+"""Command line tool filling the database with a synthetic dataset.
+
+Usage (from the backend directory):
+    python -m cli.seed --users 100000 --ideas 1000000 --comments 2000000
+    python -m cli.seed --seed 7 --end 2025-01-01 --drop
+
+Generates users, ideas with links and long descriptions, likes and comment
+threads, validates every document with the models of the API and writes
+them with unordered `insert_many` batches of the repositories, `--parallel`
+of them at a time. The memory storage backend is refused, the dataset would
+be gone when the command exits.
+
+Popularity follows a Zipf distribution: the idea of rank k gets a share of
+the likes and comments proportional to 1 / k^s, with s given by `--zipf`.
+Likes of one idea are capped at `--max-likes` to keep the documents small.
+Every comment replies to an earlier comment of the same idea with the
+probability `--reply-rate`, and its id is appended to the `replies` of that
+comment.
+
+The same `--seed` and `--end` produce the same documents, ids included, only
+the sync versions depend on the versions already reserved in the database.
+The ids carry the creation time, spread over the `--days` before `--end`.
+Likes and comments happen at random times after their idea was created, the
+likes are recorded in `likedAt`. The trending score of every idea is computed
+from these events, like the API scores them as they happen, and every batch
+of ideas reserves its own block of sync versions. All users share the
+password "seed-password". The password is hashed once, so the accounts can
+be used to log in.
+
+Afterwards the indexes are created. The in-memory indexes of a running API
+do not see the documents, so restart it or use the /api/admin endpoints.
+"""
+
+import argparse
+import asyncio
+import random
+import struct
+import sys
+import time
+
+from bson import ObjectId
+from datetime import datetime, timezone
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from crud.comments import comments, create_indexes as create_comment_indexes
+from crud.ideas import (
+    create_indexes as create_idea_indexes,
+    ideas,
+    reserve_sync_versions,
+)
+from crud.mongodb_connector import MongoDBConnector
+from crud.user import create_indexes as create_user_indexes, users
+from internals.auth import get_password_hash
+from internals.trending import (
+    COMMENT_WEIGHT,
+    LIKE_WEIGHT,
+    SCORE_FIELD,
+    add_event,
+    creation_score,
+)
+from internals.versions import IDEAS_SCOPE, versions
+from models.comment import Comment
+from models.idea import Idea
+from models.user import User
+from repositories import uses_memory
+
+PASSWORD = "seed-password"
+WORDS = (
+    "app", "platform", "community", "local", "open", "smart", "green",
+    "energy", "garden", "market", "learning", "students", "music", "city",
+    "bike", "food", "sharing", "repair", "library", "health", "tool",
+    "volunteer", "data", "map", "game", "workshop", "network", "hub",
+    "recycling", "tutoring", "events", "neighbours", "river", "solar",
+)
+FIRST_NAMES = ("Anna", "Jan", "Maria", "Piotr", "Kasia", "Tomasz", "Ola",
+               "Marek", "Ewa", "Adam", "Zofia", "Paweł", "Julia", "Kuba")
+SURNAMES = ("Nowak", "Kowalski", "Wiśniewska", "Wójcik", "Kamińska",
+            "Lewandowski", "Zielińska", "Szymański", "Woźniak", "Dąbrowska")
+ROLES = ("Frontend developer", "Backend developer", "Designer",
+         "Marketing", "Anyone interested", "Data scientist", "Mentor")
+# Kinds of documents, part of the ids so they never collide.
+USER_KIND, IDEA_KIND, COMMENT_KIND = 1, 2, 3
+
+Document = Dict[str, Any]
+
+
+class Generator:
+    """Deterministic source of the synthetic documents.
+
+    Attributes:
+        rng (random.Random): The only source of randomness.
+        end (datetime): Latest creation time.
+        span (int): Seconds the creation times are spread over.
+    """
+
+    def __init__(self, seed: int, end: datetime, days: int) -> None:
+        """Create the generator.
+
+        Args:
+            seed (int): Seed of the random numbers.
+            end (datetime): Latest creation time.
+            days (int): Days before `end` the documents are created in.
+        """
+        self.rng = random.Random(seed)
+        self.end = end
+        self.span = days * 24 * 3600
+
+
+    def timestamp(self, after: Optional[ObjectId] = None) -> int:
+        """Return a random time in the span.
+
+        Args:
+            after (Optional[ObjectId]): Document created before the time.
+
+        Returns:
+            int: Seconds since the Unix epoch.
+        """
+        end = int(self.end.timestamp())
+        start = end - self.span
+
+        if after is not None:
+            start = int(after.generation_time.timestamp())
+
+        return self.rng.randint(start, end)
+
+
+    def object_id(self, kind: int, number: int,
+                  created: Optional[int] = None) -> ObjectId:
+        """Build a reproducible id.
+
+        Args:
+            kind (int): Kind of the document.
+            number (int): Number of the document within its kind.
+            created (Optional[int]): Creation time in seconds since the Unix
+            epoch, a random time in the span by default.
+
+        Returns:
+            ObjectId: 4 bytes creation time, then the kind and the number.
+        """
+        if created is None:
+            created = self.timestamp()
+
+        return ObjectId(struct.pack(">IBxxxI", created, kind, number))
+
+
+    def sentence(self, words: int) -> str:
+        """Return a sentence of random words.
+
+        Args:
+            words (int): Number of words.
+
+        Returns:
+            str: The sentence.
+        """
+        text = " ".join(self.rng.choice(WORDS) for _ in range(words))
+
+        return text.capitalize() + "."
+
+
+    def paragraph(self, sentences: int) -> str:
+        """Return a paragraph of random sentences.
+
+        Args:
+            sentences (int): Number of sentences.
+
+        Returns:
+            str: The paragraph.
+        """
+        return " ".join(self.sentence(self.rng.randint(6, 16))
+                        for _ in range(sentences))
+
+
+def zipf_weights(count: int, exponent: float, rng: random.Random
+                 ) -> List[float]:
+    """Return Zipf weights summing to 1 in a random order.
+
+    Args:
+        count (int): Number of weights.
+        exponent (float): Exponent s of the distribution.
+        rng (random.Random): Shuffles the ranks.
+
+    Returns:
+        List[float]: Weight of every item.
+    """
+    ranks = list(range(1, count + 1))
+    rng.shuffle(ranks)
+    weights = [rank ** -exponent for rank in ranks]
+    total = sum(weights)
+
+    return [weight / total for weight in weights]
+
+
+def spread(total: int, weights: List[float], cap: int,
+           rng: random.Random) -> List[int]:
+    """Split the total by the weights, rounding randomly.
+
+    Args:
+        total (int): Amount to split.
+        weights (List[float]): Share of every item, summing to 1.
+        cap (int): Maximum amount of one item.
+        rng (random.Random): Rounds the fractional parts.
+
+    Returns:
+        List[int]: Amount of every item.
+    """
+    amounts = []
+
+    for weight in weights:
+        exact = total * weight
+        amount = int(exact) + (rng.random() < exact - int(exact))
+        amounts.append(min(amount, cap))
+
+    return amounts
+
+
+def generate_users(gen: Generator, count: int, password: str
+                   ) -> Iterator[Document]:
+    """Generate the users.
+
+    Args:
+        gen (Generator): Source of randomness.
+        count (int): Number of users.
+        password (str): Hash of the shared password.
+
+    Yields:
+        Document: The users.
+    """
+    for number in range(count):
+        user = User(
+            username=f"user_{number}",
+            email=f"user_{number}@example.com",
+            password=password,
+            name=gen.rng.choice(FIRST_NAMES),
+            surname=gen.rng.choice(SURNAMES),
+        )
+        doc = user.model_dump(by_alias=True, exclude={"id"})
+        doc["_id"] = gen.object_id(USER_KIND, number)
+
+        yield doc
+
+
+def generate_ideas(
+    gen: Generator,
+    count: int,
+    authors: List[Tuple[str, str]],
+    likes: List[int],
+    comment_counts: List[int],
+    comment_times: Dict[ObjectId, List[int]],
+) -> Iterator[Document]:
+    """Generate the ideas with the times of their likes and comments and the
+    trending score of these events.
+
+    Args:
+        gen (Generator): Source of randomness.
+        count (int): Number of ideas.
+        authors (List[Tuple[str, str]]): Id and username of every user.
+        likes (List[int]): Number of likes of every idea.
+        comment_counts (List[int]): Number of comments of every idea.
+        comment_times (Dict[ObjectId, List[int]]): Filled with the sorted
+        creation times of the comments of every idea, in seconds.
+
+    Yields:
+        Document: The ideas.
+    """
+    user_ids = [user_id for user_id, _ in authors]
+
+    for number in range(count):
+        user_id, username = gen.rng.choice(authors)
+        idea = Idea(
+            title=gen.sentence(gen.rng.randint(2, 6))[:-1],
+            user_id=user_id,
+            author=username,
+            description=gen.paragraph(gen.rng.randint(1, 3)),
+            long_description=gen.paragraph(gen.rng.randint(5, 20)),
+            links=[
+                {"url": f"https://example.com/{number}/{link}",
+                 "text": gen.sentence(2)[:-1]}
+                for link in range(gen.rng.randint(0, 4))
+            ],
+            wanted_contributors=gen.rng.choice(ROLES),
+            liked_by_user=gen.rng.sample(user_ids, likes[number]),
+        )
+        doc = idea.model_dump(by_alias=True, exclude={"id"})
+        doc["_id"] = gen.object_id(IDEA_KIND, number)
+        created = doc["_id"].generation_time
+        doc["likedAt"] = {
+            user_id: datetime.fromtimestamp(gen.timestamp(doc["_id"]),
+                                            timezone.utc)
+            for user_id in doc["likedByUser"]
+        }
+        times = sorted(gen.timestamp(doc["_id"])
+                       for _ in range(comment_counts[number]))
+        comment_times[doc["_id"]] = times
+
+        score = creation_score(created)
+
+        for when in doc["likedAt"].values():
+            score = add_event(score, LIKE_WEIGHT, when)
+
+        for when in times:
+            score = add_event(score, COMMENT_WEIGHT,
+                              datetime.fromtimestamp(when, timezone.utc))
+
+        doc[SCORE_FIELD] = score
+        doc["updatedAt"] = created
+
+        yield doc
+
+
+def generate_comments(gen: Generator,
+                      comment_times: Dict[ObjectId, List[int]],
+                      authors: List[Tuple[str, str]],
+                      reply_rate: float) -> Iterator[Document]:
+    """Generate the comment threads of every idea.
+
+    Args:
+        gen (Generator): Source of randomness.
+        comment_times (Dict[ObjectId, List[int]]): Sorted creation times of
+        the comments of every idea, in seconds.
+        authors (List[Tuple[str, str]]): Id and username of every user.
+        reply_rate (float): Probability that a comment is a reply.
+
+    Yields:
+        Document: The comments, each thread once its replies are known.
+    """
+    number = 0
+
+    for idea_id, times in comment_times.items():
+        thread: List[Document] = []
+
+        for created in times:
+            user_id, username = gen.rng.choice(authors)
+            comment = Comment(
+                user_id=user_id,
+                username=username,
+                content=gen.paragraph(gen.rng.randint(1, 4)),
+                idea_id=idea_id,
+            )
+            doc = comment.model_dump(by_alias=True, exclude={"id"})
+            doc["_id"] = gen.object_id(COMMENT_KIND, number, created)
+            number += 1
+
+            if thread and gen.rng.random() < reply_rate:
+                gen.rng.choice(thread)["replies"].append(str(doc["_id"]))
+
+            thread.append(doc)
+
+        yield from thread
+
+
+async def insert_all(
+    name: str,
+    repository: Any,
+    docs: Iterator[Document],
+    batch_size: int,
+    parallel: int,
+    prepare: Optional[Callable[[List[Document]], Awaitable[None]]] = None,
+) -> int:
+    """Insert the documents in batches, several batches at a time.
+
+    Args:
+        name (str): Name of the documents in the progress output.
+        repository (Any): Target repository.
+        docs (Iterator[Document]): The documents.
+        batch_size (int): Documents per `insert_many`.
+        parallel (int): Batches in flight.
+        prepare (Optional[Callable[[List[Document]], Awaitable[None]]]):
+        Called with every batch right before it is inserted.
+
+    Returns:
+        int: Number of inserted documents.
+    """
+    limit = asyncio.Semaphore(parallel)
+    pending: Set[asyncio.Task] = set()
+    inserted = 0
+    batches = 0
+    start = time.perf_counter()
+
+    async def insert(batch: List[Document]) -> None:
+        nonlocal inserted
+
+        try:
+            if prepare is not None:
+                await prepare(batch)
+
+            await repository.insert_many(batch)
+            inserted += len(batch)
+        finally:
+            limit.release()
+
+    batch: List[Document] = []
+
+    for doc in docs:
+        batch.append(doc)
+
+        if len(batch) < batch_size:
+            continue
+
+        # Generating the next batch overlaps with the inserts in flight.
+        await limit.acquire()
+        task = asyncio.create_task(insert(batch))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+        batch = []
+        batches += 1
+
+        if batches % 100 == 0:
+            rate = inserted / (time.perf_counter() - start)
+            print(f"  {name}: {inserted} ({rate:.0f}/s)",
+                  file=sys.stderr)
+
+    if batch:
+        await limit.acquire()
+        pending.add(asyncio.create_task(insert(batch)))
+
+    # Raises the first failed insert.
+    await asyncio.gather(*pending)
+
+    return inserted
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Generate and insert the dataset.
+
+    Args:
+        args (argparse.Namespace): Parsed command line arguments.
+    """
+    gen = Generator(args.seed, args.end, args.days)
+
+    if args.drop:
+        for repository in (users, ideas, comments):
+            await repository.clear()
+
+    password = get_password_hash(PASSWORD)
+    authors: List[Tuple[str, str]] = []
+
+    def collect_authors() -> Iterator[Document]:
+        for doc in generate_users(gen, args.users, password):
+            authors.append((str(doc["_id"]), doc["username"]))
+            yield doc
+
+    start = time.perf_counter()
+    count = await insert_all("users", users, collect_authors(),
+                             args.batch_size, args.parallel)
+    print(f"{count} users in {time.perf_counter() - start:.1f} s",
+          file=sys.stderr)
+
+    popularity = zipf_weights(args.ideas, args.zipf, gen.rng)
+    likes = spread(args.likes, popularity, min(args.max_likes, args.users),
+                   gen.rng)
+    comment_counts = spread(args.comments, popularity, args.comments,
+                            gen.rng)
+    comment_times: Dict[ObjectId, List[int]] = {}
+
+    async def add_sync_versions(batch: List[Document]) -> None:
+        first = await reserve_sync_versions(len(batch))
+
+        for i, doc in enumerate(batch):
+            doc["syncVersion"] = first + i
+
+    start = time.perf_counter()
+    count = await insert_all(
+        "ideas",
+        ideas,
+        generate_ideas(gen, args.ideas, authors, likes, comment_counts,
+                       comment_times),
+        args.batch_size,
+        args.parallel,
+        add_sync_versions,
+    )
+    # Running API workers must not keep answering 304 with the old list.
+    await versions.bump(IDEAS_SCOPE)
+    print(f"{count} ideas with {sum(likes)} likes in "
+          f"{time.perf_counter() - start:.1f} s", file=sys.stderr)
+
+    start = time.perf_counter()
+    count = await insert_all(
+        "comments",
+        comments,
+        generate_comments(gen, comment_times, authors, args.reply_rate),
+        args.batch_size,
+        args.parallel,
+    )
+    print(f"{count} comments in {time.perf_counter() - start:.1f} s",
+          file=sys.stderr)
+
+    start = time.perf_counter()
+    await create_user_indexes()
+    await create_idea_indexes()
+    await create_comment_indexes()
+    print(f"Indexes in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+
+
+def parse_date(value: str) -> datetime:
+    """Parse an ISO date as midnight UTC.
+
+    Args:
+        value (str): Date like 2025-01-01.
+
+    Returns:
+        datetime: The date.
+    """
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+
+
+def main() -> None:
+    """Parse the arguments and seed the database."""
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0,
+                                               microsecond=0)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--ideas", type=int, default=100000)
+    parser.add_argument("--likes", type=int, default=500000,
+                        help="total likes over all ideas")
+    parser.add_argument("--comments", type=int, default=300000)
+    parser.add_argument("--zipf", type=float, default=1.1,
+                        help="exponent of the popularity distribution")
+    parser.add_argument("--max-likes", type=int, default=10000,
+                        help="maximum likes of one idea")
+    parser.add_argument("--reply-rate", type=float, default=0.3,
+                        help="probability that a comment is a reply")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--end", type=parse_date, default=today,
+                        help="latest creation date, today by default")
+    parser.add_argument("--days", type=int, default=365,
+                        help="days before --end the documents are created")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--parallel", type=int, default=4,
+                        help="insert_many batches in flight")
+    parser.add_argument("--drop", action="store_true",
+                        help="delete the users, ideas and comments first")
+    args = parser.parse_args()
+
+    if uses_memory():
+        parser.error("STORAGE_BACKEND=memory keeps nothing after the "
+                     "command exits, seed a MongoDB database")
+
+    async def seed() -> None:
+        try:
+            await run(args)
+        finally:
+            await MongoDBConnector().close()
+
+    asyncio.run(seed())
+
+
+if __name__ == "__main__":
+    main()
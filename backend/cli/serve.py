@@ -0,0 +1,293 @@
+"""Production entry point serving the API from one or more worker processes.
+
+Usage (from the backend directory):
+    python -m cli.serve
+    python -m cli.serve --host 127.0.0.1 --port 8080 --workers 4
+
+- Starts SERVER_WORKERS workers, one by default, 0 for one per CPU core
+  available to the process, as limited by its affinity mask and its cgroup
+  CPU quota. Every worker is a fresh interpreter building the app with
+  `main.create_app`, so it opens its own database connections. A worker
+  that dies is replaced.
+- Uses uvloop and httptools when they are installed, asyncio and h11
+  otherwise.
+- Keeps idle connections open for SERVER_KEEP_ALIVE_SECONDS, longer than the
+  idle timeout of the load balancer in front (60 seconds on most), so the
+  balancer never sends a request on a connection the server is closing. Up
+  to SERVER_BACKLOG connections wait to be accepted, as far as the
+  net.core.somaxconn limit of the kernel allows.
+- Writes no access log, the slow request log of `internals.latency` covers
+  the requests worth reading.
+
+On SIGTERM or SIGINT every worker:
+1. Stops accepting connections.
+2. Sends the pending realtime events and closes the event WebSockets with
+   1012 (service restart), so clients reconnect to another instance.
+3. Lets in-flight requests finish, closing their connections afterwards,
+   and closes the chat WebSockets with 1012. Requests still running after
+   SHUTDOWN_TIMEOUT_SECONDS are cancelled.
+4. Shuts the app down: running jobs get JOB_DRAIN_SECONDS before they are
+   put back into the queue, the search index snapshot is saved and the
+   database connections are closed.
+
+The grace period of the process manager, e.g. terminationGracePeriodSeconds
+of Kubernetes, has to be longer than SHUTDOWN_TIMEOUT_SECONDS plus
+JOB_DRAIN_SECONDS.
+
+More than one worker is only safe for read-mostly deployments, since part of
+the state lives in the memory of each worker and only the worker handling a
+write updates its own copy:
+- The idea cache keeps serving an idea another worker changed until it is
+  evicted.
+- The full-text search and typeahead indexes miss the ideas and users other
+  workers created, renamed or deleted until the next restart.
+- The realtime events and the chat only reach the WebSockets connected to
+  the worker that handled the write.
+The ETags of the listings are safe, their versions are stored in the
+database. The memory storage backend always runs a single worker.
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import logging
+import math
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import uvicorn
+
+from typing import Any, Dict, List, Optional
+
+from repositories import uses_memory
+from settings import Settings
+
+logger = logging.getLogger("uvicorn.error")
+
+# Share of the shutdown timeout spent sending the pending realtime events.
+EVENT_DRAIN_SECONDS = 1.0
+
+# Seconds between two checks of the supervisor for dead workers.
+SUPERVISE_INTERVAL_SECONDS = 0.5
+
+
+def available_cores() -> int:
+    """Count the CPU cores the process may use.
+
+    Returns:
+        int: Cores of the affinity mask, limited by the cgroup v2 CPU quota
+        of a container.
+    """
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+
+    try:
+        with open("/sys/fs/cgroup/cpu.max", encoding="utf-8") as file:
+            quota, period = file.read().split()
+    except (OSError, ValueError):
+        return cores
+
+    if quota == "max":
+        return cores
+
+    return max(1, min(cores, math.ceil(int(quota) / int(period))))
+
+
+def listen_backlog(requested: int) -> int:
+    """Limit the backlog to the maximum of the kernel.
+
+    Larger values are silently truncated by the kernel.
+
+    Args:
+        requested (int): Wanted number of waiting connections.
+
+    Returns:
+        int: The backlog passed to listen.
+    """
+    try:
+        with open("/proc/sys/net/core/somaxconn", encoding="utf-8") as file:
+            limit = int(file.read())
+    except (OSError, ValueError):
+        return requested
+
+    if requested > limit:
+        logger.warning("Backlog %d exceeds net.core.somaxconn, using %d",
+                       requested, limit)
+        return limit
+
+    return requested
+
+
+def _installed(module: str) -> bool:
+    """Check whether a module can be imported, without importing it.
+
+    Args:
+        module (str): Name of the module.
+
+    Returns:
+        bool: True if the module is installed.
+    """
+    return importlib.util.find_spec(module) is not None
+
+
+class DrainingServer(uvicorn.Server):
+    """Uvicorn server sending the pending realtime events before it closes
+    the connections on shutdown.
+    """
+
+    async def shutdown(self,
+                       sockets: Optional[List[socket.socket]] = None) -> None:
+        """Stop accepting connections, end the event subscriptions, then
+        drain the connections and shut the app down.
+
+        Args:
+            sockets (Optional[List[socket.socket]]): Listening sockets.
+        """
+        for server in self.servers:
+            server.close()
+
+        for sock in sockets or []:
+            sock.close()
+
+        # Imported by the app, which is loaded by now.
+        from internals.events import event_bus
+
+        # The events are sent within the shutdown timeout.
+        timeout = self.config.timeout_graceful_shutdown
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        if timeout is None:
+            await event_bus.close(EVENT_DRAIN_SECONDS)
+        else:
+            await event_bus.close(min(EVENT_DRAIN_SECONDS, timeout))
+            self.config.timeout_graceful_shutdown = max(
+                timeout - (loop.time() - started), 0)
+
+        await super().shutdown(sockets)
+
+
+def serve(options: Dict[str, Any],
+          sockets: Optional[List[socket.socket]] = None) -> None:
+    """Run one server until it receives a stop signal.
+
+    Args:
+        options (Dict[str, Any]): Keyword arguments of `uvicorn.Config`.
+        sockets (Optional[List[socket.socket]]): Listening sockets shared by
+        the workers, None to bind them.
+    """
+    DrainingServer(uvicorn.Config(**options)).run(sockets=sockets)
+
+
+def supervise(options: Dict[str, Any], workers: int) -> None:
+    """Run the workers on one listening socket until a stop signal.
+
+    The signal is passed on to the workers as SIGTERM, and the supervisor
+    returns once all of them drained and exited.
+
+    Args:
+        options (Dict[str, Any]): Keyword arguments of `uvicorn.Config`.
+        workers (int): Number of worker processes.
+    """
+    sock = uvicorn.Config(**options).bind_socket()
+    # Spawned workers import the app themselves instead of inheriting the
+    # state of the supervisor.
+    context = multiprocessing.get_context("spawn")
+    stop = threading.Event()
+
+    def start() -> multiprocessing.process.BaseProcess:
+        process = context.Process(target=serve, args=(options, [sock]))
+        process.start()
+        logger.info("Started worker process [%d]", process.pid)
+
+        return process
+
+    def on_signal(signum: int, frame: Any) -> None:
+        stop.set()
+
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+    processes = [start() for _ in range(workers)]
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, on_signal)
+
+    while not stop.wait(SUPERVISE_INTERVAL_SECONDS):
+        for index, process in enumerate(processes):
+            if not process.is_alive() and not stop.is_set():
+                logger.warning("Worker process [%d] died with code %s",
+                               process.pid, process.exitcode)
+                processes[index] = start()
+
+    for process in processes:
+        process.join()
+
+    sock.close()
+
+
+def main() -> None:
+    """Parse the arguments and serve the API."""
+    settings = Settings()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0",
+                        help="interface to bind, 0.0.0.0 by default")
+    parser.add_argument("--port", type=int, default=8000,
+                        help="port to bind, 8000 by default")
+    parser.add_argument("--workers", type=int,
+                        default=settings.SERVER_WORKERS,
+                        help="worker processes, SERVER_WORKERS by default, "
+                             "0 for one per available CPU core, see the "
+                             "module documentation before using more than "
+                             "one")
+    parser.add_argument("--access-log", action="store_true",
+                        help="log every request")
+    args = parser.parse_args()
+
+    workers = args.workers
+
+    # Every process of the memory backend would have its own data.
+    if uses_memory():
+        if workers > 1:
+            parser.error("the memory storage backend needs a single worker")
+
+        workers = 1
+    elif workers <= 0:
+        workers = available_cores()
+
+    if workers > 1:
+        logger.warning("Caches, search indexes, realtime events and chats "
+                       "are kept per worker, %d workers do not see each "
+                       "other's writes in them", workers)
+
+    options = {
+        "app": "main:create_app",
+        "factory": True,
+        "host": args.host,
+        "port": args.port,
+        "loop": "uvloop" if _installed("uvloop") else "asyncio",
+        "http": "httptools" if _installed("httptools") else "h11",
+        "timeout_keep_alive": settings.SERVER_KEEP_ALIVE_SECONDS,
+        "timeout_graceful_shutdown": settings.SHUTDOWN_TIMEOUT_SECONDS,
+        "access_log": args.access_log,
+        "server_header": False,
+    }
+    # Configures the logging, so the backlog warning is shown.
+    uvicorn.Config(**options)
+    options["backlog"] = listen_backlog(settings.SERVER_BACKLOG)
+    logger.info("Serving with %d worker(s), %s loop and %s parser",
+                workers, options["loop"], options["http"])
+
+    if workers == 1:
+        serve(options)
+    else:
+        supervise(options, workers)
+
+
+if __name__ == "__main__":
+    main()
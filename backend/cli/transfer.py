@@ -0,0 +1,146 @@
+"""Command line tool for NDJSON exports and imports of whole collections.
+
+Usage (from the backend directory):
+    python -m cli.transfer export ideas -o ideas.ndjson
+    python -m cli.transfer import ideas ideas.ndjson --batch-size 5000
+
+Imports save their progress to a checkpoint file next to the input after
+every batch. Running the same import again resumes after the last written
+batch. The checkpoint file is removed when the import finishes.
+
+Documents written by this tool bypass the in-memory indexes of a running
+API, restart it afterwards or use the /api/admin endpoints instead. The memory
+storage backend is refused, it has no collections outside of the API process.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+from typing import AsyncIterator
+
+from crud.mongodb_connector import MongoDBConnector
+from crud.transfer import EXPORT_PROJECTIONS, export_ndjson, import_ndjson
+from repositories import uses_memory
+
+
+async def read_lines(path: str) -> AsyncIterator[bytes]:
+    """Read the file line by line.
+
+    Args:
+        path (str): Path of the NDJSON file, "-" for standard input.
+
+    Yields:
+        bytes: Lines of the file.
+    """
+    if path == "-":
+        for line in sys.stdin.buffer:
+            yield line
+        return
+
+    with open(path, "rb") as file:
+        for line in file:
+            yield line
+
+
+async def run_export(args: argparse.Namespace) -> None:
+    """Write the collection as NDJSON to the output file.
+
+    Args:
+        args (argparse.Namespace): Parsed command line arguments.
+    """
+    if args.output == "-":
+        output = sys.stdout.buffer
+    else:
+        output = open(args.output, "wb")
+
+    try:
+        async for chunk in export_ndjson(args.collection, args.batch_size):
+            output.write(chunk)
+    finally:
+        output.flush()
+
+        if output is not sys.stdout.buffer:
+            output.close()
+
+
+async def run_import(args: argparse.Namespace) -> None:
+    """Import the NDJSON file into the collection, resuming from the
+    checkpoint file if it exists.
+
+    Args:
+        args (argparse.Namespace): Parsed command line arguments.
+    """
+    checkpoint_path = args.checkpoint or f"{args.input}.checkpoint"
+    resume_from = 0
+
+    if args.input != "-" and os.path.exists(checkpoint_path):
+        with open(checkpoint_path, "r", encoding="utf-8") as file:
+            resume_from = int(file.read().strip() or 0)
+
+        print(f"Resuming after line {resume_from}", file=sys.stderr)
+
+    async def save_checkpoint(line: int) -> None:
+        if args.input == "-":
+            return
+
+        with open(checkpoint_path, "w", encoding="utf-8") as file:
+            file.write(str(line))
+
+    result = await import_ndjson(
+        args.collection,
+        read_lines(args.input),
+        batch_size=args.batch_size,
+        ordered=not args.unordered,
+        resume_from=resume_from,
+        on_checkpoint=save_checkpoint,
+    )
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    print(f"Inserted {result.inserted}, skipped {result.skipped} existing, "
+          f"{result.checkpoint} lines read", file=sys.stderr)
+
+
+def main() -> None:
+    """Parse the arguments and run the command."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="stream a collection out")
+    export.add_argument("collection", choices=sorted(EXPORT_PROJECTIONS))
+    export.add_argument("-o", "--output", default="-",
+                        help="output file, standard output by default")
+    export.add_argument("--batch-size", type=int, default=1000)
+
+    load = commands.add_parser("import", help="insert an NDJSON file")
+    load.add_argument("collection", choices=sorted(EXPORT_PROJECTIONS))
+    load.add_argument("input", help="NDJSON file, - for standard input")
+    load.add_argument("--batch-size", type=int, default=1000)
+    load.add_argument("--unordered", action="store_true",
+                      help="use unordered inserts, faster but not sequential")
+    load.add_argument("--checkpoint",
+                      help="checkpoint file, <input>.checkpoint by default")
+
+    args = parser.parse_args()
+
+    if uses_memory():
+        parser.error("STORAGE_BACKEND=memory has no collections outside of "
+                     "the API process")
+
+    async def run() -> None:
+        try:
+            if args.command == "export":
+                await run_export(args)
+            else:
+                await run_import(args)
+        finally:
+            await MongoDBConnector().close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Command line entry point running background job workers.
+
+Usage (from the backend directory):
+    python -m cli.worker --workers 4
+
+Runs the jobs of the queue in `crud.jobs` outside of the API, e.g. with
+JOB_WORKERS=0 set for the API processes. SIGINT and SIGTERM stop the workers
+after their current job, jobs still running after JOB_DRAIN_SECONDS are put
+back into the queue.
+
+Handlers that refresh in-memory state, like the idea cache invalidated by
+the username propagation, only refresh it in the process running the job. An
+API without workers of its own keeps serving a cached idea with the old
+author until the idea is written again or evicted. The ETags of the listings
+are derived from counters in the database, so they change in every process.
+"""
+
+import argparse
+import asyncio
+import signal
+
+import crud.propagation  # noqa: F401 - registers the job handlers
+from crud.jobs import create_indexes
+from crud.mongodb_connector import MongoDBConnector
+from internals.jobs import JobRunner
+from settings import Settings
+
+
+async def run(workers: int) -> None:
+    """Run the workers until the process receives a stop signal.
+
+    Args:
+        workers (int): Number of concurrent workers.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    await create_indexes()
+    runner = JobRunner(workers=workers)
+    runner.start()
+
+    try:
+        await stop.wait()
+    finally:
+        await runner.stop()
+        await MongoDBConnector().close()
+
+
+def main() -> None:
+    """Parse the arguments and run the workers."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int,
+                        default=max(Settings().JOB_WORKERS, 1),
+                        help="concurrent workers, JOB_WORKERS by default")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,24 @@
-"""Module providing CRUD operations for the 'comments' collection."""
+"""Module providing CRUD operations for the 'comments' collection.
+
+The comments are stored in the repository of the STORAGE_BACKEND setting.
+"""
 
 from bson import ObjectId
 from typing import List
 
-from crud.mongodb_connector import MongoDBConnector
-from models.comment import Comment, CommentCreate, CommentFilter
+from crud.ideas import score_comment, unscore_comment
+from internals.events import event_bus, idea_topic
+from internals.versions import comments_scope, versions
+from models.comment import (
+    Comment,
+    CommentCreate,
+    CommentFilter,
+    CommentSummary,
+)
+from repositories import get_comment_repository
 
 
-client = MongoDBConnector()
-db = client.get_db()
-comments = db["comments"]
+comments = get_comment_repository()
 
 
 async def create_comment(user_id: str, username: str, comment: CommentCreate) -> Comment:
@@ -25,10 +34,17 @@ async def create_comment(user_id: str, username: str, comment: CommentCreate) ->
     comment.user_id = user_id
     comment.username = username
     doc = comment.model_dump(by_alias=True, exclude_none=True)
-    result = await comments.insert_one(doc)
-    doc["_id"] = str(result.inserted_id)
+    doc["_id"] = str(await comments.insert(doc))
+    await score_comment(comment.idea_id)
+    await versions.bump(comments_scope(comment.idea_id))
+    created = Comment(**doc)
+    event_bus.publish(idea_topic(comment.idea_id), {
+        "type": "comment",
+        "ideaId": comment.idea_id,
+        "comment": created.model_dump(mode="json", by_alias=True),
+    })
 
-    return Comment(**doc)
+    return created
 
 
 async def get_comments(filters: CommentFilter) -> List[Comment]:
@@ -45,17 +61,41 @@ async def get_comments(filters: CommentFilter) -> List[Comment]:
     if not query:
         return None
 
-    print(query)
-
-    cursor = comments.find(query)
     result = []
 
-    async for doc in cursor:
+    for doc in await comments.find(query):
         result.append(Comment.validate(doc))
 
     return result
 
 
+async def get_comment_summaries(
+    idea_ids: List[str],
+    latest: int = 0,
+) -> List[CommentSummary]:
+    """Count the comments of many ideas with a single query.
+
+    Args:
+        idea_ids (List[str]): Ids of the ideas to summarize.
+        latest (int): How many of the newest comments to include per idea.
+
+    Returns:
+        List[CommentSummary]: One summary per requested id, in the same order.
+        Ideas without comments get a summary with a count of 0.
+    """
+    found = {}
+
+    for doc in await comments.summaries(idea_ids, latest):
+        found[doc["_id"]] = CommentSummary(
+            idea_id=doc["_id"],
+            count=doc["count"],
+            latest=[Comment.model_validate(c) for c in doc.get("latest", [])],
+        )
+
+    return [found.get(idea_id, CommentSummary(idea_id=idea_id))
+            for idea_id in idea_ids]
+
+
 async def delete_comment(comment_id: str, user_id: str) -> bool:
     """Remove the comment if it belongs to the user.
     
@@ -66,9 +106,25 @@ async def delete_comment(comment_id: str, user_id: str) -> bool:
     Returns:
         bool: True if the comment was removed, False otherwise.
     """
-    result = await comments.collection.delete_one({
-            "_id": ObjectId(comment_id),
-            "user_id": user_id,
-        })
+    deleted = await comments.delete_owned(ObjectId(comment_id), user_id)
+
+    if not deleted:
+        return False
+
+    # The id of the comment holds its creation time, the time the comment
+    # was added to the score.
+    await unscore_comment(deleted.get("ideaId", ""),
+                          deleted["_id"].generation_time)
+    await versions.bump(comments_scope(deleted.get("ideaId", "")))
+    event_bus.publish(idea_topic(deleted.get("ideaId", "")), {
+        "type": "comment_deleted",
+        "ideaId": deleted.get("ideaId", ""),
+        "commentId": comment_id,
+    })
+
+    return True
+
 
-    return result.deleted_count == 1
+async def create_indexes() -> None:
+    """Create the indexes used by the comment queries."""
+    await comments.create_indexes()
@@ -1,15 +1,53 @@
-"""Module that provides the CRUD functionality for 'ideas' collection."""
-
-from bson import ObjectId
-from typing import List, Optional
-
-from crud.mongodb_connector import MongoDBConnector
-from models.idea import Idea, IdeaCreate, IdeaFilter, IdeaGet, IdeaUpdate
+"""Module that provides the CRUD functionality for 'ideas' collection.
 
+The ideas are stored in the repository of the STORAGE_BACKEND setting.
+"""
 
-client = MongoDBConnector()
-db = client.get_db()
-ideas = db["ideas"]
+from bson import ObjectId
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Optional
+
+from internals.cache import AsyncLRUCache
+from internals.events import event_bus, idea_topic
+from internals.loader import BatchLoader
+from internals.serialization import TrustedReader
+from internals.search import FIELD_WEIGHTS, search_index
+from internals.trending import (
+    COMMENT_WEIGHT,
+    CREATE_WEIGHT,
+    LIKE_WEIGHT,
+    SCORE_FIELD,
+    event_score,
+)
+from internals.typeahead import title_index, username_index
+from internals.versions import IDEAS_SCOPE, versions
+from models.idea import (
+    Idea,
+    IdeaChanges,
+    IdeaCreate,
+    IdeaFilter,
+    IdeaGet,
+    IdeaUpdate,
+)
+from models.suggestion import Suggestion
+from repositories import get_idea_repository
+from settings import Settings
+
+
+ideas = get_idea_repository()
+settings = Settings()
+idea_cache = AsyncLRUCache(settings.IDEA_CACHE_SIZE)
+idea_get_reader = TrustedReader(IdeaGet)
+# Fields of the ideas read into the search index.
+SEARCH_FIELDS = (*FIELD_WEIGHTS, "syncVersion")
+# Ideas read per query when the search index catches up with a snapshot.
+SEARCH_CATCH_UP_CHUNK = 500
+
+idea_loader = BatchLoader(
+    lambda idea_ids: _load_ideas(idea_ids),
+    window=settings.BATCH_WINDOW_MS / 1000,
+    max_batch=settings.MAX_BATCH_IDS,
+)
 
 
 # Create
@@ -22,11 +60,15 @@ async def create_idea(idea: IdeaCreate) -> Idea:
     Returns:
         Idea: The newly added idea.
     """
-    print(idea.author)
     doc = idea.model_dump(by_alias=True, exclude_none=True)
+    doc[SCORE_FIELD] = event_score(CREATE_WEIGHT)
+    doc.update(await _sync_fields())
 
-    result = await ideas.insert_one(doc)
-    created = await ideas.find_one({"_id": result.inserted_id})
+    created = await ideas.insert(doc)
+    await versions.bump(IDEAS_SCOPE)
+    search_index.add(str(created["_id"]), created)
+    _index_title(created)
+    username_index.bump(str(created["userId"]), 1)
 
     return Idea.model_validate(created)
 
@@ -45,11 +87,48 @@ async def get_idea(idea_id: str) -> Optional[Idea]:
     if not ObjectId.is_valid(idea_id):
         return None
 
-    idea = await ideas.find_one({"_id": ObjectId(idea_id)})
-    if not idea:
-        return None
+    return await idea_cache.get(idea_id, lambda: idea_loader.load(idea_id))
+
+
+async def _load_ideas(idea_ids: List[str]) -> Dict[str, Idea]:
+    """Read the ideas with given ids from the database with one query,
+    bypassing the cache.
+
+    Args:
+        idea_ids (List[str]): Valid ids of the ideas.
+
+    Returns:
+        Dict[str, Idea]: The ideas that were found, by id.
+    """
+    ids = [ObjectId(idea_id) for idea_id in idea_ids]
+    result = {}
+
+    for doc in await ideas.get_many(ids):
+        result[str(doc["_id"])] = Idea.model_validate(doc)
+
+    return result
+
+
+async def get_ideas_by_ids(idea_ids: List[str]) -> Dict[str, IdeaGet]:
+    """Get many ideas in the compact format with one query.
+
+    Args:
+        idea_ids (List[str]): Ids of the ideas. Invalid ids are ignored.
+
+    Returns:
+        Dict[str, IdeaGet]: The ideas that were found, by id.
+    """
+    ids = [ObjectId(idea_id) for idea_id in set(idea_ids)
+           if ObjectId.is_valid(idea_id)]
+    result = {}
 
-    return Idea.model_validate(idea)
+    if not ids:
+        return result
+
+    for doc in await ideas.get_many(ids, idea_get_reader.projection):
+        result[str(doc["_id"])] = IdeaGet.model_validate(doc)
+
+    return result
 
 
 async def get_ideas(filters: IdeaFilter) -> List[Idea]:
@@ -66,10 +145,9 @@ async def get_ideas(filters: IdeaFilter) -> List[Idea]:
     if not query:
         return None
 
-    cursor = ideas.find(query)
     result = []
 
-    async for doc in cursor:
+    for doc in await ideas.find(query):
         result.append(Idea.validate(doc))
 
     return result
@@ -83,12 +161,84 @@ async def get_all_ideas() -> List[IdeaGet]:
     """
     result = []
 
-    async for doc in ideas.find():
+    async for doc in ideas.scan():
         result.append(IdeaGet.model_validate(doc))
 
     return result
 
 
+async def get_all_ideas_trusted() -> List[dict]:
+    """Get all ideas from the database without validating them.
+
+    Only the fields of `IdeaGet` are read. The documents are returned as
+    dicts in the shape of `IdeaGet.model_dump(by_alias=True)`, ready to be
+    encoded with `internals.serialization.dumps`.
+
+    Returns:
+        List[dict]: All the ideas from the database.
+    """
+    result = []
+
+    async for doc in ideas.scan(idea_get_reader.projection):
+        result.append(idea_get_reader(doc))
+
+    return result
+
+
+def stream_all_ideas_json(chunk_size: int = 500) -> AsyncIterator[bytes]:
+    """Stream all ideas as a JSON array straight from the storage.
+
+    Only the fields of `IdeaGet` are decoded, one document at a time, so the
+    memory used does not grow with the number of ideas. MongoDB documents are
+    read as raw BSON.
+
+    Args:
+        chunk_size (int): Ideas per yielded chunk.
+
+    Returns:
+        AsyncIterator[bytes]: Consecutive parts of the JSON array.
+    """
+    return ideas.stream_json(idea_get_reader, chunk_size)
+
+
+async def search_ideas(query: str, limit: int = 20) -> List[IdeaGet]:
+    """Get the ideas that best match the full-text query.
+
+    Args:
+        query (str): Free text query matched against the title, description
+        and long description.
+        limit (int): Maximum number of returned ideas.
+
+    Returns:
+        List[IdeaGet]: Matching ideas, best match first.
+    """
+    hits = search_index.search(query, limit)
+
+    if not hits:
+        return []
+
+    found = {}
+    ids = [ObjectId(doc_id) for doc_id, _ in hits]
+
+    for doc in await ideas.get_many(ids):
+        found[str(doc["_id"])] = IdeaGet.model_validate(doc)
+
+    return [found[doc_id] for doc_id, _ in hits if doc_id in found]
+
+
+async def get_trending_ideas(limit: int = 20) -> List[IdeaGet]:
+    """Get the ideas with the highest time-decayed engagement score.
+
+    Args:
+        limit (int): Maximum number of returned ideas.
+
+    Returns:
+        List[IdeaGet]: Trending ideas, hottest first.
+    """
+    return [IdeaGet.model_validate(doc)
+            for doc in await ideas.top_by_score(limit)]
+
+
 async def get_liked_ideas(user_id: str) -> List[IdeaGet]:
     """Get all liked ideas from the database.
 
@@ -103,6 +253,48 @@ async def get_liked_ideas(user_id: str) -> List[IdeaGet]:
     return filter(lambda idea: user_id in idea.liked_by_user, ideas)
 
 
+async def get_idea_changes(since: int, limit: int = 500) -> IdeaChanges:
+    """Get the ideas changed and deleted after the given sync version.
+
+    Changes are returned in version order. Reading stops at the first change
+    younger than `SYNC_SETTLE_SECONDS`, because a write that reserved a lower
+    version may still be in flight and would otherwise be skipped.
+
+    Args:
+        since (int): The sync version the client already has, -1 for a full
+        sync.
+        limit (int): Maximum number of returned changes.
+
+    Returns:
+        IdeaChanges: The changes and the version to pass as `since` next.
+    """
+    cutoff = (datetime.now(timezone.utc)
+              - timedelta(seconds=settings.SYNC_SETTLE_SECONDS))
+
+    # One change more than requested tells whether there are more.
+    updated, deleted = await ideas.changes_since(since, limit + 1)
+    merged = sorted(updated + deleted, key=lambda doc: doc["syncVersion"])
+
+    changes = IdeaChanges(version=since)
+
+    for doc in merged:
+        if len(changes.updated) + len(changes.deleted) == limit:
+            changes.has_more = True
+            break
+
+        if doc["updatedAt"].replace(tzinfo=timezone.utc) > cutoff:
+            break
+
+        if "title" in doc:
+            changes.updated.append(IdeaGet.model_validate(doc))
+        else:
+            changes.deleted.append(str(doc["_id"]))
+
+        changes.version = doc["syncVersion"]
+
+    return changes
+
+
 # Update
 async def update_idea(idea_id: str, idea: IdeaUpdate) -> Optional[Idea]:
     """Update idea with given id.
@@ -128,19 +320,30 @@ async def update_idea(idea_id: str, idea: IdeaUpdate) -> Optional[Idea]:
     if not data:
         return None
 
-    result = await ideas.update_one(
-        {"_id": ObjectId(idea_id)},
-        {"$set": data},
+    changes = idea.model_dump(
+        mode="json",
+        by_alias=True,
+        exclude_unset=True,
+        exclude_none=True,
+        exclude={"id"}
     )
+    data.update(await _sync_fields())
 
-    if result.matched_count == 0:
-        return None
-
-    updated = await ideas.find_one({"_id": ObjectId(idea_id)})
+    updated = await ideas.update(ObjectId(idea_id), data)
+    idea_cache.invalidate(idea_id)
 
-    if not updated:
+    if updated is None:
         return None
 
+    await versions.bump(IDEAS_SCOPE)
+    event_bus.publish(idea_topic(idea_id), {
+        "type": "idea",
+        "ideaId": idea_id,
+        "changes": changes,
+    })
+    search_index.add(idea_id, updated)
+    _index_title(updated)
+
     return Idea.model_validate(updated)
 
 
@@ -157,19 +360,22 @@ async def like_idea(idea_id: str, user_id: str) -> Optional[Idea]:
     if not ObjectId.is_valid(idea_id):
         return None
 
-    result = await ideas.update_one(
-        {"_id": ObjectId(idea_id)},
-        {"$addToSet": {"likedByUser": user_id}},
-    )
+    # Repeated likes are a no-op, so they do not raise the score.
+    updated, modified = await ideas.add_like(
+        ObjectId(idea_id), user_id, LIKE_WEIGHT, await _sync_fields())
 
-    if result.matched_count == 0:
-        return None
-
-    updated = await ideas.find_one({"_id": ObjectId(idea_id)})
+    if modified:
+        idea_cache.invalidate(idea_id)
 
     if not updated:
         return None
 
+    if modified:
+        await versions.bump(IDEAS_SCOPE)
+        _publish_likes(updated)
+
+    _index_title(updated)
+
     return Idea.model_validate(updated)
 
 
@@ -186,21 +392,62 @@ async def unlike_idea(idea_id: str, user_id: str) -> Optional[Idea]:
     if not ObjectId.is_valid(idea_id):
         return None
 
-    result = await ideas.update_one(
-        {"_id": ObjectId(idea_id)},
-        {"$pull": {"likedByUser": user_id}},
-    )
+    updated, modified = await ideas.remove_like(
+        ObjectId(idea_id), user_id, LIKE_WEIGHT, await _sync_fields())
 
-    if result.matched_count == 0:
-        return None
+    if modified:
+        idea_cache.invalidate(idea_id)
 
-    updated = await ideas.find_one({"_id": ObjectId(idea_id)})
     if not updated:
         return None
 
+    if modified:
+        await versions.bump(IDEAS_SCOPE)
+        _publish_likes(updated)
+
+    _index_title(updated)
+
     return Idea.model_validate(updated)
 
 
+def _publish_likes(doc: dict) -> None:
+    """Publish the like count of the idea to its subscribers.
+
+    Args:
+        doc (dict): The idea document after the like or unlike.
+    """
+    event_bus.publish(idea_topic(str(doc["_id"])), {
+        "type": "likes",
+        "ideaId": str(doc["_id"]),
+        "likes": len(doc.get("likedByUser", [])),
+    })
+
+
+async def score_comment(idea_id: str) -> None:
+    """Add a new comment to the trending score of the idea.
+
+    Args:
+        idea_id (str): The id of the commented idea.
+    """
+    if not ObjectId.is_valid(idea_id):
+        return
+
+    await ideas.add_score(ObjectId(idea_id), COMMENT_WEIGHT)
+
+
+async def unscore_comment(idea_id: str, created: datetime) -> None:
+    """Remove a deleted comment from the trending score of the idea.
+
+    Args:
+        idea_id (str): The id of the commented idea.
+        created (datetime): Creation time of the comment.
+    """
+    if not ObjectId.is_valid(idea_id):
+        return
+
+    await ideas.remove_score(ObjectId(idea_id), COMMENT_WEIGHT, created)
+
+
 # Delete
 async def delete_idea(idea_id: str) -> bool:
     """Deletes the idea with given id.
@@ -214,5 +461,175 @@ async def delete_idea(idea_id: str) -> bool:
     if not ObjectId.is_valid(idea_id):
         return False
 
-    result = await ideas.delete_one({"_id": ObjectId(idea_id)})
-    return result.deleted_count == 1
+    deleted = await ideas.delete(ObjectId(idea_id), await _sync_fields())
+    idea_cache.invalidate(idea_id)
+
+    if not deleted:
+        return False
+
+    await versions.bump(IDEAS_SCOPE)
+    search_index.remove(idea_id)
+    title_index.remove(idea_id)
+    username_index.bump(str(deleted["userId"]), -1)
+    event_bus.publish(idea_topic(idea_id), {
+        "type": "idea_deleted",
+        "ideaId": idea_id,
+    })
+
+    return True
+
+
+# Indexes
+async def create_indexes() -> None:
+    """Create the indexes used by the idea queries and fill in the trending
+    score and sync version of the ideas that were created before those fields
+    existed, each idea with a version of its own.
+    """
+    await ideas.create_indexes()
+
+
+async def reserve_sync_versions(count: int = 1) -> int:
+    """Reserve consecutive sync versions for writes to the ideas.
+
+    Every written idea needs its own version, otherwise a limited delta sync
+    could stop in the middle of ideas sharing one version and skip the rest.
+    Versions of writes that turn out to change nothing are left unused, the
+    delta sync skips the gaps. The `IDEAS_SCOPE` ETag is bumped separately,
+    after a write changed an idea.
+
+    Args:
+        count (int): Number of versions to reserve.
+
+    Returns:
+        int: The first reserved version.
+    """
+    return await ideas.reserve_versions(count)
+
+
+async def _sync_fields() -> dict:
+    """Reserve the next sync version for a write to the ideas.
+
+    Returns:
+        dict: The `syncVersion` and `updatedAt` fields for the written
+        document.
+    """
+    return {
+        "syncVersion": await reserve_sync_versions(),
+        "updatedAt": datetime.now(timezone.utc),
+    }
+
+
+# Cache
+async def warm_idea_cache(count: int) -> None:
+    """Load the currently trending ideas into the idea cache.
+
+    Args:
+        count (int): How many ideas to load.
+    """
+    if count <= 0:
+        return
+
+    for doc in await ideas.top_by_score(count):
+        idea_cache.put(str(doc["_id"]), Idea.model_validate(doc))
+
+
+# Search index
+async def rebuild_search_index() -> None:
+    """Rebuild the full-text search index from the database."""
+    search_index.clear()
+
+    async for doc in ideas.scan(SEARCH_FIELDS):
+        search_index.add(str(doc["_id"]), doc)
+
+
+async def load_search_index(path: str) -> None:
+    """Load the search index snapshot and bring it up to date, or rebuild
+    the index from the database when there is no usable snapshot.
+
+    The sync version of every idea is compared with the version it was
+    indexed at, so ideas written, created or deleted after the snapshot was
+    taken are indexed again or removed. Only the changed ideas are read in
+    full.
+
+    Args:
+        path (str): Path of the snapshot file.
+    """
+    if not search_index.load(path):
+        await rebuild_search_index()
+        return
+
+    stale: List[ObjectId] = []
+    current = set()
+
+    async for doc in ideas.scan(("syncVersion",)):
+        idea_id = str(doc["_id"])
+        current.add(idea_id)
+
+        if search_index.version(idea_id) != (doc.get("syncVersion") or 0):
+            stale.append(doc["_id"])
+
+    for idea_id in search_index.doc_ids():
+        if idea_id not in current:
+            search_index.remove(idea_id)
+
+    for start in range(0, len(stale), SEARCH_CATCH_UP_CHUNK):
+        chunk = stale[start:start + SEARCH_CATCH_UP_CHUNK]
+
+        for doc in await ideas.get_many(chunk, SEARCH_FIELDS):
+            search_index.add(str(doc["_id"]), doc)
+
+
+def save_search_index(path: str) -> None:
+    """Write the search index snapshot.
+
+    Args:
+        path (str): Path of the snapshot file.
+    """
+    search_index.save(path)
+
+
+# Typeahead
+async def suggest_titles(prefix: str, limit: int = 10) -> List[Suggestion]:
+    """Get the most liked ideas whose title starts with the prefix.
+
+    Any word of the title can be matched, not only the first one.
+
+    Args:
+        prefix (str): Typed text.
+        limit (int): Maximum number of suggestions.
+
+    Returns:
+        List[Suggestion]: Suggested ideas, most liked first.
+    """
+    return [Suggestion(id=item_id, label=label)
+            for item_id, label in title_index.suggest(prefix, limit)]
+
+
+async def rebuild_title_index() -> None:
+    """Rebuild the idea title index and the idea counts used to rank
+    usernames from the database.
+    """
+    title_index.clear()
+    title_index.clear_popularity()
+    username_index.clear_popularity()
+    titles = []
+
+    async for doc in ideas.scan(("title", "userId", "likedByUser")):
+        idea_id = str(doc["_id"])
+        titles.append((idea_id, doc.get("title", "")))
+        title_index.set_popularity(idea_id,
+                                   len(doc.get("likedByUser") or []))
+        username_index.bump(str(doc["userId"]), 1)
+
+    title_index.add_many(titles)
+
+
+def _index_title(doc: dict) -> None:
+    """Put the title and the like count of the idea into the title index.
+
+    Args:
+        doc (dict): The idea document.
+    """
+    idea_id = str(doc["_id"])
+    title_index.add(idea_id, doc.get("title", ""))
+    title_index.set_popularity(idea_id, len(doc.get("likedByUser") or []))
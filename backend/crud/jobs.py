@@ -0,0 +1,236 @@
+"""Module providing a durable job queue stored in the 'jobs' collection.
+
+Work that does not have to finish inside a request is enqueued as a job and
+executed later by the workers of `internals.jobs.JobRunner`, either inside the
+API process or in a separate `python -m cli.worker` process.
+
+A job is claimed atomically with `find_one_and_update`, which also gives the
+claiming worker a lease. The worker renews the lease while the job runs. If
+the worker dies, the lease expires and another worker claims the job again,
+so handlers must be idempotent. Failed jobs are retried with exponential
+backoff until they run out of attempts.
+
+Job states:
+    "pending": Waiting for `runAt`, or for a free worker.
+    "running": Claimed by the worker in `worker` until `leaseUntil`.
+    "done": Finished, removed automatically after `JOB_RETENTION_HOURS`.
+    "failed": Ran out of attempts, kept with its `lastError` for inspection.
+
+Example:
+    await enqueue_job("propagate_username", {"userId": user_id})
+"""
+
+import random
+
+from bson import ObjectId
+from datetime import datetime, timedelta, timezone
+from pymongo import ReturnDocument
+from typing import Any, Dict, Optional
+
+from crud.mongodb_connector import MongoDBConnector
+from settings import Settings
+
+client = MongoDBConnector()
+db = client.get_db()
+jobs = db["jobs"]
+settings = Settings()
+
+JOB_STATES = ("pending", "running", "done", "failed")
+
+
+async def create_indexes() -> None:
+    """Create the indexes used to claim jobs and expire finished ones."""
+    await jobs.create_index([("status", 1), ("priority", -1), ("runAt", 1)])
+    await jobs.create_index([("status", 1), ("leaseUntil", 1)])
+    await jobs.create_index(
+        "finishedAt",
+        expireAfterSeconds=int(settings.JOB_RETENTION_HOURS * 3600),
+        partialFilterExpression={"status": "done"},
+    )
+
+
+async def enqueue_job(
+    kind: str,
+    payload: Optional[Dict[str, Any]] = None,
+    priority: int = 0,
+    delay: float = 0,
+    max_attempts: Optional[int] = None,
+) -> str:
+    """Add a job to the queue.
+
+    Args:
+        kind (str): Name of the handler that runs the job.
+        payload (Optional[Dict[str, Any]]): Arguments of the handler.
+        priority (int): Jobs with a higher priority are claimed first.
+        delay (float): Seconds before the job may run.
+        max_attempts (Optional[int]): Runs before the job is marked as
+        failed, defaults to `JOB_MAX_ATTEMPTS`.
+
+    Returns:
+        str: Id of the job.
+    """
+    now = datetime.now(timezone.utc)
+
+    if max_attempts is None:
+        max_attempts = settings.JOB_MAX_ATTEMPTS
+
+    result = await jobs.insert_one({
+        "kind": kind,
+        "payload": payload or {},
+        "priority": priority,
+        "status": "pending",
+        "runAt": now + timedelta(seconds=delay),
+        "attempts": 0,
+        "maxAttempts": max_attempts,
+        "createdAt": now,
+    })
+
+    return str(result.inserted_id)
+
+
+async def claim_job(worker: str) -> Optional[Dict[str, Any]]:
+    """Claim the most urgent job that is due, or whose lease expired.
+
+    Args:
+        worker (str): Id of the claiming worker.
+
+    Returns:
+        Optional[Dict[str, Any]]: The claimed job, None if there is none.
+    """
+    now = datetime.now(timezone.utc)
+
+    return await jobs.find_one_and_update(
+        {
+            "$or": [
+                {"status": "pending", "runAt": {"$lte": now}},
+                {"status": "running", "leaseUntil": {"$lt": now}},
+            ],
+        },
+        {
+            "$set": {
+                "status": "running",
+                "worker": worker,
+                "leaseUntil": _lease_end(now),
+                "startedAt": now,
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("priority", -1), ("runAt", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def renew_lease(job_id: ObjectId, worker: str) -> bool:
+    """Extend the lease of a running job.
+
+    Args:
+        job_id (ObjectId): Id of the job.
+        worker (str): Id of the worker holding the lease.
+
+    Returns:
+        bool: False if the worker lost the job to another worker.
+    """
+    result = await jobs.update_one(
+        {"_id": job_id, "status": "running", "worker": worker},
+        {"$set": {"leaseUntil": _lease_end(datetime.now(timezone.utc))}},
+    )
+
+    return result.matched_count == 1
+
+
+async def complete_job(job_id: ObjectId, worker: str) -> None:
+    """Mark the job as done.
+
+    Args:
+        job_id (ObjectId): Id of the job.
+        worker (str): Id of the worker holding the lease.
+    """
+    await jobs.update_one(
+        {"_id": job_id, "status": "running", "worker": worker},
+        {
+            "$set": {
+                "status": "done",
+                "finishedAt": datetime.now(timezone.utc),
+            },
+            "$unset": {"leaseUntil": "", "worker": ""},
+        },
+    )
+
+
+async def fail_job(job: Dict[str, Any], worker: str, error: str) -> None:
+    """Schedule a retry of the job, or mark it as failed.
+
+    The delay before the retry doubles with every attempt and is jittered,
+    so jobs failing together do not retry together.
+
+    Args:
+        job (Dict[str, Any]): The claimed job.
+        worker (str): Id of the worker holding the lease.
+        error (str): Description of the failure.
+    """
+    now = datetime.now(timezone.utc)
+    update: Dict[str, Any] = {"lastError": error}
+
+    if job["attempts"] >= job["maxAttempts"]:
+        update.update({"status": "failed", "finishedAt": now})
+    else:
+        backoff = settings.JOB_RETRY_BASE_SECONDS * 2 ** (job["attempts"] - 1)
+        backoff *= random.uniform(0.5, 1.5)
+        update.update({
+            "status": "pending",
+            "runAt": now + timedelta(seconds=backoff),
+        })
+
+    await jobs.update_one(
+        {"_id": job["_id"], "status": "running", "worker": worker},
+        {"$set": update, "$unset": {"leaseUntil": "", "worker": ""}},
+    )
+
+
+async def release_job(job_id: ObjectId, worker: str) -> None:
+    """Put an interrupted job back into the queue without using an attempt.
+
+    Args:
+        job_id (ObjectId): Id of the job.
+        worker (str): Id of the worker holding the lease.
+    """
+    await jobs.update_one(
+        {"_id": job_id, "status": "running", "worker": worker},
+        {
+            "$set": {
+                "status": "pending",
+                "runAt": datetime.now(timezone.utc),
+            },
+            "$unset": {"leaseUntil": "", "worker": ""},
+            "$inc": {"attempts": -1},
+        },
+    )
+
+
+async def get_job_counts() -> Dict[str, int]:
+    """Return the number of jobs in every state.
+
+    Returns:
+        Dict[str, int]: State -> number of jobs.
+    """
+    counts = {state: 0 for state in JOB_STATES}
+    cursor = await jobs.aggregate([
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+    ])
+
+    async for doc in cursor:
+        counts[doc["_id"]] = doc["count"]
+
+    return counts
+
+
+def _lease_end(now: datetime) -> datetime:
+    """Return the end of a lease starting now.
+
+    Args:
+        now (datetime): Current time.
+
+    Returns:
+        datetime: Time until which the lease is valid.
+    """
+    return now + timedelta(seconds=settings.JOB_LEASE_SECONDS)
@@ -4,27 +4,100 @@ This module defines a singleton class that manages a single instance of an
 asynchronous MongoDB client. Using a singleton prevents the creation of multiple
 client instances and provides a clean way to manage and close the connection.
 
+The client is created on first use, not on import. Modules keep the database
+and its collections in globals, which resolve the client of the current
+process on every use. A forked worker therefore opens its own connections
+instead of sharing the sockets of its parent.
+
+The client reports every command and connection pool event to the listeners
+of `internals.metrics`, which are exposed on the /metrics endpoint.
+
 Example:
     client = MongoDBConnector()
     db = client.get_db()
 """
 
+import os
+
 from pymongo import AsyncMongoClient
 from pymongo.database import Database
-from typing import Optional
+from typing import Any, Optional
 
+from internals.metrics import MongoCommandListener, MongoPoolListener
 from settings import Settings
 
 
+class LazyCollection:
+    """Collection of the database of the current process.
+
+    Attribute access is forwarded to the collection of the current client,
+    which is created by the first access.
+
+    Attributes:
+        name (str): Name of the collection.
+    """
+    __slots__ = ("name",)
+
+    def __init__(self, name: str) -> None:
+        """Refer to the collection without connecting.
+
+        Args:
+            name (str): Name of the collection.
+        """
+        self.name = name
+
+
+    def __getattr__(self, attribute: str) -> Any:
+        """Forward the attribute access to the collection.
+
+        Args:
+            attribute (str): Name of the attribute.
+
+        Returns:
+            Any: The attribute of the collection of the current client.
+        """
+        return getattr(MongoDBConnector().connect()[self.name], attribute)
+
+
+class LazyDatabase:
+    """Database of the current process, see `LazyCollection`."""
+
+    def __getitem__(self, name: str) -> LazyCollection:
+        """Return the collection without connecting.
+
+        Args:
+            name (str): Name of the collection.
+
+        Returns:
+            LazyCollection: The collection.
+        """
+        return LazyCollection(name)
+
+
+    def __getattr__(self, attribute: str) -> Any:
+        """Forward the attribute access to the database.
+
+        Args:
+            attribute (str): Name of the attribute.
+
+        Returns:
+            Any: The attribute of the database of the current client.
+        """
+        return getattr(MongoDBConnector().connect(), attribute)
+
+
 class MongoDBConnector:
     """Singleton class for managing a MongoDB connection.
 
     Attributes:
         _instance (Optional[MongoDBConnector]): The singleton instance.
-        _client (AsyncMongoClient): Asynchronous MongoDB client.
-        _db (Database): MongoDB database used by the application.
+        _client (Optional[AsyncMongoClient]): Asynchronous MongoDB client of
+        this process, None until the first use.
+        _db (Optional[Database]): MongoDB database used by the application.
     """
     _instance: Optional["MongoDBConnector"] = None
+    _client: Optional[AsyncMongoClient] = None
+    _db: Optional[Database] = None
 
 
     def __new__(cls) -> "MongoDBConnector":
@@ -40,38 +113,55 @@ class MongoDBConnector:
         return cls._instance
 
 
-    def __init__(self) -> None:
-        """Initialize the MongoDB client and database connection.
+    def connect(self) -> Database:
+        """Return the database of the client of this process, creating the
+        client if there is none yet.
 
-        Initialization occurs only once, even if the class is instantiated
-        multiple times.
+        Returns:
+            Database: The MongoDB database instance.
         """
-        if hasattr(self, "_initialized") and self._initialized:
-            return
-        settings = Settings()
-        self._client: AsyncMongoClient = AsyncMongoClient(settings.MONGODB_URI)
-        self._db: Database = self._client[settings.MONGODB_DB]
+        if self._db is None:
+            settings = Settings()
+            self._client = AsyncMongoClient(
+                settings.MONGODB_URI,
+                event_listeners=[MongoCommandListener(), MongoPoolListener()],
+            )
+            self._db = self._client[settings.MONGODB_DB]
+
+        return self._db
 
 
-    def get_db(self) -> Database:
-        """Return the MongoDB database instance.
+    def get_db(self) -> LazyDatabase:
+        """Return the MongoDB database without connecting.
 
-        Raises:
-            ValueError: If the MongoDB client has not been initialized.
+        The returned database and its collections connect on first use, so
+        they can be created on import.
 
         Returns:
-            Database: The MongoDB database instance.
+            LazyDatabase: Proxy of the MongoDB database instance.
         """
-        if not hasattr(self, "_db") or self._db is None:
-            raise ValueError("MongoDB client is not initialized.")
-        return self._db
+        return LazyDatabase()
 
 
-    def close(self) -> None:
+    async def close(self) -> None:
         """Close the MongoDB connection.
 
         This method should be called once during the application's shutdown
-        to properly close the connection.
+        to properly close the connection. A later use connects again.
+        """
+        if self._client is not None:
+            await self._client.close()
+
+        self._forget()
+
+
+    def _forget(self) -> None:
+        """Drop the client without closing it, e.g. the client a forked
+        process inherited from its parent.
         """
-        if hasattr(self, "_client") and self._client is not None:
-            self._client.close()
+        self._client = None
+        self._db = None
+
+
+# The sockets of the parent belong to the parent, the child connects anew.
+os.register_at_fork(after_in_child=lambda: MongoDBConnector()._forget())
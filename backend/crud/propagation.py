@@ -0,0 +1,165 @@
+"""Module propagating renamed usernames into denormalized copies.
+
+Ideas store the username of their author in `author` and comments store it
+in `username`, so reads never need a join. When a user is renamed those
+copies are rewritten by a "propagate_username" job of the queue in
+`crud.jobs`:
+
+- The pending rename is stored in the propagation repository before any
+  copy is touched, together with the last processed `_id` of every target
+  collection. When a worker dies the job is claimed again and continues from
+  there.
+- Documents are rewritten with `bulk_write` in chunks of
+  `PROPAGATION_CHUNK_SIZE`, with a pause of `PROPAGATION_PAUSE_MS` between
+  chunks, so a prolific user does not starve the regular traffic.
+- Every write is idempotent, so processing a chunk twice is harmless. A
+  newer rename of the same user stops the job of the older one.
+
+With the memory storage backend there is no durable queue and every chunk
+is a quick in-memory rewrite, so the copies are rewritten right away,
+without pauses.
+"""
+
+import asyncio
+
+from bson import ObjectId
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from crud.ideas import idea_cache, reserve_sync_versions
+from crud.jobs import enqueue_job
+from internals.jobs import job_handler
+from internals.versions import IDEAS_SCOPE, comments_scope, versions
+from repositories import (
+    get_comment_repository,
+    get_idea_repository,
+    get_propagation_repository,
+    uses_memory,
+)
+from repositories.base import AuthoredRepository
+from settings import Settings
+
+propagations = get_propagation_repository()
+settings = Settings()
+
+# Repositories of the documents holding a copy of the username, by the name
+# their progress is saved under.
+TARGETS: Dict[str, AuthoredRepository] = {
+    "ideas": get_idea_repository(),
+    "comments": get_comment_repository(),
+}
+
+
+async def propagate_username(user_id: str, username: str) -> None:
+    """Record the rename and enqueue the job rewriting the copies.
+
+    A newer rename of the same user replaces a pending one. With the memory
+    storage backend the copies are rewritten before returning instead.
+
+    Args:
+        user_id (str): Id of the renamed user.
+        username (str): The new username.
+    """
+    await propagations.start(user_id, username)
+
+    if uses_memory():
+        await _run(user_id, 0)
+        return
+
+    await enqueue_job("propagate_username", {"userId": user_id})
+
+
+@job_handler("propagate_username")
+async def run_propagation(payload: Dict[str, Any]) -> None:
+    """Run the pending propagation of the user in the payload.
+
+    Args:
+        payload (Dict[str, Any]): Payload of the job with the `userId`.
+    """
+    await _run(payload["userId"], settings.PROPAGATION_PAUSE_MS / 1000)
+
+
+async def _run(user_id: str, pause: float) -> None:
+    """Rewrite all copies of the username of the user, chunk by chunk.
+
+    Args:
+        user_id (str): Id of the renamed user.
+        pause (float): Seconds to wait between chunks.
+    """
+    state = await propagations.get(user_id)
+
+    if state is None:
+        return
+
+    username = state["username"]
+    progress = state.get("progress", {})
+
+    for collection in TARGETS:
+        last_id = progress.get(collection)
+
+        while True:
+            last_id = await _rewrite_chunk(collection, user_id, username,
+                                           last_id)
+
+            if last_id is None:
+                break
+
+            # Saving the progress fails if a newer rename replaced this one.
+            if not await propagations.save_progress(user_id, username,
+                                                    collection, last_id):
+                return
+
+            if pause > 0:
+                await asyncio.sleep(pause)
+
+    await propagations.finish(user_id, username)
+
+
+async def _rewrite_chunk(
+    collection: str,
+    user_id: str,
+    username: str,
+    after: Optional[ObjectId],
+) -> Optional[ObjectId]:
+    """Rewrite the next chunk of stale copies in the collection.
+
+    Args:
+        collection (str): Name of the target in `TARGETS`.
+        user_id (str): Id of the renamed user.
+        username (str): The new username.
+        after (Optional[ObjectId]): Last processed `_id`, None to start.
+
+    Returns:
+        Optional[ObjectId]: The last `_id` of the chunk, None when there is
+        nothing left to rewrite.
+    """
+    target = TARGETS[collection]
+    docs = await target.find_stale_copies(user_id, username, after,
+                                          settings.PROPAGATION_CHUNK_SIZE)
+
+    if not docs:
+        return None
+
+    updates = [{target.author_field: username} for _ in docs]
+
+    if collection == "ideas":
+        # Renamed ideas must show up in the delta sync of the ideas.
+        first = await reserve_sync_versions(len(docs))
+        now = datetime.now(timezone.utc)
+
+        for i, update in enumerate(updates):
+            update.update({"syncVersion": first + i, "updatedAt": now})
+
+    await target.set_many(user_id, [(doc["_id"], update)
+                                    for doc, update in zip(docs, updates)])
+
+    if collection == "ideas":
+        for doc in docs:
+            idea_cache.invalidate(str(doc["_id"]))
+
+        await versions.bump(IDEAS_SCOPE)
+    else:
+        for idea_id in {doc.get("ideaId") for doc in docs}:
+            await versions.bump(comments_scope(idea_id))
+
+    return docs[-1]["_id"]
@@ -0,0 +1,265 @@
+"""Module providing NDJSON export and batched import of whole collections.
+
+Exports stream one MongoDB Extended JSON document per line straight from the
+cursor, so they never hold a collection in memory. User exports never contain
+password hashes, so exported users need a "password" again before they can be
+imported. A password that is not a hash of the password hasher is taken as
+plain text and hashed.
+
+Imports read NDJSON lines and write them with `insert_many` in batches.
+After every batch the number of processed input lines is reported as a
+checkpoint. An import that failed can be resumed from its last checkpoint.
+Documents that already exist are skipped, so the batch that was in progress
+during the failure can safely be written again. Imported ideas get new sync
+versions, so clients syncing changes receive them.
+
+Both work on the MongoDB database directly and are not available with the
+memory storage backend.
+"""
+
+import asyncio
+
+from bson import json_util
+from bson.json_util import JSONOptions, JSONMode
+from datetime import datetime, timezone
+from pymongo.errors import BulkWriteError
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+from crud.ideas import reserve_sync_versions
+from crud.mongodb_connector import MongoDBConnector
+from internals.versions import IDEAS_SCOPE, comments_scope, versions
+from models.transfer import ImportResult
+
+client = MongoDBConnector()
+db = client.get_db()
+
+EXPORT_PROJECTIONS: Dict[str, Optional[Dict[str, int]]] = {
+    "ideas": None,
+    "users": {"password": 0},
+    "comments": None,
+}
+JSON_OPTIONS = JSONOptions(json_mode=JSONMode.RELAXED)
+DUPLICATE_KEY = 11000
+
+
+async def export_ndjson(
+    name: str,
+    batch_size: int = 1000,
+) -> AsyncIterator[bytes]:
+    """Stream the collection as NDJSON.
+
+    Args:
+        name (str): Name of the collection, one of `EXPORT_PROJECTIONS`.
+        batch_size (int): Documents per yielded chunk, also the cursor batch
+        size.
+
+    Raises:
+        KeyError: If the collection can not be exported.
+
+    Yields:
+        bytes: Chunks of complete NDJSON lines.
+    """
+    projection = EXPORT_PROJECTIONS[name]
+    cursor = db[name].find({}, projection, batch_size=batch_size)
+    lines: List[str] = []
+
+    async for doc in cursor:
+        lines.append(json_util.dumps(doc, json_options=JSON_OPTIONS))
+
+        if len(lines) == batch_size:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+async def import_ndjson(
+    name: str,
+    lines: AsyncIterable[bytes],
+    batch_size: int = 1000,
+    ordered: bool = True,
+    resume_from: int = 0,
+    on_checkpoint: Optional[Callable[[int], Awaitable[None]]] = None,
+) -> ImportResult:
+    """Insert NDJSON documents into the collection in batches.
+
+    Args:
+        name (str): Name of the collection, one of `EXPORT_PROJECTIONS`.
+        lines (AsyncIterable[bytes]): Input lines, one document per line.
+        batch_size (int): Documents per `insert_many` call.
+        ordered (bool): Whether the documents of a batch are inserted in
+        order. Unordered batches are faster, but the inserted documents of a
+        failed batch are not contiguous.
+        resume_from (int): Number of input lines to skip, the checkpoint of
+        an earlier import.
+        on_checkpoint (Optional[Callable[[int], Awaitable[None]]]): Called
+        with the number of processed lines after every batch.
+
+    Raises:
+        KeyError: If the collection can not be imported.
+        ValueError: If a line is not valid JSON or a user has no password.
+        BulkWriteError: If a document fails for another reason than being
+        already present.
+
+    Returns:
+        ImportResult: Counts of inserted and skipped documents and the final
+        checkpoint.
+    """
+    if name not in EXPORT_PROJECTIONS:
+        raise KeyError(name)
+
+    collection = db[name]
+    result = ImportResult(checkpoint=resume_from)
+    batch: List[Dict[str, Any]] = []
+    line_number = 0
+
+    async def flush() -> None:
+        await _prepare_batch(name, batch)
+        inserted, skipped = await _insert_batch(collection, batch, ordered)
+        result.inserted += inserted
+        result.skipped += skipped
+        result.checkpoint = line_number
+
+        if name == "ideas":
+            await versions.bump(IDEAS_SCOPE)
+        elif name == "comments":
+            for idea_id in {doc.get("ideaId") for doc in batch}:
+                await versions.bump(comments_scope(idea_id))
+
+        batch.clear()
+
+        if on_checkpoint is not None:
+            await on_checkpoint(line_number)
+
+    async for line in lines:
+        line_number += 1
+
+        if line_number <= resume_from or not line.strip():
+            continue
+
+        try:
+            doc = json_util.loads(line, json_options=JSON_OPTIONS)
+        except ValueError as exc:
+            raise ValueError(f"Invalid JSON on line {line_number}") from exc
+
+        # Users without a password could never log in, exports leave it out.
+        if name == "users" and not (isinstance(doc.get("password"), str)
+                                    and doc["password"]):
+            raise ValueError(f"User without a password on line {line_number}")
+
+        batch.append(doc)
+
+        if len(batch) == batch_size:
+            await flush()
+
+    if batch:
+        await flush()
+
+    result.checkpoint = max(line_number, resume_from)
+
+    return result
+
+
+async def _prepare_batch(name: str, batch: List[Dict[str, Any]]) -> None:
+    """Set the fields the documents get from the database they are imported
+    into.
+
+    Users get their plain-text passwords hashed. Ideas get new sync versions,
+    the versions of the source database mean nothing here.
+
+    Args:
+        name (str): Name of the collection.
+        batch (List[Dict[str, Any]]): Documents to insert, changed in place.
+    """
+    from internals.auth import get_password_hash, is_password_hash
+
+    if name == "users":
+        for doc in batch:
+            if not is_password_hash(doc["password"]):
+                doc["password"] = await asyncio.to_thread(get_password_hash,
+                                                          doc["password"])
+    elif name == "ideas" and batch:
+        first = await reserve_sync_versions(len(batch))
+        now = datetime.now(timezone.utc)
+
+        for i, doc in enumerate(batch):
+            doc.update({"syncVersion": first + i, "updatedAt": now})
+
+
+async def _insert_batch(
+    collection: Any,
+    batch: List[Dict[str, Any]],
+    ordered: bool,
+) -> Tuple[int, int]:
+    """Insert the batch, skipping documents that already exist.
+
+    Args:
+        collection (AsyncCollection): Target collection.
+        batch (List[Dict[str, Any]]): Documents to insert.
+        ordered (bool): Whether to insert in order.
+
+    Raises:
+        BulkWriteError: If a document fails for another reason than a
+        duplicate key.
+
+    Returns:
+        Tuple[int, int]: Number of inserted and skipped documents.
+    """
+    inserted = 0
+    skipped = 0
+    remaining = batch
+
+    while remaining:
+        try:
+            await collection.insert_many(remaining, ordered=ordered)
+            inserted += len(remaining)
+            break
+        except BulkWriteError as exc:
+            errors = exc.details.get("writeErrors", [])
+
+            if any(error["code"] != DUPLICATE_KEY for error in errors):
+                raise
+
+            inserted += exc.details.get("nInserted", 0)
+            skipped += len(errors)
+
+            if not ordered:
+                break
+
+            # An ordered insert stops at the first error, retry the rest.
+            remaining = remaining[errors[0]["index"] + 1:]
+
+    return inserted, skipped
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """Split a stream of byte chunks into lines.
+
+    Args:
+        chunks (AsyncIterable[bytes]): Arbitrary chunks, e.g. a request body.
+
+    Yields:
+        bytes: Lines without the line break.
+    """
+    pending = b""
+
+    async for chunk in chunks:
+        pending += chunk
+        *complete, pending = pending.split(b"\n")
+
+        for line in complete:
+            yield line
+
+    if pending:
+        yield pending
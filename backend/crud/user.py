@@ -1,39 +1,88 @@
-"""Module providing CRUD operations for the 'users' collection."""
+"""Module providing CRUD operations for the 'users' collection.
+
+The users are stored in the repository of the STORAGE_BACKEND setting.
+"""
+
+import asyncio
 
 from bson import ObjectId
-from typing import List, Optional
+from pymongo.errors import DuplicateKeyError
+from typing import Dict, List, Optional
 
-from crud.mongodb_connector import MongoDBConnector
+from crud.propagation import propagate_username
+from internals.loader import BatchLoader
+from internals.typeahead import username_index
+from models.suggestion import Suggestion
 from models.user import User, UserCreate, UserFilter, UserGet, UserUpdate
+from repositories import get_user_repository
+from repositories.base import UNIQUE_FIELDS
+from settings import Settings
 
-client = MongoDBConnector()
-db = client.get_db()
-users = db["users"]
+users = get_user_repository()
+settings = Settings()
+
+user_loader = BatchLoader(
+    lambda user_ids: get_users_by_ids(user_ids),
+    window=settings.BATCH_WINDOW_MS / 1000,
+    max_batch=settings.MAX_BATCH_IDS,
+)
 
 
 # Create
 async def create_user(user: UserCreate) -> UserGet:
     """Create a new user and insert it into the collection.
 
-    Hashes the user's password before saving.
+    Hashes the user's password before saving. The user is never an admin,
+    see `set_admin`. The unique indexes reject taken emails and usernames,
+    so no lookup is needed beforehand.
 
     Args:
         user (UserCreate): The user data to insert.
 
+    Raises:
+        DuplicateKeyError: If the email or username is already taken, see
+        `duplicate_field`.
+
     Returns:
         UserGet: The newly created user with database-assigned ID.
     """
     from internals.auth import get_password_hash
 
     new_user = user.model_dump(by_alias=True, exclude=["id"])
-    new_user["password"] = get_password_hash(new_user["password"])
+    new_user["isAdmin"] = False
+    new_user["password"] = await asyncio.to_thread(get_password_hash,
+                                                new_user["password"])
 
-    result = await users.insert_one(new_user)
-    new_user = await users.find_one({"_id": result.inserted_id})
+    new_user["_id"] = await users.insert(new_user)
+    username_index.add(str(new_user["_id"]), new_user["username"])
 
     return UserGet.model_validate(new_user)
 
 
+def duplicate_field(exc: DuplicateKeyError) -> Optional[str]:
+    """Return the unique field that caused the duplicate key error.
+
+    Args:
+        exc (DuplicateKeyError): Error raised by an insert or update.
+
+    Returns:
+        Optional[str]: "email" or "username", None for other keys.
+    """
+    details = exc.details or {}
+    fields = set(details.get("keyPattern") or details.get("keyValue") or {})
+
+    for field in UNIQUE_FIELDS:
+        if field in fields:
+            return field
+
+    # Servers that omit the key pattern still name the index in the message.
+    for field in UNIQUE_FIELDS:
+        if f"index: {field}_" in str(exc):
+            return field
+
+    return None
+
+
 # Read
 async def get_user(user_id: str) -> Optional[UserGet]:
     """Retrieve a user by their ID.
@@ -47,12 +96,30 @@ async def get_user(user_id: str) -> Optional[UserGet]:
     if not ObjectId.is_valid(user_id):
         return None
 
-    user = await users.find_one({"_id": ObjectId(user_id)})
+    return await user_loader.load(user_id)
 
-    if user:
-        return UserGet.model_validate(user)
 
-    return None
+async def get_users_by_ids(user_ids: List[str]) -> Dict[str, UserGet]:
+    """Retrieve many users with one query.
+
+    Args:
+        user_ids (List[str]): The MongoDB ObjectIds of the users. Invalid ids
+        are ignored.
+
+    Returns:
+        Dict[str, UserGet]: The users that were found, by id.
+    """
+    ids = [ObjectId(user_id) for user_id in set(user_ids)
+           if ObjectId.is_valid(user_id)]
+    result = {}
+
+    if not ids:
+        return result
+
+    for user in await users.get_many(ids):
+        result[str(user["_id"])] = UserGet.model_validate(user)
+
+    return result
 
 
 async def get_users(filters: UserFilter) -> List[UserGet]:
@@ -69,10 +136,9 @@ async def get_users(filters: UserFilter) -> List[UserGet]:
     if not query:
         return None
 
-    cursor = users.find(query)
     result = []
 
-    async for doc in cursor:
+    for doc in await users.find(query):
         result.append(User.validate(doc))
 
     return result
@@ -87,7 +153,7 @@ async def get_all_users() -> List[UserGet]:
     """
     all_users = []
 
-    async for user in users.find():
+    async for user in users.scan():
         all_users.append(UserGet.model_validate(user))
 
     return all_users
@@ -103,6 +169,9 @@ async def update_user(user_id: str, user: UserUpdate) -> Optional[UserGet]:
         user_id (str): The MongoDB ObjectId of the user to update.
         user (UserUpdate): The fields to update.
 
+    Raises:
+        DuplicateKeyError: If the new email or username is already taken.
+
     Returns:
         Optional[UserGet]: The updated user if successful, otherwise None.
     """
@@ -114,18 +183,48 @@ async def update_user(user_id: str, user: UserUpdate) -> Optional[UserGet]:
     data = user.model_dump(by_alias=True, exclude_unset=True)
 
     if "password" in data:
-        data["password"] = get_password_hash(data["password"])
+        data["password"] = await asyncio.to_thread(get_password_hash,
+                                                data["password"])
 
-    result = await users.update_one({"_id": ObjectId(user_id)}, {"$set": data})
+    updated = await users.update(ObjectId(user_id), data)
 
-    if result.modified_count == 1:
-        updated = await users.find_one({"_id": ObjectId(user_id)})
+    if updated is not None:
+        username_index.add(user_id, updated["username"])
+
+        if "username" in data:
+            await propagate_username(user_id, updated["username"])
 
         return UserGet.model_validate(updated)
 
     return None
 
 
+async def set_admin(email: str, is_admin: bool) -> Optional[UserGet]:
+    """Grant or revoke the admin rights of a user.
+
+    Only used by `python -m cli.admin`, no endpoint changes admin rights.
+
+    Args:
+        email (str): Email of the user.
+        is_admin (bool): Whether the user is an admin afterwards.
+
+    Returns:
+        Optional[UserGet]: The user, None if there is no user with the
+        email.
+    """
+    found = await users.find({"email": email})
+
+    if not found:
+        return None
+
+    user = found[0]
+
+    if bool(user.get("isAdmin")) != is_admin:
+        user = await users.update(user["_id"], {"isAdmin": is_admin})
+
+    return UserGet.model_validate(user)
+
+
 # Delete
 async def delete_user(user_id: str) -> bool:
     """Delete a user by their ID.
@@ -139,6 +238,45 @@ async def delete_user(user_id: str) -> bool:
     if not ObjectId.is_valid(user_id):
         return False
 
-    result = await users.delete_one({"_id": ObjectId(user_id)})
+    if not await users.delete(ObjectId(user_id)):
+        return False
+
+    username_index.remove(user_id)
+
+    return True
+
+
+# Typeahead
+async def suggest_usernames(prefix: str, limit: int = 10) -> List[Suggestion]:
+    """Get the users with the most ideas whose username starts with the prefix.
+
+    Args:
+        prefix (str): Typed text.
+        limit (int): Maximum number of suggestions.
+
+    Returns:
+        List[Suggestion]: Suggested users, most active first.
+    """
+    return [Suggestion(id=item_id, label=label)
+            for item_id, label in username_index.suggest(prefix, limit)]
+
+
+# Indexes
+async def create_indexes() -> None:
+    """Create the unique indexes of the emails and usernames.
+
+    Fails if the collection already contains duplicates, they have to be
+    resolved by hand first.
+    """
+    await users.create_indexes()
+
+
+async def rebuild_username_index() -> None:
+    """Rebuild the username index from the database."""
+    username_index.clear()
+    usernames = []
+
+    async for doc in users.scan(("username",)):
+        usernames.append((str(doc["_id"]), doc["username"]))
 
-    return result.deleted_count == 1
+    username_index.add_many(usernames)
@@ -1,20 +1,22 @@
 """Module responsible for handling user authentication and JWT tokens."""
 
+import asyncio
+
 from datetime import datetime, timedelta, timezone
 from fastapi import Depends, HTTPException, WebSocket
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 import jwt
-from pwdlib import PasswordHash
-from typing import Optional
+from typing import Any, Optional
 
 from crud.user import get_users
+from internals.timing import timed
 from models.user import User, UserFilter, UserGet, UserLogin
 from settings import Settings
 
 auth_scheme = HTTPBearer()
 
-PASSWORD_HASH = PasswordHash.recommended()
 settings = Settings()
+_password_hash: Optional[Any] = None
 
 
 def create_token(data: dict, expires_delta: timedelta | None = None) -> str:
@@ -55,6 +57,25 @@ def decode_token(token: str) -> dict:
                       algorithms=[settings.ALGORITHM])
 
 
+def get_password_hasher() -> Any:
+    """Return the password hasher, creating it on first use.
+
+    Creating it selects and checks the hashing backend, so it is done by the
+    app lifespan instead of on import.
+
+    Returns:
+        PasswordHash: The recommended hasher of pwdlib.
+    """
+    global _password_hash
+
+    if _password_hash is None:
+        from pwdlib import PasswordHash
+
+        _password_hash = PasswordHash.recommended()
+
+    return _password_hash
+
+
 def verify_password(plain: str, hashed: str) -> bool:
     """Verify that a plain password matches the hashed password.
 
@@ -65,7 +86,20 @@ def verify_password(plain: str, hashed: str) -> bool:
     Returns:
         bool: True if passwords match, False otherwise.
     """
-    return PASSWORD_HASH.verify(plain, hashed)
+    return get_password_hasher().verify(plain, hashed)
+
+
+def is_password_hash(value: str) -> bool:
+    """Check whether the value is a hash made by the password hasher.
+
+    Args:
+        value (str): Stored or imported password.
+
+    Returns:
+        bool: True if one of the hashers recognizes the format.
+    """
+    return any(hasher.identify(value)
+               for hasher in get_password_hasher().hashers)
 
 
 def get_password_hash(plain: str) -> str:
@@ -77,9 +111,10 @@ def get_password_hash(plain: str) -> str:
     Returns:
         str: Hashed password.
     """
-    return PASSWORD_HASH.hash(plain)
+    return get_password_hasher().hash(plain)
 
 
+@timed("auth")
 async def authenticate_user(user: UserLogin) -> Optional[User]:
     """Authenticate a user by email and password.
 
@@ -91,17 +126,21 @@ async def authenticate_user(user: UserLogin) -> Optional[User]:
         None.
     """
     auth_users = await get_users(UserFilter(email=user.email))
-    auth_user = auth_users[0]
 
-    if not auth_user:
+    if not auth_users:
         return None
 
-    if not verify_password(user.password, auth_user.password):
+    auth_user = auth_users[0]
+
+    # Argon2 takes tens of milliseconds, so it must not block the loop.
+    if not await asyncio.to_thread(verify_password, user.password,
+                                   auth_user.password):
         return None
 
     return UserGet.validate(auth_user.model_dump(exclude_none=True, by_alias=True))
 
 
+@timed("auth")
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(auth_scheme),
 ) -> UserGet:
@@ -136,6 +175,7 @@ async def get_current_user(
     return users[0]
 
 
+@timed("auth")
 async def get_current_user_ws(websocket: WebSocket) -> UserGet:
     """Retrieve the authenticated user for WebSockets using the JWT token
     passed via the WebSocket subprotocols.
@@ -176,3 +216,42 @@ async def get_current_user_ws(websocket: WebSocket) -> UserGet:
         raise HTTPException(status_code=401, detail="User not found")
 
     return users[0]
+
+
+async def is_admin_token(token: str) -> bool:
+    """Check if the access token belongs to an admin, without raising.
+
+    Args:
+        token (str): JWT access token.
+
+    Returns:
+        bool: True if the token is valid and its user is an admin.
+    """
+    try:
+        data = decode_token(token)
+    except jwt.PyJWTError:
+        return False
+
+    if data.get("type") != "access" or not data.get("sub"):
+        return False
+
+    users = await get_users(UserFilter(email=data["sub"]))
+
+    return bool(users) and bool(users[0].is_admin)
+
+
+async def get_current_admin(
+    user: UserGet = Depends(get_current_user),
+) -> UserGet:
+    """Retrieve the current authenticated user and require admin rights.
+
+    Raises:
+        HTTPException: If the user is not an admin.
+
+    Returns:
+        UserGet: Authenticated admin.
+    """
+    if not user.is_admin:
+        raise HTTPException(403, "Admin privileges required")
+
+    return user
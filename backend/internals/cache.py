@@ -0,0 +1,173 @@
+"""Bounded in-process LRU cache for asynchronous read-through lookups.
+
+Concurrent misses of the same key are coalesced, so only the first caller
+runs the loader and the others wait for its result. Invalidating a key while
+its value is being loaded makes sure the stale result is not stored.
+
+Cached values are shared between callers and must not be mutated.
+
+Example:
+    cache = AsyncLRUCache(max_size=1024)
+    idea = await cache.get(idea_id, lambda: load_idea(idea_id))
+    cache.invalidate(idea_id)
+"""
+
+import asyncio
+
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class AsyncLRUCache:
+    """Read-through LRU cache with stampede protection.
+
+    Attributes:
+        max_size (int): Maximum number of cached values.
+        _data (OrderedDict): Cached values, least recently used first.
+        _pending (Dict[Hashable, asyncio.Future]): Loads that are in progress.
+        _hits (int): Number of lookups answered from the cache.
+        _misses (int): Number of lookups that ran the loader.
+        _coalesced (int): Number of lookups that waited for another loader.
+        _evictions (int): Number of values dropped because of the size limit.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        """Create an empty cache.
+
+        Args:
+            max_size (int): Maximum number of cached values. A size of 0
+            disables caching, but concurrent loads are still coalesced.
+        """
+        self.max_size = max_size
+        self._data: OrderedDict = OrderedDict()
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+
+
+    def __len__(self) -> int:
+        """Return the number of cached values."""
+        return len(self._data)
+
+
+    async def get(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Optional[Any]]],
+    ) -> Optional[Any]:
+        """Return the cached value, loading it on a miss.
+
+        Args:
+            key (Hashable): Key of the value.
+            loader (Callable[[], Awaitable[Optional[Any]]]): Coroutine function
+            that loads the value. None results are returned but not cached.
+
+        Returns:
+            Optional[Any]: The cached or loaded value.
+        """
+        if key in self._data:
+            self._hits += 1
+            self._data.move_to_end(key)
+            return self._data[key]
+
+        pending = self._pending.get(key)
+
+        if pending is not None:
+            self._coalesced += 1
+            return await asyncio.shield(pending)
+
+        self._misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            self._finish(key, future)
+            future.cancel()
+            raise
+        except Exception as exc:
+            self._finish(key, future)
+            future.set_exception(exc)
+            # Mark the exception as retrieved when nobody else was waiting.
+            future.exception()
+            raise
+
+        if self._finish(key, future) and value is not None:
+            self.put(key, value)
+
+        future.set_result(value)
+
+        return value
+
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store the value, evicting the least recently used ones if needed.
+
+        Args:
+            key (Hashable): Key of the value.
+            value (Any): Value to cache.
+        """
+        if self.max_size <= 0:
+            return
+
+        self._data[key] = value
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self._evictions += 1
+
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop the cached value and forget any load of the key in progress.
+
+        Args:
+            key (Hashable): Key of the value.
+        """
+        self._data.pop(key, None)
+        self._pending.pop(key, None)
+
+
+    def clear(self) -> None:
+        """Drop all cached values."""
+        self._data.clear()
+        self._pending.clear()
+
+
+    def stats(self) -> Dict[str, float]:
+        """Return the counters of the cache.
+
+        Returns:
+            Dict[str, float]: Hits, misses, coalesced lookups, evictions,
+            current size and the hit rate.
+        """
+        lookups = self._hits + self._misses + self._coalesced
+
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "coalesced": self._coalesced,
+            "evictions": self._evictions,
+            "size": len(self._data),
+            "hit_rate": (self._hits + self._coalesced) / lookups if lookups else 0.0,
+        }
+
+
+    def _finish(self, key: Hashable, future: asyncio.Future) -> bool:
+        """Remove the load from the pending ones.
+
+        Args:
+            key (Hashable): Key of the value.
+            future (asyncio.Future): Future of the finished load.
+
+        Returns:
+            bool: True if the key was not invalidated during the load.
+        """
+        if self._pending.get(key) is future:
+            del self._pending[key]
+            return True
+
+        return False
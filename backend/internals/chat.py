@@ -65,5 +65,8 @@ async def broadcast(username: str, message: str) -> None:
       "message": message
     }
 
-    for ws in active_connections.values():
-        await ws.send_text(json.dumps(payload))
+    # Encoded once, not once per recipient.
+    text = json.dumps(payload)
+
+    for ws in list(active_connections.values()):
+        await ws.send_text(text)
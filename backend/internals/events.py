@@ -0,0 +1,295 @@
+"""In-process event bus pushing idea and comment deltas to subscribers.
+
+The CRUD functions publish small delta events to the topic of the changed
+idea. Instead of sending every event to every subscriber right away, the bus
+collects them for `EVENT_BATCH_MS` and then fans out one frame per
+subscriber:
+
+- Events replacing an earlier event of the same window, like two like
+  counts of one idea, are merged, so only the newest one is sent.
+- The events of a topic are encoded to JSON once per window, no matter how
+  many subscribers receive them.
+- A subscriber that does not keep up is dropped when its queue is full,
+  instead of buffering without bound.
+
+On shutdown `EventBus.close` sends the events of the current window and
+ends every subscription with "service restart", so clients reconnect to
+another process instead of missing the last changes.
+
+The bus lives in the memory of one process, so subscribers only receive the
+changes made through the same process.
+
+Topics:
+    "idea:<idea_id>": Likes, edits and comments of one idea.
+
+Events:
+    {"type": "likes", "ideaId": ..., "likes": 3}
+    {"type": "idea", "ideaId": ..., "changes": {"title": ...}}
+    {"type": "idea_deleted", "ideaId": ...}
+    {"type": "comment", "ideaId": ..., "comment": {...}}
+    {"type": "comment_deleted", "ideaId": ..., "commentId": ...}
+"""
+
+import asyncio
+
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set
+
+from internals.serialization import dumps
+from settings import Settings
+
+settings = Settings()
+
+# Event types of which only the newest per topic and window is sent.
+REPLACED_EVENTS = {"likes", "idea_deleted"}
+
+
+def idea_topic(idea_id: str) -> str:
+    """Return the topic of the idea.
+
+    Args:
+        idea_id (str): Id of the idea.
+
+    Returns:
+        str: Name of the topic.
+    """
+    return f"idea:{idea_id}"
+
+
+class Subscription:
+    """Topics of one subscriber and the frames waiting for it.
+
+    Attributes:
+        topics (Set[str]): Subscribed topics.
+        queue (asyncio.Queue): Encoded frames, None once the subscriber was
+        dropped.
+        close_code (int): WebSocket close code sent after the None, 1013
+        (try again later) for a dropped subscriber, 1012 (service restart)
+        on shutdown.
+    """
+
+    def __init__(self, max_frames: int) -> None:
+        """Create a subscription without topics.
+
+        Args:
+            max_frames (int): Maximum number of queued frames.
+        """
+        self.topics: Set[str] = set()
+        # One slot is kept free for the None that drops the subscriber.
+        self.queue: asyncio.Queue = asyncio.Queue(max_frames + 1)
+        self.close_code = 1013
+        self._max_frames = max_frames
+
+
+    def offer(self, frame: bytes) -> bool:
+        """Queue the frame, unless the subscriber fell behind.
+
+        Args:
+            frame (bytes): Encoded JSON array of events.
+
+        Returns:
+            bool: False if the queue is full.
+        """
+        if self.queue.qsize() >= self._max_frames:
+            return False
+
+        self.queue.put_nowait(frame)
+
+        return True
+
+
+    async def next_frame(self) -> Optional[bytes]:
+        """Wait for the next frame.
+
+        Returns:
+            Optional[bytes]: The frame, None if the subscriber was dropped.
+        """
+        return await self.queue.get()
+
+
+class EventBus:
+    """Batches published events and fans them out to subscriptions.
+
+    Attributes:
+        window (float): Seconds events are collected before a fan-out.
+        max_frames (int): Frames queued per subscriber before it is dropped.
+        _subscribers (Dict[str, Set[Subscription]]): Topic -> subscriptions.
+        _pending (Dict[str, Dict[Hashable, dict]]): Topic -> events of the
+        current window, keyed so replaced events overwrite each other.
+        _handle (Optional[asyncio.TimerHandle]): Scheduled fan-out.
+        _published (int): Number of published events.
+        _frames (int): Number of delivered frames.
+        _dropped (int): Number of dropped subscribers.
+    """
+
+    def __init__(self, window: float, max_frames: int) -> None:
+        """Create the bus.
+
+        Args:
+            window (float): Seconds events are collected before a fan-out.
+            max_frames (int): Frames queued per subscriber.
+        """
+        self.window = window
+        self.max_frames = max_frames
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._pending: Dict[str, Dict[Hashable, dict]] = {}
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._published = 0
+        self._frames = 0
+        self._dropped = 0
+
+
+    def subscribe(self) -> Subscription:
+        """Create a subscription, topics are added with `add_topics`.
+
+        Returns:
+            Subscription: The new subscription.
+        """
+        return Subscription(self.max_frames)
+
+
+    def add_topics(self, sub: Subscription, topics: Iterable[str]) -> None:
+        """Deliver the events of the topics to the subscription.
+
+        Args:
+            sub (Subscription): The subscription.
+            topics (Iterable[str]): Topics to add.
+        """
+        for topic in topics:
+            sub.topics.add(topic)
+            self._subscribers.setdefault(topic, set()).add(sub)
+
+
+    def remove_topics(self, sub: Subscription, topics: Iterable[str]) -> None:
+        """Stop delivering the events of the topics to the subscription.
+
+        Args:
+            sub (Subscription): The subscription.
+            topics (Iterable[str]): Topics to remove.
+        """
+        for topic in list(topics):
+            sub.topics.discard(topic)
+            subscribers = self._subscribers.get(topic)
+
+            if subscribers is None:
+                continue
+
+            subscribers.discard(sub)
+
+            if not subscribers:
+                del self._subscribers[topic]
+
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        """Remove the subscription from all its topics.
+
+        Args:
+            sub (Subscription): The subscription.
+        """
+        self.remove_topics(sub, sub.topics)
+
+
+    def publish(self, topic: str, event: Dict[str, Any]) -> None:
+        """Add the event to the next fan-out.
+
+        Events of topics nobody subscribed to are discarded right away.
+
+        Args:
+            topic (str): Topic of the event.
+            event (Dict[str, Any]): JSON compatible event with a `type`.
+        """
+        if topic not in self._subscribers:
+            return
+
+        pending = self._pending.setdefault(topic, {})
+
+        if event["type"] in REPLACED_EVENTS:
+            key: Hashable = event["type"]
+        else:
+            key = (event["type"], len(pending))
+
+        pending[key] = event
+        self._published += 1
+
+        if self._handle is None:
+            loop = asyncio.get_running_loop()
+            self._handle = loop.call_later(self.window, self._flush)
+
+
+    async def close(self, timeout: float) -> None:
+        """Send the pending events and end all subscriptions.
+
+        Waits until the queued frames were taken by their senders, at most
+        for the timeout.
+
+        Args:
+            timeout (float): Maximum number of seconds to wait.
+        """
+        if self._handle is not None:
+            self._handle.cancel()
+
+        self._flush()
+        subscriptions = set()
+
+        for subscribers in list(self._subscribers.values()):
+            subscriptions.update(subscribers)
+
+        for sub in subscriptions:
+            self.unsubscribe(sub)
+            sub.close_code = 1012
+            # Subscribed queues always have the slot kept free for the None.
+            sub.queue.put_nowait(None)
+
+        deadline = asyncio.get_running_loop().time() + timeout
+
+        while any(not sub.queue.empty() for sub in subscriptions):
+            if asyncio.get_running_loop().time() >= deadline:
+                return
+
+            await asyncio.sleep(0.05)
+
+
+    def stats(self) -> Dict[str, int]:
+        """Return the counters of the bus.
+
+        Returns:
+            Dict[str, int]: Number of topics, subscriptions, published
+            events, delivered frames and dropped subscribers.
+        """
+        subscriptions = set()
+
+        for subscribers in self._subscribers.values():
+            subscriptions.update(subscribers)
+
+        return {
+            "topics": len(self._subscribers),
+            "subscriptions": len(subscriptions),
+            "published": self._published,
+            "frames": self._frames,
+            "dropped": self._dropped,
+        }
+
+
+    def _flush(self) -> None:
+        """Send the events of the window, one frame per subscriber."""
+        self._handle = None
+        pending, self._pending = self._pending, {}
+        fragments: Dict[Subscription, List[bytes]] = {}
+
+        for topic, events in pending.items():
+            # The events of a topic are encoded once for all subscribers.
+            encoded = dumps(list(events.values()))[1:-1]
+
+            for sub in self._subscribers.get(topic, ()):
+                fragments.setdefault(sub, []).append(encoded)
+
+        for sub, parts in fragments.items():
+            if sub.offer(b"[" + b",".join(parts) + b"]"):
+                self._frames += 1
+            else:
+                self._dropped += 1
+                self.unsubscribe(sub)
+                sub.queue.put_nowait(None)
+
+
+event_bus = EventBus(settings.EVENT_BATCH_MS / 1000,
+                     settings.EVENT_QUEUE_SIZE)
@@ -0,0 +1,228 @@
+"""Workers executing the jobs of the durable queue in `crud.jobs`.
+
+Handlers are coroutine functions taking the payload of a job. They register
+under the kind of job they run with `job_handler`, so the module defining a
+handler has to be imported before the workers start.
+
+Example:
+    @job_handler("propagate_username")
+    async def run_propagation(payload):
+        ...
+
+    runner = JobRunner(workers=2)
+    runner.start()
+    ...
+    await runner.stop()
+"""
+
+import asyncio
+import logging
+import os
+import traceback
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from uuid import uuid4
+
+from crud.jobs import (
+    claim_job,
+    complete_job,
+    fail_job,
+    release_job,
+    renew_lease,
+)
+from settings import Settings
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+logger = logging.getLogger(__name__)
+handlers: Dict[str, JobHandler] = {}
+settings = Settings()
+
+
+def job_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    """Register the decorated coroutine function as handler of the kind.
+
+    Args:
+        kind (str): Kind of job the handler runs.
+
+    Returns:
+        Callable[[JobHandler], JobHandler]: The decorator.
+    """
+    def register(handler: JobHandler) -> JobHandler:
+        handlers[kind] = handler
+        return handler
+
+    return register
+
+
+class JobRunner:
+    """Pool of workers claiming and running jobs in this process.
+
+    Attributes:
+        workers (int): Number of jobs run concurrently.
+        poll_interval (float): Seconds an idle worker waits before it looks
+        for new jobs again.
+        _id (str): Id of this process, part of the id of every worker.
+        _tasks (List[asyncio.Task]): The running workers.
+        _stopping (asyncio.Event): Set when the workers should stop.
+        _processed (int): Number of finished jobs.
+        _failed (int): Number of failed job runs.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+    ) -> None:
+        """Create the runner, the workers start with `start`.
+
+        Args:
+            workers (Optional[int]): Number of workers, defaults to
+            `JOB_WORKERS`.
+            poll_interval (Optional[float]): Idle wait, defaults to
+            `JOB_POLL_SECONDS`.
+        """
+        self.workers = settings.JOB_WORKERS if workers is None else workers
+        self.poll_interval = (settings.JOB_POLL_SECONDS
+                              if poll_interval is None else poll_interval)
+        self._id = f"{os.uname().nodename}:{os.getpid()}:{uuid4().hex[:6]}"
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+        self._processed = 0
+        self._failed = 0
+
+
+    def start(self) -> None:
+        """Start the workers."""
+        self._stopping.clear()
+        loop = asyncio.get_running_loop()
+        self._tasks = [
+            loop.create_task(self._work(f"{self._id}:{number}"))
+            for number in range(self.workers)
+        ]
+
+
+    async def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the workers, letting them finish their current job.
+
+        Jobs still running after the timeout are cancelled and put back
+        into the queue.
+
+        Args:
+            timeout (Optional[float]): Seconds to wait for running jobs,
+            defaults to `JOB_DRAIN_SECONDS`.
+        """
+        if timeout is None:
+            timeout = settings.JOB_DRAIN_SECONDS
+
+        self._stopping.set()
+
+        if not self._tasks:
+            return
+
+        _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+
+        for task in pending:
+            task.cancel()
+
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+    def stats(self) -> Dict[str, int]:
+        """Return the counters of the runner.
+
+        Returns:
+            Dict[str, int]: Number of workers, finished and failed jobs.
+        """
+        return {
+            "workers": len(self._tasks),
+            "processed": self._processed,
+            "failed": self._failed,
+        }
+
+
+    async def _work(self, worker: str) -> None:
+        """Claim and run jobs until the runner stops.
+
+        Args:
+            worker (str): Id of the worker.
+        """
+        while not self._stopping.is_set():
+            try:
+                job = await claim_job(worker)
+            except Exception:
+                logger.exception("Claiming a job failed")
+                job = None
+
+            if job is None:
+                # Sleep until the next poll, or until the runner stops.
+                try:
+                    await asyncio.wait_for(self._stopping.wait(),
+                                           self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run(job, worker)
+
+
+    async def _run(self, job: Dict[str, Any], worker: str) -> None:
+        """Run the job while renewing its lease.
+
+        Args:
+            job (Dict[str, Any]): The claimed job.
+            worker (str): Id of the worker.
+        """
+        heartbeat = asyncio.get_running_loop().create_task(
+            self._renew(job, worker))
+
+        try:
+            handler = handlers.get(job["kind"])
+
+            if handler is None:
+                raise LookupError(f"No handler for job '{job['kind']}'")
+
+            await handler(job["payload"])
+        except asyncio.CancelledError:
+            await asyncio.shield(release_job(job["_id"], worker))
+            raise
+        except Exception:
+            self._failed += 1
+            logger.exception("Job %s (%s) failed", job["_id"], job["kind"])
+            await fail_job(job, worker, traceback.format_exc(limit=5))
+        else:
+            self._processed += 1
+            await complete_job(job["_id"], worker)
+        finally:
+            heartbeat.cancel()
+
+
+    async def _renew(self, job: Dict[str, Any], worker: str) -> None:
+        """Renew the lease of the job until it finishes or another worker
+        takes it over.
+
+        A renewal that fails, e.g. during a failover of the database, is
+        retried at the next interval. The lease lasts three intervals, so a
+        short outage does not lose it.
+
+        Args:
+            job (Dict[str, Any]): The running job.
+            worker (str): Id of the worker.
+        """
+        while True:
+            await asyncio.sleep(settings.JOB_LEASE_SECONDS / 3)
+
+            try:
+                renewed = await renew_lease(job["_id"], worker)
+            except Exception:
+                logger.exception("Renewing the lease of job %s failed",
+                                 job["_id"])
+                continue
+
+            if not renewed:
+                logger.warning("Lost the lease of job %s", job["_id"])
+                return
+
+
+job_runner = JobRunner()
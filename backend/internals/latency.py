@@ -0,0 +1,204 @@
+"""ASGI middleware recording the latency of every request per route.
+
+For HTTP requests the middleware:
+- Records the duration in `http_request_duration_seconds`, labelled with
+  the route template like `/api/ideas/{idea_id}` instead of the raw path,
+  and the time of each phase of `internals.timing` in
+  `http_request_phase_seconds`.
+- Adds a `Server-Timing` header with the phases, so the browser developer
+  tools show where the time of a single request went.
+- Logs requests slower than `SLOW_REQUEST_MS` as one JSON object to the
+  "brain_bridge.slow" logger.
+
+WebSocket sessions are recorded in `websocket_session_duration_seconds`.
+
+The phases are "auth", "db" and "serialize". Time not covered by them, like
+validation of the request and of `response_model`s, is the difference to
+the total. For streamed responses the header only covers the time until the
+first chunk.
+"""
+
+import json
+import logging
+
+from typing import Any, Awaitable, Callable, Dict, MutableMapping
+
+from internals.metrics import metrics
+from internals.timing import RequestTiming, request_timing
+from settings import Settings
+
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+
+UNMATCHED_ROUTE = "<unmatched>"
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0)
+SESSION_BUCKETS = (1, 5, 15, 60, 300, 900, 3600, 4 * 3600, 24 * 3600)
+
+slow_logger = logging.getLogger("brain_bridge.slow")
+settings = Settings()
+
+request_duration = metrics.histogram(
+    "http_request_duration_seconds",
+    "Duration of HTTP requests by route template",
+    ("method", "route", "status"),
+    REQUEST_BUCKETS,
+)
+phase_duration = metrics.histogram(
+    "http_request_phase_seconds",
+    "Time HTTP requests spent in each phase",
+    ("route", "phase"),
+    REQUEST_BUCKETS,
+)
+session_duration = metrics.histogram(
+    "websocket_session_duration_seconds",
+    "Duration of WebSocket sessions by route template",
+    ("route",),
+    SESSION_BUCKETS,
+)
+
+
+def route_template(scope: Scope) -> str:
+    """Return the template of the route that handled the request.
+
+    Args:
+        scope (Scope): ASGI scope after routing.
+
+    Returns:
+        str: Path template, `UNMATCHED_ROUTE` if no route matched, so
+        unknown paths do not create new label values.
+    """
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+
+    if path is None:
+        return UNMATCHED_ROUTE
+
+    # Mounts, like the uploaded files, match everything below their path.
+    if not hasattr(route, "endpoint"):
+        return f"{path}/{{path}}"
+
+    return path
+
+
+class LatencyMiddleware:
+    """Records request latencies, see the module documentation.
+
+    Attributes:
+        app (Callable): The wrapped ASGI application.
+        slow_seconds (float): Duration above which a request is logged.
+        server_timing (bool): Whether to add the Server-Timing header.
+    """
+
+    def __init__(self, app: Callable) -> None:
+        """Wrap the application.
+
+        Args:
+            app (Callable): ASGI application.
+        """
+        self.app = app
+        self.slow_seconds = settings.SLOW_REQUEST_MS / 1000
+        self.server_timing = settings.SERVER_TIMING
+
+
+    async def __call__(self, scope: Scope, receive: Receive,
+                       send: Send) -> None:
+        """Handle one ASGI connection.
+
+        Args:
+            scope (Scope): ASGI scope.
+            receive (Receive): ASGI receive channel.
+            send (Send): ASGI send channel.
+        """
+        if scope["type"] == "http":
+            await self._http(scope, receive, send)
+        elif scope["type"] == "websocket":
+            await self._websocket(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+
+    async def _http(self, scope: Scope, receive: Receive,
+                    send: Send) -> None:
+        """Time an HTTP request.
+
+        Args:
+            scope (Scope): ASGI scope.
+            receive (Receive): ASGI receive channel.
+            send (Send): ASGI send channel.
+        """
+        status = 500
+
+        with request_timing() as timing:
+            async def send_timed(message: Message) -> None:
+                nonlocal status
+
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+
+                    if self.server_timing:
+                        headers = list(message.get("headers", []))
+                        headers.append((b"server-timing",
+                                        timing.server_timing().encode()))
+                        message["headers"] = headers
+
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_timed)
+            finally:
+                self._record(scope, status, timing)
+
+
+    async def _websocket(self, scope: Scope, receive: Receive,
+                         send: Send) -> None:
+        """Time a WebSocket session.
+
+        Args:
+            scope (Scope): ASGI scope.
+            receive (Receive): ASGI receive channel.
+            send (Send): ASGI send channel.
+        """
+        timing = RequestTiming()
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            session_duration.observe((route_template(scope),),
+                                     timing.elapsed())
+
+
+    def _record(self, scope: Scope, status: int,
+                timing: RequestTiming) -> None:
+        """Record the finished request and log it if it was slow.
+
+        Args:
+            scope (Scope): ASGI scope after routing.
+            status (int): Status code of the response.
+            timing (RequestTiming): Timing of the request.
+        """
+        elapsed = timing.elapsed()
+        route = route_template(scope)
+        request_duration.observe((scope["method"], route, str(status)),
+                                 elapsed)
+
+        for phase, seconds in timing.phases.items():
+            phase_duration.observe((route, phase), seconds)
+
+        if elapsed < self.slow_seconds:
+            return
+
+        entry: Dict[str, Any] = {
+            "event": "slow_request",
+            "method": scope["method"],
+            "route": route,
+            "path": scope["path"],
+            "status": status,
+            "duration_ms": round(elapsed * 1000, 2),
+            "phases_ms": {phase: round(seconds * 1000, 2)
+                          for phase, seconds in timing.phases.items()},
+            "phase_counts": timing.counts,
+        }
+        slow_logger.warning(json.dumps(entry))
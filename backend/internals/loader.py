@@ -0,0 +1,150 @@
+"""DataLoader-style coalescing of single-id lookups into batch queries.
+
+Requests that look up one document each (an idea page, an author, a liked
+idea) often arrive at nearly the same time. `BatchLoader` collects the keys
+requested within a short window and resolves all of them with one call of a
+batch function, typically a single `$in` query.
+
+Example:
+    async def load_ideas(ids):
+        return {str(doc["_id"]): doc async for doc in ideas.find(...)}
+
+    loader = BatchLoader(load_ideas, window=0.001)
+    idea = await loader.load(idea_id)
+"""
+
+import asyncio
+
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Set,
+)
+
+
+class BatchLoader:
+    """Coalesces concurrent single-key loads into batched calls.
+
+    Attributes:
+        batch_fn (Callable): Coroutine function taking a list of keys and
+        returning a dict of the found values by key.
+        window (float): Seconds to wait for more keys before loading, 0 only
+        merges the keys requested in the same event loop iteration.
+        max_batch (int): Number of keys that triggers a load immediately.
+        _pending (Dict[Hashable, asyncio.Future]): Keys waiting for the next
+        batch.
+        _handle (Optional[asyncio.Handle]): Scheduled dispatch of the batch.
+        _tasks (Set[asyncio.Task]): Running batches.
+        _batches (int): Number of batch calls made.
+        _keys (int): Number of keys loaded.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+        window: float = 0.001,
+        max_batch: int = 100,
+    ) -> None:
+        """Create a loader.
+
+        Args:
+            batch_fn (Callable): Coroutine function loading a list of keys.
+            window (float): Seconds to wait for more keys.
+            max_batch (int): Maximum number of keys in one batch.
+        """
+        self.batch_fn = batch_fn
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        self._handle: Optional[asyncio.Handle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._batches = 0
+        self._keys = 0
+
+
+    async def load(self, key: Hashable) -> Optional[Any]:
+        """Load one value, batched with the other keys of the window.
+
+        Args:
+            key (Hashable): Key of the value.
+
+        Returns:
+            Optional[Any]: The value, None if the batch did not find it.
+        """
+        future = self._pending.get(key)
+
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[key] = future
+
+            if len(self._pending) >= self.max_batch:
+                self._dispatch()
+            elif self._handle is None:
+                if self.window > 0:
+                    self._handle = loop.call_later(self.window, self._dispatch)
+                else:
+                    self._handle = loop.call_soon(self._dispatch)
+
+        # Shielded, so a cancelled caller does not cancel the shared result.
+        return await asyncio.shield(future)
+
+
+    def stats(self) -> Dict[str, float]:
+        """Return the counters of the loader.
+
+        Returns:
+            Dict[str, float]: Number of batches, keys and the average batch
+            size.
+        """
+        average = self._keys / self._batches if self._batches else 0.0
+
+        return {
+            "batches": self._batches,
+            "keys": self._keys,
+            "avg_batch_size": average,
+        }
+
+
+    def _dispatch(self) -> None:
+        """Start loading the keys collected so far."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, {}
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+    async def _run(self, batch: Dict[Hashable, asyncio.Future]) -> None:
+        """Call the batch function and resolve the futures of the batch.
+
+        Args:
+            batch (Dict[Hashable, asyncio.Future]): Keys and their futures.
+        """
+        self._batches += 1
+        self._keys += len(batch)
+
+        try:
+            results = await self.batch_fn(list(batch))
+        except Exception as exc:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(exc)
+                    # Mark it as retrieved in case every caller went away.
+                    future.exception()
+            return
+
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(results.get(key))
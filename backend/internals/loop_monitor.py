@@ -0,0 +1,233 @@
+"""Monitoring of the event loop lag and detection of blocking calls.
+
+`LoopMonitor` runs a task that sleeps for `LOOP_LAG_INTERVAL_MS` and measures
+how much later than planned it wakes up. The difference is the time the loop
+was busy with other callbacks, so it is the delay every request waiting for
+I/O suffered at that moment. The lags go into the
+`event_loop_lag_seconds` histogram, and the percentiles of the last
+`LOOP_LAG_WINDOW` samples are exported by `stats()`.
+
+With `LOOP_BLOCK_THRESHOLD_MS` set, a watchdog thread additionally checks
+that the monitor task keeps running. If it did not run for longer than the
+threshold, a callback blocks the loop, and the watchdog logs the stack of
+the loop thread and the coroutine of the blocking task, the outermost
+coroutine on that stack, to the "brain_bridge.blocking" logger while the
+callback is still blocking, so the log shows the offending line and not only
+the coroutine that was resumed. Each blocking call is logged once.
+
+Example:
+    monitor = LoopMonitor()
+    monitor.start()
+    ...
+    await monitor.stop()
+"""
+
+import asyncio
+import inspect
+import json
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from collections import deque
+from types import FrameType
+from typing import Deque, Dict, Optional
+
+from internals.metrics import metrics
+from settings import Settings
+
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+               2.5, 5.0)
+PERCENTILES = (("p50", 0.50), ("p90", 0.90), ("p99", 0.99))
+
+blocking_logger = logging.getLogger("brain_bridge.blocking")
+settings = Settings()
+
+lag_histogram = metrics.histogram(
+    "event_loop_lag_seconds",
+    "Delay of the event loop in waking up a sleeping task",
+    (),
+    LAG_BUCKETS,
+)
+blocked_counter = metrics.counter(
+    "event_loop_blocked_total",
+    "Callbacks that blocked the event loop longer than the threshold",
+)
+
+
+def _task_coroutine(frame: Optional[FrameType]) -> Optional[str]:
+    """Describe the coroutine a task runs, from the stack of the loop thread.
+
+    The outermost coroutine frame is the coroutine of the running task. It
+    is read from the stack instead of the running task of the loop, which
+    only the loop thread may read.
+
+    Args:
+        frame (Optional[FrameType]): Innermost frame of the loop thread.
+
+    Returns:
+        Optional[str]: `qualname() running at path:line`, None if no
+        coroutine runs, e.g. in a plain callback.
+    """
+    outermost = None
+
+    while frame is not None:
+        if frame.f_code.co_flags & inspect.CO_COROUTINE:
+            outermost = frame
+
+        frame = frame.f_back
+
+    if outermost is None:
+        return None
+
+    code = outermost.f_code
+
+    # co_qualname exists since Python 3.11.
+    name = getattr(code, "co_qualname", code.co_name)
+
+    return (f"{name}() running at "
+            f"{code.co_filename}:{outermost.f_lineno}")
+
+
+class LoopMonitor:
+    """Measures the lag of the running event loop.
+
+    Attributes:
+        interval (float): Seconds between two measurements.
+        block_threshold (float): Seconds a callback may run before the
+        watchdog logs it, 0 disables the watchdog.
+        _lags (Deque[float]): The latest measured lags.
+        _task (Optional[asyncio.Task]): The measuring task.
+        _watchdog (Optional[threading.Thread]): The watchdog thread.
+        _stopping (threading.Event): Set when the watchdog should stop.
+        _heartbeat (float): `time.monotonic` of the last run of the task.
+        _thread_id (Optional[int]): Id of the thread running the loop.
+    """
+
+    def __init__(
+        self,
+        interval: Optional[float] = None,
+        block_threshold: Optional[float] = None,
+        window: Optional[int] = None,
+    ) -> None:
+        """Create the monitor, it starts measuring with `start`.
+
+        Args:
+            interval (Optional[float]): Seconds between measurements,
+            defaults to `LOOP_LAG_INTERVAL_MS`.
+            block_threshold (Optional[float]): Watchdog threshold in
+            seconds, defaults to `LOOP_BLOCK_THRESHOLD_MS`.
+            window (Optional[int]): Number of lags the percentiles are
+            computed from, defaults to `LOOP_LAG_WINDOW`.
+        """
+        self.interval = (settings.LOOP_LAG_INTERVAL_MS / 1000
+                         if interval is None else interval)
+        self.block_threshold = (settings.LOOP_BLOCK_THRESHOLD_MS / 1000
+                                if block_threshold is None
+                                else block_threshold)
+        self._lags: Deque[float] = deque(
+            maxlen=settings.LOOP_LAG_WINDOW if window is None else window)
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._heartbeat = time.monotonic()
+        self._thread_id: Optional[int] = None
+
+
+    def start(self) -> None:
+        """Start measuring the running loop, and the watchdog if enabled."""
+        self._thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.get_running_loop().create_task(self._measure())
+
+        if self.block_threshold > 0:
+            self._watchdog = threading.Thread(target=self._watch,
+                                              name="loop-watchdog",
+                                              daemon=True)
+            self._watchdog.start()
+
+
+    async def stop(self) -> None:
+        """Stop measuring."""
+        self._stopping.set()
+
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join)
+            self._watchdog = None
+
+
+    def stats(self) -> Dict[str, float]:
+        """Return the percentiles of the latest lags.
+
+        Returns:
+            Dict[str, float]: Percentile or "max" -> lag in seconds.
+        """
+        lags = sorted(self._lags)
+
+        if not lags:
+            return {}
+
+        stats = {
+            name: lags[min(int(len(lags) * fraction), len(lags) - 1)]
+            for name, fraction in PERCENTILES
+        }
+        stats["max"] = lags[-1]
+
+        return stats
+
+
+    async def _measure(self) -> None:
+        """Sleep for the interval and record how late the wake-up was."""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self._heartbeat = time.monotonic()
+            lag = max(loop.time() - start - self.interval, 0.0)
+            self._lags.append(lag)
+            lag_histogram.observe((), lag)
+
+
+    def _watch(self) -> None:
+        """Log the stack of the loop thread whenever the loop is blocked."""
+        reported = 0.0
+        check = max(self.block_threshold / 2, 0.001)
+
+        while not self._stopping.wait(check):
+            heartbeat = self._heartbeat
+            blocked = time.monotonic() - heartbeat - self.interval
+
+            if blocked < self.block_threshold or heartbeat == reported:
+                continue
+
+            reported = heartbeat
+            blocked_counter.inc()
+            self._report(blocked)
+
+
+    def _report(self, blocked: float) -> None:
+        """Log the current stack of the loop thread.
+
+        Args:
+            blocked (float): Seconds the loop has been blocked so far.
+        """
+        frame = sys._current_frames().get(self._thread_id)
+        entry = {
+            "event": "blocked_loop",
+            "blocked_ms": round(blocked * 1000, 2),
+            "coroutine": _task_coroutine(frame),
+            "stack": traceback.format_stack(frame) if frame else [],
+        }
+        blocking_logger.warning(json.dumps(entry))
+
+
+loop_monitor = LoopMonitor()
@@ -0,0 +1,670 @@
+"""Minimal Prometheus metrics and the MongoDB driver listeners feeding them.
+
+The metrics are kept in the memory of one process and rendered in the
+Prometheus text exposition format by `MetricsRegistry.render`, so no client
+library is needed. Each process exposes its own values, Prometheus adds them
+up across processes.
+
+The listeners are registered with the `AsyncMongoClient` in
+`MongoDBConnector`. pymongo calls them synchronously for every command and
+pool event, so they only update counters. Command durations are also added
+to the "db" phase of the current request, see `internals.timing`.
+
+Example:
+    requests = metrics.histogram("http_request_seconds", "Request latency",
+                                 ("route",))
+    requests.observe(("/api/ideas",), 0.012)
+    text = metrics.render()
+"""
+
+import math
+import sys
+import time
+
+from abc import ABC, abstractmethod
+from pymongo import monitoring
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from internals.timing import record_phase
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0)
+
+Labels = Tuple[str, ...]
+# Name, help, type, labels and value of a sample computed at scrape time.
+Sample = Tuple[str, str, str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text format.
+
+    Args:
+        value (str): Raw value.
+
+    Returns:
+        str: Escaped value.
+    """
+    return (value.replace("\\", "\\\\").replace("\n", "\\n")
+            .replace('"', '\\"'))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Format the labels of a sample.
+
+    Args:
+        names (Sequence[str]): Label names.
+        values (Sequence[str]): Label values.
+
+    Returns:
+        str: `{name="value",...}`, empty without labels.
+    """
+    if not names:
+        return ""
+
+    pairs = ",".join(f'{name}="{_escape(str(value))}"'
+                     for name, value in zip(names, values))
+
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value.
+
+    Args:
+        value (float): The value.
+
+    Returns:
+        str: The value in the text format.
+    """
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+
+    if float(value).is_integer():
+        return str(int(value))
+
+    return repr(float(value))
+
+
+class Metric(ABC):
+    """Base of the metric types, a family of samples with the same labels.
+
+    Attributes:
+        name (str): Name of the metric.
+        help (str): Description of the metric.
+        label_names (Labels): Names of the labels.
+        kind (str): Prometheus type of the metric.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, label_names: Labels = ()):
+        """Create the metric without samples.
+
+        Args:
+            name (str): Name of the metric.
+            help (str): Description of the metric.
+            label_names (Labels): Names of the labels.
+        """
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+
+
+    def header(self) -> List[str]:
+        """Return the HELP and TYPE lines of the metric.
+
+        Returns:
+            List[str]: The lines.
+        """
+        return [f"# HELP {self.name} {self.help}",
+                f"# TYPE {self.name} {self.kind}"]
+
+
+    @abstractmethod
+    def lines(self) -> List[str]:
+        """Return the sample lines of the metric.
+
+        Returns:
+            List[str]: The lines.
+        """
+
+
+class Counter(Metric):
+    """Monotonically increasing value per label set.
+
+    Attributes:
+        _values (Dict[Labels, float]): Label values -> value.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, label_names: Labels = ()):
+        """Create the counter.
+
+        Args:
+            name (str): Name of the metric.
+            help (str): Description of the metric.
+            label_names (Labels): Names of the labels.
+        """
+        super().__init__(name, help, label_names)
+        self._values: Dict[Labels, float] = {}
+
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        """Increase the counter.
+
+        Args:
+            labels (Labels): Label values.
+            amount (float): Increment.
+        """
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+
+    def lines(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, labels)} "
+                f"{_format_value(value)}"
+                for labels, value in self._values.items()]
+
+
+class Gauge(Counter):
+    """Value per label set that can go up and down."""
+
+    kind = "gauge"
+
+    def set(self, labels: Labels, value: float) -> None:
+        """Set the gauge.
+
+        Args:
+            labels (Labels): Label values.
+            value (float): New value.
+        """
+        self._values[labels] = value
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets.
+
+    Attributes:
+        buckets (Tuple[float, ...]): Upper bounds of the buckets.
+        _counts (Dict[Labels, List[int]]): Label values -> observations per
+        bucket, the last one for values above all bounds.
+        _sums (Dict[Labels, float]): Label values -> sum of the values.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        label_names: Labels = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        """Create the histogram.
+
+        Args:
+            name (str): Name of the metric.
+            help (str): Description of the metric.
+            label_names (Labels): Names of the labels.
+            buckets (Sequence[float]): Ascending upper bounds of the buckets.
+        """
+        super().__init__(name, help, label_names)
+        self.buckets = tuple(buckets)
+        self._counts: Dict[Labels, List[int]] = {}
+        self._sums: Dict[Labels, float] = {}
+
+
+    def observe(self, labels: Labels, value: float) -> None:
+        """Record one value.
+
+        Args:
+            labels (Labels): Label values.
+            value (float): Observed value.
+        """
+        counts = self._counts.get(labels)
+
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+            self._sums[labels] = 0.0
+
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+                break
+        else:
+            counts[-1] += 1
+
+        self._sums[labels] += value
+
+
+    def lines(self) -> List[str]:
+        result = []
+        names = self.label_names + ("le",)
+
+        for labels, counts in self._counts.items():
+            total = 0
+
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                total += count
+                le = _format_value(bound)
+                result.append(f"{self.name}_bucket"
+                              f"{_format_labels(names, labels + (le,))}"
+                              f" {total}")
+
+            label_text = _format_labels(self.label_names, labels)
+            result.append(f"{self.name}_sum{label_text} "
+                          f"{_format_value(self._sums[labels])}")
+            result.append(f"{self.name}_count{label_text} {total}")
+
+        return result
+
+
+class MetricsRegistry:
+    """The metrics of the process and collectors of scrape-time values.
+
+    Attributes:
+        _metrics (Dict[str, Metric]): Name -> metric.
+        _collectors (List[Callable[[], Iterable[Sample]]]): Functions
+        returning samples computed at scrape time, e.g. cache statistics.
+    """
+
+    def __init__(self) -> None:
+        """Create an empty registry."""
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+
+    def counter(self, name: str, help: str, labels: Labels = ()) -> Counter:
+        """Return the counter with the name, creating it if needed.
+
+        Args:
+            name (str): Name of the metric.
+            help (str): Description of the metric.
+            labels (Labels): Names of the labels.
+
+        Returns:
+            Counter: The counter.
+        """
+        return self._register(Counter(name, help, labels))
+
+
+    def gauge(self, name: str, help: str, labels: Labels = ()) -> Gauge:
+        """Return the gauge with the name, creating it if needed.
+
+        Args:
+            name (str): Name of the metric.
+            help (str): Description of the metric.
+            labels (Labels): Names of the labels.
+
+        Returns:
+            Gauge: The gauge.
+        """
+        return self._register(Gauge(name, help, labels))
+
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labels: Labels = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        """Return the histogram with the name, creating it if needed.
+
+        Args:
+            name (str): Name of the metric.
+            help (str): Description of the metric.
+            labels (Labels): Names of the labels.
+            buckets (Sequence[float]): Upper bounds of the buckets.
+
+        Returns:
+            Histogram: The histogram.
+        """
+        return self._register(Histogram(name, help, labels, buckets))
+
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        """Add a function returning samples computed at scrape time.
+
+        Args:
+            collector (Callable[[], Iterable[Sample]]): The function.
+        """
+        self._collectors.append(collector)
+
+
+    def render(self, extra: Iterable[Sample] = ()) -> str:
+        """Render all metrics in the Prometheus text format.
+
+        Args:
+            extra (Iterable[Sample]): Additional samples, e.g. ones that had
+            to be computed asynchronously.
+
+        Returns:
+            str: The exposition text.
+        """
+        lines: List[str] = []
+
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.lines())
+
+        samples: List[Sample] = list(extra)
+
+        for collector in self._collectors:
+            samples.extend(collector())
+
+        # The samples of one metric have to be listed together.
+        groups: Dict[str, List[Sample]] = {}
+
+        for sample in samples:
+            groups.setdefault(sample[0], []).append(sample)
+
+        for name, group in groups.items():
+            lines.append(f"# HELP {name} {group[0][1]}")
+            lines.append(f"# TYPE {name} {group[0][2]}")
+
+            for _, _, _, labels, value in group:
+                label_text = _format_labels(tuple(labels),
+                                            tuple(labels.values()))
+                lines.append(f"{name}{label_text} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+    def _register(self, metric: Metric) -> Any:
+        """Store the metric, unless one with the same name exists.
+
+        Args:
+            metric (Metric): The new metric.
+
+        Returns:
+            Metric: The stored metric.
+        """
+        return self._metrics.setdefault(metric.name, metric)
+
+
+def stats_samples(
+    prefix: str,
+    stats: Dict[str, float],
+    labels: Optional[Dict[str, str]] = None,
+    counters: Iterable[str] = (),
+) -> List[Sample]:
+    """Turn a `stats()` dict into samples.
+
+    Args:
+        prefix (str): Prefix of the metric names.
+        stats (Dict[str, float]): Statistic name -> value.
+        labels (Optional[Dict[str, str]]): Labels of all samples.
+        counters (Iterable[str]): Statistics that only increase, exported
+        as counters with a `_total` suffix. The others become gauges.
+
+    Returns:
+        List[Sample]: The samples.
+    """
+    counters = set(counters)
+    samples = []
+
+    for key, value in stats.items():
+        help = f"{key} of the {prefix}".replace("_", " ").capitalize()
+
+        if key in counters:
+            samples.append((f"{prefix}_{key}_total", help, "counter",
+                            labels or {}, value))
+        else:
+            samples.append((f"{prefix}_{key}", help, "gauge",
+                            labels or {}, value))
+
+    return samples
+
+
+def process_samples() -> List[Sample]:
+    """Return the CPU time and memory of this process.
+
+    Returns:
+        List[Sample]: `process_cpu_seconds_total` and, except on Windows,
+        `process_resident_memory_bytes`.
+    """
+    cpu_sample = ("process_cpu_seconds_total",
+                  "User and system CPU time spent", "counter", {})
+
+    try:
+        import resource
+    except ImportError:
+        # Windows has no resource module, only the CPU time is known.
+        return [(*cpu_sample, time.process_time())]
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # ru_maxrss is the peak, in bytes on macOS and in KiB elsewhere. The
+    # current size is only known on Linux.
+    rss = usage.ru_maxrss
+
+    if sys.platform != "darwin":
+        rss *= 1024
+
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as file:
+            rss = int(file.read().split()[1]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        pass
+
+    return [
+        (*cpu_sample, usage.ru_utime + usage.ru_stime),
+        ("process_resident_memory_bytes", "Resident memory size", "gauge",
+         {}, rss),
+    ]
+
+
+metrics = MetricsRegistry()
+metrics.add_collector(process_samples)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Records the latency and document counts of every MongoDB command.
+
+    Attributes:
+        _started (Dict[Tuple[Any, int], Tuple[str, str]]): Connection and
+        request id of running commands -> command and collection name.
+    """
+
+    def __init__(self) -> None:
+        """Create the listener and its metrics."""
+        self._started: Dict[Tuple[Any, int], Tuple[str, str]] = {}
+        self._latency = metrics.histogram(
+            "mongodb_command_duration_seconds",
+            "Duration of MongoDB commands",
+            ("command", "collection"),
+        )
+        self._documents = metrics.counter(
+            "mongodb_command_documents_total",
+            "Documents returned or written by MongoDB commands",
+            ("command", "collection"),
+        )
+        self._failures = metrics.counter(
+            "mongodb_command_failures_total",
+            "Failed MongoDB commands",
+            ("command", "collection"),
+        )
+
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        name = event.command_name
+        target = event.command.get(name)
+
+        if name == "getMore":
+            target = event.command.get("collection")
+
+        collection = target if isinstance(target, str) else ""
+        key = (event.connection_id, event.request_id)
+        self._started[key] = (name, collection)
+
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        labels = self._finish(event)
+        self._latency.observe(labels, event.duration_micros / 1e6)
+        record_phase("db", event.duration_micros / 1e6)
+        documents = _count_documents(event.reply)
+
+        if documents:
+            self._documents.inc(labels, documents)
+
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        labels = self._finish(event)
+        self._latency.observe(labels, event.duration_micros / 1e6)
+        record_phase("db", event.duration_micros / 1e6)
+        self._failures.inc(labels)
+
+
+    def _finish(self, event: Any) -> Labels:
+        """Forget the started command and return its labels.
+
+        Args:
+            event (Any): Succeeded or failed event of the command.
+
+        Returns:
+            Labels: Command and collection name.
+        """
+        key = (event.connection_id, event.request_id)
+
+        return self._started.pop(key, (event.command_name, ""))
+
+
+def _count_documents(reply: Any) -> int:
+    """Count the documents a command returned or wrote.
+
+    Args:
+        reply (Any): Reply of the command.
+
+    Returns:
+        int: Number of documents, 0 if unknown.
+    """
+    try:
+        cursor = reply.get("cursor")
+
+        if cursor is not None:
+            batch = cursor.get("firstBatch", cursor.get("nextBatch", []))
+            return len(batch)
+
+        if "n" in reply:
+            return int(reply["n"])
+
+        if reply.get("value") is not None:
+            return 1
+    except (AttributeError, TypeError, ValueError):
+        pass
+
+    return 0
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """Records the size of the connection pools and the checkout waits."""
+
+    def __init__(self) -> None:
+        """Create the listener and its metrics."""
+        self._open = metrics.gauge(
+            "mongodb_pool_connections",
+            "Open connections of the pool",
+            ("address",),
+        )
+        self._checked_out = metrics.gauge(
+            "mongodb_pool_checked_out_connections",
+            "Connections currently checked out of the pool",
+            ("address",),
+        )
+        self._wait = metrics.histogram(
+            "mongodb_pool_checkout_wait_seconds",
+            "Time spent waiting for a connection from the pool",
+            ("address",),
+        )
+        self._failures = metrics.counter(
+            "mongodb_pool_checkout_failures_total",
+            "Failed connection checkouts",
+            ("address", "reason"),
+        )
+        self._cleared = metrics.counter(
+            "mongodb_pool_cleared_total",
+            "Times the pool was cleared after an error",
+            ("address",),
+        )
+
+
+    def _change(self, gauge: Gauge, address: Any, delta: int) -> None:
+        """Add the delta to the gauge of the address.
+
+        Args:
+            gauge (Gauge): Gauge to change.
+            address (Any): Host and port of the server.
+            delta (int): Change of the value.
+        """
+        labels = (_address(address),)
+        gauge.inc(labels, delta)
+
+
+    def connection_created(self, event: Any) -> None:
+        self._change(self._open, event.address, 1)
+
+
+    def connection_closed(self, event: Any) -> None:
+        self._change(self._open, event.address, -1)
+
+
+    def connection_checked_out(self, event: Any) -> None:
+        self._change(self._checked_out, event.address, 1)
+        self._wait.observe((_address(event.address),), event.duration)
+
+
+    def connection_checked_in(self, event: Any) -> None:
+        self._change(self._checked_out, event.address, -1)
+
+
+    def connection_check_out_failed(self, event: Any) -> None:
+        address = _address(event.address)
+        self._failures.inc((address, str(event.reason)))
+        self._wait.observe((address,), event.duration)
+
+
+    def pool_cleared(self, event: Any) -> None:
+        self._cleared.inc((_address(event.address),))
+
+
+    def pool_created(self, event: Any) -> None:
+        pass
+
+
+    def pool_ready(self, event: Any) -> None:
+        pass
+
+
+    def pool_closed(self, event: Any) -> None:
+        pass
+
+
+    def connection_ready(self, event: Any) -> None:
+        pass
+
+
+    def connection_check_out_started(self, event: Any) -> None:
+        pass
+
+
+def _address(address: Any) -> str:
+    """Format the address of a server.
+
+    Args:
+        address (Any): Host and port tuple.
+
+    Returns:
+        str: `host:port`.
+    """
+    host, port = address
+
+    return f"{host}:{port}"
@@ -0,0 +1,465 @@
+"""Opt-in statistical profiling of single requests.
+
+A request is profiled when it carries the `X-Profile` header together with
+the access token of an admin, or when it is picked by the random
+`PROFILE_SAMPLE_RATE`. All other requests only pay for one header lookup and
+one comparison.
+
+While at least one request is profiled, a sampler thread wakes up every
+`PROFILE_INTERVAL_MS` and looks at the stack of the event loop thread. A
+sample belongs to a profiled request if the request is running on the loop:
+the middleware drives the request through a wrapper that marks every step of
+it, on the loop thread, as it runs. Samples taken while another coroutine
+runs, or while no coroutine runs because the loop waits for I/O, are counted
+as "[other task]" and "[awaiting]", so the profile also shows how much of the
+wall time the request spent off the CPU.
+
+Each profile is written in the folded stack format, which flamegraph.pl and
+speedscope turn into a flame graph, next to a JSON file with its metadata.
+`PROFILE_DIR` keeps the newest `PROFILE_MAX_FILES` profiles, older ones are
+deleted.
+"""
+
+import asyncio
+import inspect
+import os
+import random
+import sys
+import threading
+import time
+
+from collections import Counter
+from datetime import datetime, timezone
+from types import FrameType
+from typing import Any, Awaitable, Coroutine, Dict, List, Optional
+from uuid import uuid4
+
+from internals.auth import is_admin_token
+from internals.latency import Message, Receive, Scope, Send, route_template
+from models.profile import ProfileInfo
+from settings import Settings
+
+PROFILE_HEADER = b"x-profile"
+AWAITING = "[awaiting]"
+OTHER_TASK = "[other task]"
+COROUTINE_FLAGS = inspect.CO_COROUTINE | inspect.CO_ASYNC_GENERATOR
+
+settings = Settings()
+
+
+def _frame_name(frame: FrameType) -> str:
+    """Return the name of the function of the frame for the folded stack.
+
+    Args:
+        frame (FrameType): Stack frame.
+
+    Returns:
+        str: `function (path:line)` with the path shortened.
+    """
+    code = frame.f_code
+    path = code.co_filename
+
+    # An empty entry of `sys.path` is the working directory.
+    for prefix in sorted(map(os.path.abspath, sys.path), key=len,
+                         reverse=True):
+        if path.startswith(prefix + os.sep):
+            path = path[len(prefix) + 1:]
+            break
+
+    # Semicolons separate the frames in the folded format.
+    return f"{code.co_name} ({path}:{code.co_firstlineno})".replace(";", ",")
+
+
+def _folded_stack(frame: Optional[FrameType]) -> str:
+    """Return the stack of the frame, outermost frame first.
+
+    Args:
+        frame (Optional[FrameType]): Innermost frame.
+
+    Returns:
+        str: Frame names joined by semicolons.
+    """
+    names: List[str] = []
+
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+
+    return ";".join(reversed(names))
+
+
+def _in_coroutine(frame: Optional[FrameType]) -> bool:
+    """Check if the stack of the frame runs a coroutine.
+
+    Args:
+        frame (Optional[FrameType]): Innermost frame.
+
+    Returns:
+        bool: False if the loop only runs its own code or plain callbacks.
+    """
+    while frame is not None:
+        if frame.f_code.co_flags & COROUTINE_FLAGS:
+            return True
+
+        frame = frame.f_back
+
+    return False
+
+
+class _Steps:
+    """Awaitable driving a coroutine and marking it as running in the
+    sampler while one of its steps runs.
+
+    Awaiting it makes the task of the request call `send` and `throw` on the
+    loop thread for every step of the coroutine.
+    """
+
+    def __init__(self, sampler: "Sampler", task: asyncio.Task,
+                 coro: Coroutine) -> None:
+        """Wrap the coroutine.
+
+        Args:
+            sampler (Sampler): The sampler to mark the steps in.
+            task (asyncio.Task): Task of the profiled request.
+            coro (Coroutine): The request handling.
+        """
+        self._sampler = sampler
+        self._task = task
+        self._coro = coro
+
+
+    def __await__(self) -> "_Steps":
+        """Return the iterator the awaiting task drives."""
+        return self
+
+
+    def __iter__(self) -> "_Steps":
+        """Return the iterator itself."""
+        return self
+
+
+    def __next__(self) -> Any:
+        """Run the next step of the coroutine."""
+        return self.send(None)
+
+
+    def send(self, value: Any) -> Any:
+        """Run the next step of the coroutine with the result it awaited."""
+        previous = self._sampler.running
+        self._sampler.running = self._task
+
+        try:
+            return self._coro.send(value)
+        finally:
+            self._sampler.running = previous
+
+
+    def throw(self, *args: Any) -> Any:
+        """Run the next step of the coroutine with the error it awaited."""
+        previous = self._sampler.running
+        self._sampler.running = self._task
+
+        try:
+            return self._coro.throw(*args)
+        finally:
+            self._sampler.running = previous
+
+
+    def close(self) -> None:
+        """Close the coroutine."""
+        self._coro.close()
+
+
+class Sampler:
+    """Samples the stack of the event loop thread for the profiled tasks.
+
+    Attributes:
+        interval (float): Seconds between two samples.
+        running (Optional[asyncio.Task]): The profiled task whose step runs
+        right now, only set by the loop thread.
+        _profiles (Dict[asyncio.Task, Counter]): Profiled task -> folded
+        stack -> number of samples.
+        _thread_id (Optional[int]): Id of the thread running the loop.
+        _lock (threading.Lock): Guards `_profiles`.
+        _thread (Optional[threading.Thread]): The sampler thread, only
+        running while there are profiled tasks.
+    """
+
+    def __init__(self, interval: float) -> None:
+        """Create the sampler, its thread starts with the first profile.
+
+        Args:
+            interval (float): Seconds between two samples.
+        """
+        self.interval = interval
+        self.running: Optional[asyncio.Task] = None
+        self._profiles: Dict[asyncio.Task, Counter] = {}
+        self._thread_id: Optional[int] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+
+    def start(self, task: asyncio.Task) -> None:
+        """Start sampling the task.
+
+        Args:
+            task (asyncio.Task): Task of the profiled request.
+        """
+        with self._lock:
+            self._thread_id = threading.get_ident()
+            self._profiles[task] = Counter()
+
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run,
+                                                name="request-profiler",
+                                                daemon=True)
+                self._thread.start()
+
+
+    def steps(self, task: asyncio.Task, coro: Coroutine) -> Awaitable:
+        """Wrap the handling of the profiled request, so its samples are
+        attributed to it.
+
+        Args:
+            task (asyncio.Task): Task of the profiled request.
+            coro (Coroutine): The request handling, run in that task.
+
+        Returns:
+            Awaitable: Awaitable running the coroutine.
+        """
+        return _Steps(self, task, coro)
+
+
+    def stop(self, task: asyncio.Task) -> Counter:
+        """Stop sampling the task.
+
+        Args:
+            task (asyncio.Task): Task of the profiled request.
+
+        Returns:
+            Counter: Folded stack -> number of samples.
+        """
+        with self._lock:
+            return self._profiles.pop(task, Counter())
+
+
+    def _run(self) -> None:
+        """Take samples until no task is profiled anymore."""
+        while True:
+            time.sleep(self.interval)
+
+            with self._lock:
+                if not self._profiles:
+                    self._thread = None
+                    return
+
+                # The attribute is only written by the loop thread, reading
+                # a reference is atomic.
+                running = self.running
+                frame = sys._current_frames().get(self._thread_id)
+
+                for task, samples in self._profiles.items():
+                    if task is running:
+                        samples[_folded_stack(frame)] += 1
+                    elif _in_coroutine(frame):
+                        samples[OTHER_TASK] += 1
+                    else:
+                        samples[AWAITING] += 1
+
+
+class ProfileStore:
+    """Bounded ring of profiles on disk.
+
+    Attributes:
+        directory (str): Directory with the profiles.
+        max_files (int): Number of profiles kept.
+    """
+
+    def __init__(self, directory: str, max_files: int) -> None:
+        """Create the store, the directory is created on the first save.
+
+        Args:
+            directory (str): Directory with the profiles.
+            max_files (int): Number of profiles kept.
+        """
+        self.directory = directory
+        self.max_files = max_files
+
+
+    def save(self, info: ProfileInfo, samples: Counter) -> None:
+        """Write the profile and delete the oldest ones beyond the limit.
+
+        Blocking, call it in a worker thread.
+
+        Args:
+            info (ProfileInfo): Metadata of the profile.
+            samples (Counter): Folded stack -> number of samples.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, info.name)
+
+        with open(f"{base}.folded", "w", encoding="utf-8") as file:
+            for stack, count in samples.most_common():
+                file.write(f"{stack} {count}\n")
+
+        with open(f"{base}.json", "w", encoding="utf-8") as file:
+            file.write(info.model_dump_json(by_alias=True))
+
+        for old in self.list()[self.max_files:]:
+            for extension in (".json", ".folded"):
+                path = os.path.join(self.directory, old.name + extension)
+
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+    def list(self) -> List[ProfileInfo]:
+        """Return the metadata of the stored profiles, newest first.
+
+        Blocking, call it in a worker thread.
+
+        Returns:
+            List[ProfileInfo]: The profiles.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+
+        profiles = []
+
+        for entry in os.listdir(self.directory):
+            if not entry.endswith(".json"):
+                continue
+
+            path = os.path.join(self.directory, entry)
+
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    profiles.append(ProfileInfo.model_validate_json(
+                        file.read()))
+            except (OSError, ValueError):
+                continue
+
+        profiles.sort(key=lambda info: info.name, reverse=True)
+
+        return profiles
+
+
+    def path(self, name: str) -> Optional[str]:
+        """Return the path of the folded stacks of the profile.
+
+        Args:
+            name (str): Name of the profile.
+
+        Returns:
+            Optional[str]: The path, None if the profile does not exist or
+            the name is not a plain file name.
+        """
+        if os.path.basename(name) != name or name.startswith("."):
+            return None
+
+        path = os.path.join(self.directory, f"{name}.folded")
+
+        return path if os.path.isfile(path) else None
+
+
+class ProfilerMiddleware:
+    """Profiles the selected requests, see the module documentation.
+
+    Attributes:
+        app (Callable): The wrapped ASGI application.
+        sample_rate (float): Fraction of requests profiled at random.
+    """
+
+    def __init__(self, app: Any) -> None:
+        """Wrap the application.
+
+        Args:
+            app (Callable): ASGI application.
+        """
+        self.app = app
+        self.sample_rate = settings.PROFILE_SAMPLE_RATE
+
+
+    async def __call__(self, scope: Scope, receive: Receive,
+                       send: Send) -> None:
+        """Handle one ASGI connection, profiling it if it was selected.
+
+        Args:
+            scope (Scope): ASGI scope.
+            receive (Receive): ASGI receive channel.
+            send (Send): ASGI send channel.
+        """
+        if scope["type"] != "http" or not await self._selected(scope):
+            await self.app(scope, receive, send)
+            return
+
+        task = asyncio.current_task()
+        start = time.perf_counter()
+        status = 500
+
+        async def send_status(message: Message) -> None:
+            nonlocal status
+
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+            await send(message)
+
+        sampler.start(task)
+
+        try:
+            await sampler.steps(task, self.app(scope, receive, send_status))
+        finally:
+            samples = sampler.stop(task)
+            await self._save(scope, status, time.perf_counter() - start,
+                             samples)
+
+
+    async def _selected(self, scope: Scope) -> bool:
+        """Check if the request should be profiled.
+
+        Args:
+            scope (Scope): ASGI scope.
+
+        Returns:
+            bool: True for requests with the profile header and an admin
+            token, or if picked at random.
+        """
+        headers = dict(scope.get("headers", ()))
+
+        if PROFILE_HEADER in headers:
+            authorization = headers.get(b"authorization", b"").decode()
+            scheme, _, token = authorization.partition(" ")
+
+            return scheme.lower() == "bearer" and await is_admin_token(token)
+
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+
+    async def _save(self, scope: Scope, status: int, duration: float,
+                    samples: Counter) -> None:
+        """Store the profile of the finished request.
+
+        Args:
+            scope (Scope): ASGI scope after routing.
+            status (int): Status code of the response.
+            duration (float): Duration of the request in seconds.
+            samples (Counter): Folded stack -> number of samples.
+        """
+        now = datetime.now(timezone.utc)
+        info = ProfileInfo(
+            name=f"{now:%Y%m%dT%H%M%S%f}-{uuid4().hex[:6]}",
+            method=scope["method"],
+            route=route_template(scope),
+            path=scope["path"],
+            status=status,
+            duration_ms=round(duration * 1000, 2),
+            samples=sum(samples.values()),
+            created_at=now,
+        )
+
+        await asyncio.to_thread(profile_store.save, info, samples)
+
+
+sampler = Sampler(settings.PROFILE_INTERVAL_MS / 1000)
+profile_store = ProfileStore(settings.PROFILE_DIR, settings.PROFILE_MAX_FILES)
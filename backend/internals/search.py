@@ -0,0 +1,270 @@
+"""In-memory inverted index used for full-text search over ideas.
+
+This module provides a small BM25 ranked inverted index. The index is kept in
+process memory and is updated incrementally by the CRUD functions in
+`crud.ideas`, so searching never has to scan the whole collection.
+
+The index can be written to and loaded from a JSON snapshot, which lets the
+application skip the full rebuild from MongoDB on restart. The snapshot keeps
+the `syncVersion` every document was indexed at, so the documents written
+since it was taken can be found and indexed again.
+
+Example:
+    search_index.add("id", {"title": "Solar boat", "description": "..."})
+    search_index.search("boat")
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+
+from typing import Dict, List, Mapping, Optional, Tuple
+
+FIELD_WEIGHTS: Dict[str, float] = {
+    "title": 3.0,
+    "description": 1.5,
+    "longDescription": 1.0,
+}
+SNAPSHOT_VERSION = 2
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split the text into lowercase word tokens.
+
+    Args:
+        text (Optional[str]): Text to tokenize.
+
+    Returns:
+        List[str]: Tokens found in the text.
+    """
+    if not text:
+        return []
+
+    return TOKEN_RE.findall(text.lower())
+
+
+class SearchIndex:
+    """Inverted index with BM25 ranking.
+
+    Term frequencies are weighted by the field they come from, so a match in
+    the title counts more than a match in the long description.
+
+    Attributes:
+        k1 (float): BM25 term frequency saturation parameter.
+        b (float): BM25 document length normalization parameter.
+        _postings (Dict[str, Dict[str, float]]): Term -> document -> weighted
+        term frequency.
+        _doc_terms (Dict[str, Dict[str, float]]): Document -> term -> weighted
+        term frequency, used to remove a document from the postings.
+        _doc_len (Dict[str, float]): Weighted length of each document.
+        _doc_versions (Dict[str, int]): Sync version of each document when
+        it was indexed.
+        _total_len (float): Sum of all document lengths.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75) -> None:
+        """Create an empty index.
+
+        Args:
+            k1 (float): BM25 term frequency saturation parameter.
+            b (float): BM25 document length normalization parameter.
+        """
+        self.k1 = k1
+        self.b = b
+        self.clear()
+
+
+    def __len__(self) -> int:
+        """Return the number of indexed documents."""
+        return len(self._doc_len)
+
+
+    def __contains__(self, doc_id: str) -> bool:
+        """Check if the document is indexed."""
+        return doc_id in self._doc_len
+
+
+    def clear(self) -> None:
+        """Remove all documents from the index."""
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._doc_terms: Dict[str, Dict[str, float]] = {}
+        self._doc_len: Dict[str, float] = {}
+        self._doc_versions: Dict[str, int] = {}
+        self._total_len: float = 0.0
+
+
+    def version(self, doc_id: str) -> Optional[int]:
+        """Return the sync version the document was indexed at.
+
+        Args:
+            doc_id (str): Id of the document.
+
+        Returns:
+            Optional[int]: The version, None if the document is not indexed.
+        """
+        return self._doc_versions.get(doc_id)
+
+
+    def doc_ids(self) -> List[str]:
+        """Return the ids of all indexed documents."""
+        return list(self._doc_len)
+
+
+    def add(self, doc_id: str, fields: Mapping[str, Optional[str]]) -> None:
+        """Index the document, replacing its previous version if present.
+
+        Args:
+            doc_id (str): Id of the document.
+            fields (Mapping[str, Optional[str]]): Document fields by their
+            database names. Only the fields in `FIELD_WEIGHTS` are indexed,
+            the `syncVersion` is kept to validate snapshots.
+        """
+        terms: Dict[str, float] = {}
+
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(fields.get(field)):
+                terms[token] = terms.get(token, 0.0) + weight
+
+        self._set_terms(doc_id, terms, fields.get("syncVersion") or 0)
+
+
+    def remove(self, doc_id: str) -> None:
+        """Remove the document from the index if it is present.
+
+        Args:
+            doc_id (str): Id of the document.
+        """
+        terms = self._doc_terms.pop(doc_id, None)
+
+        if terms is None:
+            return
+
+        for term in terms:
+            postings = self._postings.get(term)
+
+            if postings is None:
+                continue
+
+            postings.pop(doc_id, None)
+
+            if not postings:
+                del self._postings[term]
+
+        self._total_len -= self._doc_len.pop(doc_id)
+        self._doc_versions.pop(doc_id, None)
+
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, float]]:
+        """Find the documents that best match the query.
+
+        Args:
+            query (str): Free text query.
+            limit (int): Maximum number of results.
+
+        Returns:
+            List[Tuple[str, float]]: Document ids with their scores, best
+            match first.
+        """
+        doc_count = len(self._doc_len)
+
+        if doc_count == 0 or limit <= 0:
+            return []
+
+        avg_len = self._total_len / doc_count or 1.0
+        scores: Dict[str, float] = {}
+
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+
+            if not postings:
+                continue
+
+            df = len(postings)
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+
+            for doc_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._doc_len[doc_id] / avg_len)
+                scores[doc_id] = (scores.get(doc_id, 0.0)
+                                  + idf * tf * (self.k1 + 1) / (tf + norm))
+
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+
+    def save(self, path: str) -> None:
+        """Write a snapshot of the index to a file.
+
+        The snapshot is written to a temporary file of this process first and
+        then moved into place, so neither a crash nor another worker saving
+        at the same time leaves a partially written snapshot behind.
+
+        Args:
+            path (str): Path of the snapshot file.
+        """
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "fields": FIELD_WEIGHTS,
+            "docs": self._doc_terms,
+            "versions": self._doc_versions,
+        }
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(snapshot, file, separators=(",", ":"))
+
+        os.replace(tmp_path, path)
+
+
+    def load(self, path: str) -> bool:
+        """Replace the index content with a snapshot from a file.
+
+        Args:
+            path (str): Path of the snapshot file.
+
+        Returns:
+            bool: True if the snapshot was loaded, False if it is missing or
+            was created with different settings.
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                snapshot = json.load(file)
+        except (OSError, ValueError):
+            return False
+
+        if (snapshot.get("version") != SNAPSHOT_VERSION
+                or snapshot.get("fields") != FIELD_WEIGHTS):
+            return False
+
+        self.clear()
+        versions = snapshot.get("versions", {})
+
+        for doc_id, terms in snapshot.get("docs", {}).items():
+            self._set_terms(doc_id, terms, versions.get(doc_id, 0))
+
+        return True
+
+
+    def _set_terms(self, doc_id: str, terms: Dict[str, float],
+                   version: int) -> None:
+        """Store the precomputed term frequencies of the document.
+
+        Args:
+            doc_id (str): Id of the document.
+            terms (Dict[str, float]): Term -> weighted term frequency.
+            version (int): Sync version of the document.
+        """
+        self.remove(doc_id)
+
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+
+        length = sum(terms.values())
+        self._doc_terms[doc_id] = terms
+        self._doc_len[doc_id] = length
+        self._doc_versions[doc_id] = version
+        self._total_len += length
+
+
+search_index = SearchIndex()
@@ -0,0 +1,187 @@
+"""Fast JSON serialization for data read straight from MongoDB.
+
+Documents we just loaded from our own collection already have the shape of
+the response models, so validating them into Pydantic objects and then
+dumping those objects again only costs time. `TrustedReader` turns a raw
+document into a plain dict with exactly the keys, order and defaults that
+`model.model_dump(by_alias=True)` would produce, and `dumps` encodes it to
+bytes with orjson when it is installed, or with the standard library
+otherwise.
+
+For large listings `stream_json_array` goes one step further: it reads
+`RawBSONDocument`s, which the driver hands over as undecoded bytes, decodes
+only the projected fields of one document at a time and yields the JSON array
+in chunks, so the whole list is never held in memory. `json_array_chunks`
+does the same for documents that are already decoded, like the ones of the
+in-memory repositories.
+
+The trusted path is only meant for flat models whose documents are written
+by this application. Anything coming from clients still goes through the
+regular validation.
+
+Example:
+    reader = TrustedReader(IdeaGet)
+    docs = [reader(doc) async for doc in ideas.find({}, reader.projection)]
+    body = dumps(docs)
+"""
+
+import bson
+import json
+import time
+
+from bson import ObjectId
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pydantic import BaseModel
+from typing import Any, AsyncIterator, Callable, Dict, List, Tuple, Type
+
+from internals.timing import record_phase
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+RAW_CODEC_OPTIONS = CodecOptions(document_class=RawBSONDocument)
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode the object as compact UTF-8 JSON.
+
+    Args:
+        obj (Any): JSON compatible object.
+
+    Returns:
+        bytes: Encoded JSON.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+
+    return json.dumps(obj, ensure_ascii=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+class TrustedReader:
+    """Converts raw documents to response dicts of a model without
+    validation.
+
+    Attributes:
+        projection (Dict[str, int]): MongoDB projection with only the fields
+        of the model.
+        _fields (List[Tuple[str, Callable[[], Any]]]): Alias of each field and
+        a function returning its default.
+    """
+
+    def __init__(self, model: Type[BaseModel]) -> None:
+        """Precompute the field layout of the model.
+
+        Args:
+            model (Type[BaseModel]): Response model the documents follow.
+        """
+        self._fields: List[Tuple[str, Callable[[], Any]]] = []
+
+        for name, field in model.model_fields.items():
+            alias = field.alias or name
+
+            if field.default_factory is not None:
+                default = field.default_factory
+            elif field.is_required():
+                default = lambda: None
+            else:
+                default = (lambda value: lambda: value)(field.get_default())
+
+            self._fields.append((alias, default))
+
+        self.projection: Dict[str, int] = {
+            alias: 1 for alias, _ in self._fields
+        }
+
+
+    def __call__(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the response dict for the document.
+
+        Args:
+            doc (Dict[str, Any]): Raw document from MongoDB.
+
+        Returns:
+            Dict[str, Any]: JSON compatible dict shaped like the model dump.
+        """
+        result = {}
+
+        for alias, default in self._fields:
+            value = doc.get(alias)
+
+            if value is None:
+                value = default()
+            elif isinstance(value, ObjectId):
+                value = str(value)
+
+            result[alias] = value
+
+        return result
+
+
+async def stream_json_array(
+    collection: Any,
+    reader: TrustedReader,
+    query: Dict[str, Any],
+    chunk_size: int = 500,
+) -> AsyncIterator[bytes]:
+    """Stream the matching documents as one JSON array, chunk by chunk.
+
+    Args:
+        collection (AsyncCollection): Collection to read from.
+        reader (TrustedReader): Reader of the response model.
+        query (Dict[str, Any]): MongoDB filter.
+        chunk_size (int): Documents per yielded chunk, also the cursor batch
+        size.
+
+    Yields:
+        bytes: Consecutive parts of the JSON array.
+    """
+    raw = collection.with_options(codec_options=RAW_CODEC_OPTIONS)
+    cursor = raw.find(query, reader.projection, batch_size=chunk_size)
+
+    async def decoded() -> AsyncIterator[Dict[str, Any]]:
+        async for doc in cursor:
+            # Decoding the raw bytes in one call is cheaper than letting
+            # RawBSONDocument inflate itself on the first key lookup.
+            yield bson.decode(doc.raw)
+
+    async for part in json_array_chunks(decoded(), reader, chunk_size):
+        yield part
+
+
+async def json_array_chunks(
+    docs: AsyncIterator[Dict[str, Any]],
+    reader: TrustedReader,
+    chunk_size: int = 500,
+) -> AsyncIterator[bytes]:
+    """Encode the documents as one JSON array, chunk by chunk.
+
+    Args:
+        docs (AsyncIterator[Dict[str, Any]]): Decoded documents.
+        reader (TrustedReader): Reader of the response model.
+        chunk_size (int): Documents per yielded chunk.
+
+    Yields:
+        bytes: Consecutive parts of the JSON array.
+    """
+    chunk: List[bytes] = []
+    separator = b"["
+
+    async for doc in docs:
+        start = time.perf_counter()
+        chunk.append(dumps(reader(doc)))
+        record_phase("serialize", time.perf_counter() - start)
+
+        if len(chunk) == chunk_size:
+            yield separator + b",".join(chunk)
+            separator = b","
+            chunk = []
+
+    if chunk:
+        yield separator + b",".join(chunk)
+        separator = b","
+
+    yield b"]" if separator == b"," else b"[]"
@@ -0,0 +1,169 @@
+"""Per-request phase timing shared by the latency middleware and the code
+doing the timed work.
+
+`internals.latency.LatencyMiddleware` starts a `RequestTiming` for every HTTP
+request and stores it in a context variable. Code running for the request
+adds the time it spent in a phase with `timed_phase` or `record_phase`, the
+MongoDB command listener for example records every command as "db". Outside
+of a request both are no-ops.
+
+Phases can overlap: "auth" contains the user lookup that is also counted as
+"db", and concurrent queries of one request are all added up.
+
+Example:
+    with timed_phase("serialize"):
+        body = dumps(docs)
+
+    @timed("auth")
+    async def get_current_user(...):
+        ...
+"""
+
+import functools
+import time
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, TypeVar
+
+AsyncFunction = TypeVar("AsyncFunction",
+                        bound=Callable[..., Awaitable[Any]])
+
+
+class RequestTiming:
+    """Time spent in each phase of one request.
+
+    Attributes:
+        start (float): `time.perf_counter` at the start of the request.
+        phases (Dict[str, float]): Phase -> seconds spent in it.
+        counts (Dict[str, int]): Phase -> number of timed sections.
+    """
+
+    __slots__ = ("start", "phases", "counts")
+
+    def __init__(self) -> None:
+        """Start timing the request now."""
+        self.start = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+
+
+    def add(self, phase: str, seconds: float) -> None:
+        """Add time to the phase.
+
+        Args:
+            phase (str): Name of the phase.
+            seconds (float): Time spent.
+        """
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+        self.counts[phase] = self.counts.get(phase, 0) + 1
+
+
+    def elapsed(self) -> float:
+        """Return the seconds since the start of the request.
+
+        Returns:
+            float: Elapsed time.
+        """
+        return time.perf_counter() - self.start
+
+
+    def server_timing(self) -> str:
+        """Format the phases and the total as a Server-Timing header.
+
+        Returns:
+            str: Value of the header, durations in milliseconds.
+        """
+        entries = [
+            f'{phase};dur={seconds * 1000:.2f};desc="{self.counts[phase]}x"'
+            for phase, seconds in sorted(self.phases.items())
+        ]
+        entries.append(f"total;dur={self.elapsed() * 1000:.2f}")
+
+        return ", ".join(entries)
+
+
+_current: ContextVar[Optional[RequestTiming]] = ContextVar(
+    "request_timing", default=None)
+
+
+def current_timing() -> Optional[RequestTiming]:
+    """Return the timing of the current request.
+
+    Returns:
+        Optional[RequestTiming]: The timing, None outside of a request.
+    """
+    return _current.get()
+
+
+@contextmanager
+def request_timing() -> Iterator[RequestTiming]:
+    """Time a request, the block is the whole request.
+
+    Yields:
+        RequestTiming: The timing of the request.
+    """
+    timing = RequestTiming()
+    token = _current.set(timing)
+
+    try:
+        yield timing
+    finally:
+        _current.reset(token)
+
+
+def record_phase(phase: str, seconds: float) -> None:
+    """Add time to the phase of the current request, if there is one.
+
+    Args:
+        phase (str): Name of the phase.
+        seconds (float): Time spent.
+    """
+    timing = _current.get()
+
+    if timing is not None:
+        timing.add(phase, seconds)
+
+
+@contextmanager
+def timed_phase(phase: str) -> Iterator[None]:
+    """Add the time spent in the block to the phase of the current request.
+
+    Args:
+        phase (str): Name of the phase.
+    """
+    timing = _current.get()
+
+    if timing is None:
+        yield
+        return
+
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        timing.add(phase, time.perf_counter() - start)
+
+
+def timed(phase: str) -> Callable[[AsyncFunction], AsyncFunction]:
+    """Add the time spent in the decorated coroutine function to the phase.
+
+    The signature of the function is kept, so it still works as a FastAPI
+    dependency.
+
+    Args:
+        phase (str): Name of the phase.
+
+    Returns:
+        Callable[[AsyncFunction], AsyncFunction]: The decorator.
+    """
+    def decorate(function: AsyncFunction) -> AsyncFunction:
+        @functools.wraps(function)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with timed_phase(phase):
+                return await function(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
@@ -0,0 +1,224 @@
+"""Time-decayed engagement score used to rank the trending ideas feed.
+
+The trending score of an idea is the sum of the weights of all its engagement
+events (creation, likes, comments), each one decayed exponentially with the
+configured half-life. Decaying every score by the same factor does not change
+their order, so instead of decaying old events we grow the weight of new ones:
+
+    score = ln(sum(weight * exp((event_time - EPOCH) / tau)))
+
+The stored score never has to be recomputed as time passes. Every event only
+adds (or removes) its own term, and the feed is a plain descending sort on an
+indexed field. The score is kept in log space to avoid overflow. An undone
+event removes the term it added, so its time has to be known: the ideas keep
+the time of every like in `likedAt`, and comments have it in their ObjectId.
+
+The `*_expr` functions build MongoDB aggregation expressions, so the score
+is updated atomically together with the rest of the document. The functions
+without the suffix compute the same values in Python for the in-memory
+repositories.
+"""
+
+import math
+
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from settings import Settings
+
+EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+CREATE_WEIGHT = 1.0
+LIKE_WEIGHT = 1.0
+COMMENT_WEIGHT = 2.0
+SCORE_FIELD = "trendingScore"
+
+settings = Settings()
+TAU_SECONDS = settings.TRENDING_HALF_LIFE_HOURS * 3600 / math.log(2)
+
+
+def event_score(weight: float, when: Optional[datetime] = None) -> float:
+    """Return the log-space term of a single event.
+
+    Args:
+        weight (float): Weight of the event.
+        when (Optional[datetime]): Time of the event, defaults to now.
+
+    Returns:
+        float: Logarithm of the grown event weight.
+    """
+    when = when or datetime.now(timezone.utc)
+
+    return math.log(weight) + (when - EPOCH).total_seconds() / TAU_SECONDS
+
+
+def _event_score_expr(weight: float, when: Any) -> dict:
+    """Build the expression for the log-space term of a single event, like
+    `event_score`.
+
+    Args:
+        weight (float): Weight of the event.
+        when (Any): Time of the event, a datetime or an expression evaluating
+        to a date.
+
+    Returns:
+        dict: Aggregation expression with the term.
+    """
+    seconds = {"$divide": [{"$toLong": when}, 1000]}
+
+    return {"$add": [
+        math.log(weight),
+        {"$divide": [
+            {"$subtract": [seconds, EPOCH.timestamp()]},
+            TAU_SECONDS,
+        ]},
+    ]}
+
+
+def _creation_score_expr(weight: float = CREATE_WEIGHT) -> dict:
+    """Build the expression for the score of an event at the creation time of
+    the document, which is read from its ObjectId.
+    """
+    return _event_score_expr(weight, {"$toDate": "$_id"})
+
+
+def _current_score_expr() -> dict:
+    """Build the expression for the stored score, falling back to the
+    creation score for documents that were never scored.
+    """
+    return {"$ifNull": [f"${SCORE_FIELD}", _creation_score_expr()]}
+
+
+def add_event_expr(weight: float, when: Optional[datetime] = None) -> dict:
+    """Build the expression for the score after an event.
+
+    Args:
+        weight (float): Weight of the event.
+        when (Optional[datetime]): Time of the event, defaults to now.
+
+    Returns:
+        dict: Aggregation expression computing ln(exp(score) + exp(event)).
+    """
+    current = _current_score_expr()
+    event = event_score(weight, when)
+    high = {"$max": [current, event]}
+    low = {"$min": [current, event]}
+
+    return {"$add": [
+        high,
+        {"$ln": {"$add": [1, {"$exp": {"$subtract": [low, high]}}]}},
+    ]}
+
+
+def remove_event_expr(weight: float, when: Any) -> dict:
+    """Build the expression for the score after an event is undone.
+
+    The removed term is valued at the time of the event, so it takes away
+    exactly what the event once added. The result never drops below the
+    score the idea had when it was created, which only matters for rounding
+    errors and events whose time was not recorded exactly.
+
+    Args:
+        weight (float): Weight of the undone event.
+        when (Any): Time of the event, a datetime or an expression evaluating
+        to a date.
+
+    Returns:
+        dict: Aggregation expression computing ln(exp(score) - exp(event)).
+    """
+    current = _current_score_expr()
+    event = _event_score_expr(weight, when)
+    floor = _creation_score_expr()
+    remaining = {"$subtract": [1, {"$exp": {"$subtract": [event, current]}}]}
+
+    return {"$max": [
+        floor,
+        {"$cond": [
+            {"$gt": [remaining, 1e-12]},
+            {"$add": [current, {"$ln": remaining}]},
+            floor,
+        ]},
+    ]}
+
+
+def backfill_expr() -> dict:
+    """Build the expression scoring a document that has no score yet.
+
+    The likes of such a document are counted as if they happened at the
+    creation time, since the real time of the likes is not known.
+
+    Returns:
+        dict: Aggregation expression with the initial score.
+    """
+    likes = {"$size": {"$ifNull": ["$likedByUser", []]}}
+    weight = {"$add": [CREATE_WEIGHT, {"$multiply": [LIKE_WEIGHT, likes]}]}
+
+    return {"$add": [
+        {"$ln": weight},
+        {"$subtract": [_creation_score_expr(), math.log(CREATE_WEIGHT)]},
+    ]}
+
+
+def creation_score(created: datetime) -> float:
+    """Return the score of a document that had no events but its creation.
+
+    Args:
+        created (datetime): Creation time, the time of its ObjectId.
+
+    Returns:
+        float: The score, like `_creation_score_expr`.
+    """
+    return event_score(CREATE_WEIGHT, created)
+
+
+def add_event(score: float, weight: float,
+              when: Optional[datetime] = None) -> float:
+    """Return the score after an event, like `add_event_expr`.
+
+    Args:
+        score (float): The current score.
+        weight (float): Weight of the event.
+        when (Optional[datetime]): Time of the event, defaults to now.
+
+    Returns:
+        float: ln(exp(score) + exp(event)).
+    """
+    event = event_score(weight, when)
+    high, low = max(score, event), min(score, event)
+
+    return high + math.log1p(math.exp(low - high))
+
+
+def remove_event(score: float, weight: float, when: datetime,
+                 floor: float) -> float:
+    """Return the score after an event is undone, like `remove_event_expr`.
+
+    Args:
+        score (float): The current score.
+        weight (float): Weight of the undone event.
+        when (datetime): Time of the event.
+        floor (float): Score of the document at its creation.
+
+    Returns:
+        float: ln(exp(score) - exp(event)), at least `floor`.
+    """
+    remaining = 1 - math.exp(event_score(weight, when) - score)
+
+    if remaining <= 1e-12:
+        return floor
+
+    return max(floor, score + math.log(remaining))
+
+
+def backfill_score(created: datetime, likes: int) -> float:
+    """Return the initial score of a document, like `backfill_expr`.
+
+    Args:
+        created (datetime): Creation time of the document.
+        likes (int): Number of its likes.
+
+    Returns:
+        float: The score.
+    """
+    weight = CREATE_WEIGHT + LIKE_WEIGHT * likes
+
+    return math.log(weight) + creation_score(created) - math.log(CREATE_WEIGHT)
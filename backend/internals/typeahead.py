@@ -0,0 +1,288 @@
+"""In-memory prefix indexes used for autocomplete suggestions.
+
+The indexes keep their keys in a sorted array, so all the keys starting with a
+prefix form one contiguous slice that is found with two binary searches. Each
+entry also has a popularity score and suggestions are the most popular entries
+from that slice. The slices of the shortest prefixes cover a large part of the
+index, so their best entries are ranked once and kept until an entry under
+the prefix changes.
+
+Two indexes are kept for the whole application: `title_index` over idea
+titles, where the popularity is the number of likes, and `username_index` over
+usernames, where the popularity is the number of ideas the user created. Both
+are kept in sync by the CRUD modules.
+
+Example:
+    title_index.add("id", "Solar powered boat")
+    title_index.set_popularity("id", 3)
+    title_index.suggest("pow")
+"""
+
+import heapq
+
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Tuple
+
+MAX_KEY_LENGTH = 64
+# Prefixes up to this length keep their ranked suggestions.
+TOP_PREFIX_LENGTH = 2
+# Number of ranked suggestions kept per short prefix.
+TOP_SIZE = 50
+
+
+def normalize(text: str) -> str:
+    """Return the form of the text that is used for prefix matching.
+
+    Args:
+        text (str): Text to normalize.
+
+    Returns:
+        str: Case folded text with collapsed whitespace.
+    """
+    return " ".join(text.casefold().split())
+
+
+class PrefixIndex:
+    """Sorted array prefix index with popularity ranking.
+
+    Attributes:
+        match_words (bool): If True every word of the label can be matched,
+        not only its beginning.
+        _keys (List[Tuple[str, str]]): Sorted (key, item id) pairs.
+        _labels (Dict[str, str]): Item id -> original label.
+        _item_keys (Dict[str, List[str]]): Item id -> keys of that item.
+        _popularity (Dict[str, float]): Item id -> popularity score.
+        _top (Dict[str, List[str]]): Short prefix -> ids of its `TOP_SIZE`
+        best items, best first.
+    """
+
+    def __init__(self, match_words: bool = False) -> None:
+        """Create an empty index.
+
+        Args:
+            match_words (bool): If True every word of the label can be matched.
+        """
+        self.match_words = match_words
+        self._popularity: Dict[str, float] = {}
+        self._top: Dict[str, List[str]] = {}
+        self.clear()
+
+
+    def __len__(self) -> int:
+        """Return the number of indexed items."""
+        return len(self._labels)
+
+
+    def clear(self) -> None:
+        """Remove all items from the index.
+
+        Popularity scores are kept, they are cleared with `clear_popularity`.
+        """
+        self._keys: List[Tuple[str, str]] = []
+        self._labels: Dict[str, str] = {}
+        self._item_keys: Dict[str, List[str]] = {}
+        self._top.clear()
+
+
+    def clear_popularity(self) -> None:
+        """Reset the popularity of all items."""
+        self._popularity.clear()
+        self._top.clear()
+
+
+    def add(self, item_id: str, label: str) -> None:
+        """Index the item label, replacing the previous label of the item.
+
+        Args:
+            item_id (str): Id of the item.
+            label (str): Text that is suggested.
+        """
+        if self._labels.get(item_id) == label:
+            return
+
+        self._remove_keys(item_id)
+
+        keys = self._make_keys(label)
+
+        for key in keys:
+            insort(self._keys, (key, item_id))
+
+        self._labels[item_id] = label
+        self._item_keys[item_id] = keys
+        self._forget_top(item_id)
+
+
+    def add_many(self, items: Iterable[Tuple[str, str]]) -> None:
+        """Index many item labels, replacing the previous labels of the items.
+
+        The keys are sorted once for all items, which makes rebuilding the
+        index O(n log n) instead of the O(n^2) of calling `add` per item.
+
+        Args:
+            items (Iterable[Tuple[str, str]]): (item id, label) pairs.
+        """
+        labels = {item_id: label for item_id, label in items}
+        replaced = {item_id for item_id in labels
+                    if item_id in self._item_keys}
+
+        if replaced:
+            self._keys = [entry for entry in self._keys
+                          if entry[1] not in replaced]
+
+        for item_id, label in labels.items():
+            keys = self._make_keys(label)
+            self._keys.extend((key, item_id) for key in keys)
+            self._labels[item_id] = label
+            self._item_keys[item_id] = keys
+
+        self._keys.sort()
+        self._top.clear()
+
+
+    def remove(self, item_id: str) -> None:
+        """Remove the item and its popularity from the index.
+
+        Args:
+            item_id (str): Id of the item.
+        """
+        self._remove_keys(item_id)
+        self._popularity.pop(item_id, None)
+
+
+    def set_popularity(self, item_id: str, popularity: float) -> None:
+        """Set the popularity score of the item.
+
+        Args:
+            item_id (str): Id of the item.
+            popularity (float): New score.
+        """
+        if self._popularity.get(item_id) != popularity:
+            self._popularity[item_id] = popularity
+            self._forget_top(item_id)
+
+
+    def bump(self, item_id: str, delta: float) -> None:
+        """Change the popularity score of the item.
+
+        Args:
+            item_id (str): Id of the item.
+            delta (float): Value added to the current score.
+        """
+        self._popularity[item_id] = self._popularity.get(item_id, 0) + delta
+        self._forget_top(item_id)
+
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Tuple[str, str]]:
+        """Return the most popular items whose label starts with the prefix.
+
+        Args:
+            prefix (str): Typed text.
+            limit (int): Maximum number of suggestions.
+
+        Returns:
+            List[Tuple[str, str]]: (item id, label) pairs, most popular first.
+        """
+        prefix = normalize(prefix)[:MAX_KEY_LENGTH]
+
+        if not prefix or limit <= 0:
+            return []
+
+        if len(prefix) <= TOP_PREFIX_LENGTH and limit <= TOP_SIZE:
+            top = self._top.get(prefix)
+
+            if top is None:
+                top = self._top[prefix] = self._rank(prefix, TOP_SIZE)
+
+            best = top[:limit]
+        else:
+            best = self._rank(prefix, limit)
+
+        return [(item_id, self._labels[item_id]) for item_id in best]
+
+
+    def _rank(self, prefix: str, limit: int) -> List[str]:
+        """Rank the items with a key starting with the prefix.
+
+        Args:
+            prefix (str): Normalized prefix.
+            limit (int): Maximum number of items.
+
+        Returns:
+            List[str]: Ids of the items, most popular first.
+        """
+        start = bisect_left(self._keys, (prefix, ""))
+        # Every key starting with the prefix sorts before prefix + U+10FFFF.
+        end = bisect_left(self._keys, (prefix + "\U0010ffff", ""), lo=start)
+        item_ids = {item_id for _, item_id in self._keys[start:end]}
+
+        return heapq.nsmallest(
+            limit,
+            item_ids,
+            key=lambda item_id: (-self._popularity.get(item_id, 0),
+                                 self._labels[item_id].casefold()),
+        )
+
+
+    def _forget_top(self, item_id: str) -> None:
+        """Drop the ranked suggestions of the short prefixes of the item.
+
+        Args:
+            item_id (str): Id of the item.
+        """
+        if not self._top:
+            return
+
+        for key in self._item_keys.get(item_id, ()):
+            for length in range(1, TOP_PREFIX_LENGTH + 1):
+                self._top.pop(key[:length], None)
+
+
+    def _remove_keys(self, item_id: str) -> None:
+        """Remove the keys of the item if it is present.
+
+        Args:
+            item_id (str): Id of the item.
+        """
+        self._forget_top(item_id)
+        keys = self._item_keys.pop(item_id, None)
+
+        if keys is None:
+            return
+
+        del self._labels[item_id]
+
+        for key in keys:
+            position = bisect_left(self._keys, (key, item_id))
+
+            if position < len(self._keys) and self._keys[position] == (key, item_id):
+                del self._keys[position]
+
+
+    def _make_keys(self, label: str) -> List[str]:
+        """Build the keys under which the label can be found.
+
+        Args:
+            label (str): Text that is suggested.
+
+        Returns:
+            List[str]: The whole label and, if `match_words` is set, the
+            label from the start of each following word.
+        """
+        text = normalize(label)
+
+        if not text:
+            return []
+
+        keys = [text[:MAX_KEY_LENGTH]]
+
+        if self.match_words:
+            words = text.split(" ")
+
+            for i in range(1, len(words)):
+                keys.append(" ".join(words[i:])[:MAX_KEY_LENGTH])
+
+        return sorted(set(keys))
+
+
+title_index = PrefixIndex(match_words=True)
+username_index = PrefixIndex()
@@ -0,0 +1,207 @@
+"""Version counters and ETag support for frequently polled listings.
+
+The version of a scope is a counter of the storage, see
+`repositories.base.CounterRepository`, which every change to the data in the
+scope increments. The counters are shared by all API workers and command
+line tools writing to the same storage, so a change made by any of them
+changes the version. A listing endpoint derives a strong ETag from the
+current version of its scope, so it answers a matching `If-None-Match` with
+304 after reading a single counter instead of the whole listing, and it keeps
+the serialized body of the last version it produced, so repeated full
+responses are not serialized again.
+
+Writers bump the scope after the change is stored, never before, see
+`versioned_response`.
+
+Scopes:
+    "ideas:all": The list of all ideas.
+    "comments:<idea_id>": The comments of one idea.
+"""
+
+from collections import OrderedDict
+from fastapi import Request, Response, status
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from internals.timing import timed_phase
+from repositories import get_counter_repository
+from repositories.base import CounterRepository
+from settings import Settings
+
+IDEAS_SCOPE = "ideas:all"
+
+settings = Settings()
+
+
+def comments_scope(idea_id: str) -> str:
+    """Return the scope of the comments of the idea.
+
+    Args:
+        idea_id (str): Id of the idea.
+
+    Returns:
+        str: Name of the scope.
+    """
+    return f"comments:{idea_id}"
+
+
+class VersionRegistry:
+    """Per-scope versions stored as counters, with a bounded cache of
+    serialized bodies.
+
+    Attributes:
+        counters (CounterRepository): Counters holding the versions.
+        max_bodies (int): Maximum number of cached bodies.
+        _bodies (OrderedDict): Scope -> (version, body), least recently used
+        first.
+    """
+
+    def __init__(self, counters: CounterRepository, max_bodies: int) -> None:
+        """Create the registry.
+
+        Args:
+            counters (CounterRepository): Counters holding the versions.
+            max_bodies (int): Maximum number of cached bodies.
+        """
+        self.counters = counters
+        self.max_bodies = max_bodies
+        self._bodies: OrderedDict = OrderedDict()
+
+
+    async def version(self, scope: str) -> int:
+        """Read the current version of the scope.
+
+        Args:
+            scope (str): Name of the scope.
+
+        Returns:
+            int: Current version.
+        """
+        return await self.counters.get(scope)
+
+
+    async def bump(self, scope: str) -> None:
+        """Mark the data in the scope as changed. Called after the change is
+        stored.
+
+        Args:
+            scope (str): Name of the scope.
+        """
+        await self.counters.increment(scope)
+        self._bodies.pop(scope, None)
+
+
+    def etag(self, scope: str, version: int) -> str:
+        """Return the strong ETag of the version of the scope.
+
+        Args:
+            scope (str): Name of the scope.
+            version (int): Version to tag.
+
+        Returns:
+            str: Quoted ETag value.
+        """
+        return f'"{scope}-{version}"'
+
+
+    def get_body(self, scope: str, version: int) -> Optional[bytes]:
+        """Return the cached body of the version of the scope.
+
+        Args:
+            scope (str): Name of the scope.
+            version (int): Wanted version.
+
+        Returns:
+            Optional[bytes]: The body, None if it is not cached.
+        """
+        cached: Optional[Tuple[int, bytes]] = self._bodies.get(scope)
+
+        if cached is None or cached[0] != version:
+            return None
+
+        self._bodies.move_to_end(scope)
+
+        return cached[1]
+
+
+    def store_body(self, scope: str, version: int, body: bytes) -> None:
+        """Cache the body of the version of the scope.
+
+        Args:
+            scope (str): Name of the scope.
+            version (int): Version read before the data of the body.
+            body (bytes): Serialized body.
+        """
+        if self.max_bodies <= 0:
+            return
+
+        self._bodies[scope] = (version, body)
+        self._bodies.move_to_end(scope)
+
+        while len(self._bodies) > self.max_bodies:
+            self._bodies.popitem(last=False)
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Check if the If-None-Match header matches the ETag.
+
+    Args:
+        header (Optional[str]): Value of the If-None-Match header.
+        etag (str): Current ETag.
+
+    Returns:
+        bool: True if the client already has the current version.
+    """
+    if not header:
+        return False
+
+    tags = [tag.strip() for tag in header.split(",")]
+
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+async def versioned_response(
+    request: Request,
+    scope: str,
+    load: Callable[[], Awaitable[Any]],
+    serialize: Callable[[Any], bytes],
+) -> Response:
+    """Build a JSON response for the scope, honouring If-None-Match.
+
+    Args:
+        request (Request): Incoming request.
+        scope (str): Scope of the returned data.
+        load (Callable[[], Awaitable[Any]]): Loads the data from the database.
+        serialize (Callable[[Any], bytes]): Turns the data into JSON bytes.
+
+    Returns:
+        Response: 304 if the client has the current version, the full body
+        otherwise. Both carry the ETag.
+    """
+    # The version is read before loading and writers bump it only after
+    # storing their change, so a change during the load only makes the tag
+    # older than the data, never newer. Such a change also increments the
+    # counter, so the body is never served for the newer version.
+    version = await versions.version(scope)
+    etag = versions.etag(scope, version)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED,
+                        headers=headers)
+
+    body = versions.get_body(scope, version)
+
+    if body is None:
+        data = await load()
+
+        with timed_phase("serialize"):
+            body = serialize(data)
+
+        versions.store_body(scope, version, body)
+
+    return Response(content=body, media_type="application/json",
+                    headers=headers)
+
+
+versions = VersionRegistry(get_counter_repository(),
+                           settings.RESPONSE_CACHE_SIZE)
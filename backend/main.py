@@ -1,98 +1,163 @@
-"""FastAPI backend for BrainBridge app."""
+"""FastAPI backend for BrainBridge app.
+
+`create_app` builds the application. Importing this module only imports
+FastAPI and the settings: the routers, the CRUD modules and their
+dependencies are imported when an app is created, and the database client
+is created on first use in the process serving the app, e.g. in every
+worker after a fork. Directories and the password hasher are set up by the
+lifespan of the app.
+
+`main.app` is created on first access, so both `uvicorn main:app` and
+`uvicorn --factory main:create_app` work. Every module reads its settings
+from the environment, see `settings.Settings`. Running this
+module starts a development server, production deployments run
+`python -m cli.serve`.
+"""
 
 import os
-import uvicorn
 
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, File, HTTPException, UploadFile
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from uuid import uuid4
-from typing import List
-
-from crud.ideas import get_idea, update_idea
-from crud.mongodb_connector import MongoDBConnector
-from routers.auth import router as auth_router
-from routers.chat import router as chat_router
-from routers.comments import router as comments_router
-from routers.ideas import router as ideas_router
-
-app = FastAPI()
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-origins = [
+from fastapi import FastAPI
+from typing import Any
+
+from settings import Settings
+
+ORIGINS = [
     "http://localhost:5173",
     "http://127.0.0.1:5173"
 ]
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-
-IMAGE_MIME_TYPES = {
-    "image/png",
-    "image/jpeg",
-    "image/jpg",
-    "image/webp",
-    "image/gif",
-    "image/bmp"
-}
-
-
-@app.post("/api/upload-images/{idea_id}")
-async def upload_image(idea_id: str, images: List[UploadFile] = File(...)):
-    idea = await get_idea(idea_id)
-
-    if not idea:
-        raise HTTPException(404, "Idea not found")
-
-    saved_paths = []
-
-    for image in images:
-        if image.content_type not in IMAGE_MIME_TYPES:
-            raise HTTPException(400, "File is not an image")
-
-        ext = image.filename.split(".")[-1].lower()
-
-        unique_name = f"{uuid4()}.{ext}"
-        file_path = os.path.join(UPLOAD_DIR, unique_name)
-
-        with open(file_path, "wb") as buffer:
-            buffer.write(await image.read())
-
-        saved_paths.append(file_path)
-
-    idea.images = saved_paths
-
-    await update_idea(idea_id, idea)
-
-    return {
-        "ok": True,
-    }
-
-
-app.mount("/api/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
-
-app.include_router(auth_router, prefix="/api")
-app.include_router(chat_router, prefix="/api")
-app.include_router(ideas_router, prefix="/api")
-app.include_router(comments_router, prefix="/api")
-
 
 @asynccontextmanager
-async def lifespan():
+async def lifespan(app: FastAPI):
     """Define the app lifecycle."""
+    from crud.comments import create_indexes as create_comment_indexes
+    from crud.jobs import create_indexes as create_job_indexes
+    from crud.ideas import (
+        create_indexes as create_idea_indexes,
+        load_search_index,
+        rebuild_title_index,
+        save_search_index,
+        warm_idea_cache,
+    )
+    from crud.mongodb_connector import MongoDBConnector
+    from crud.user import (
+        create_indexes as create_user_indexes,
+        rebuild_username_index,
+    )
+    from internals.auth import get_password_hasher
+    from internals.jobs import job_runner
+    from internals.loop_monitor import loop_monitor
+    from repositories import uses_memory
+    from routers.uploads import UPLOAD_DIR
+
     # startup code
+    settings = Settings()
+    # The job queue needs MongoDB, the memory backend runs the work inline.
+    use_jobs = not uses_memory()
+    loop_monitor.start()
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    get_password_hasher()
+    await create_comment_indexes()
+    await create_idea_indexes()
+    await create_user_indexes()
+
+    if use_jobs:
+        await create_job_indexes()
+
+    await load_search_index(settings.SEARCH_SNAPSHOT_PATH)
+    await rebuild_username_index()
+    await rebuild_title_index()
+    await warm_idea_cache(settings.IDEA_CACHE_WARMUP)
+
+    if use_jobs:
+        job_runner.start()
+
     yield
     # shutdown code
+    if use_jobs:
+        await job_runner.stop()
+
+    save_search_index(settings.SEARCH_SNAPSHOT_PATH)
     client = MongoDBConnector()
-    client.close()
+    await client.close()
+    await loop_monitor.stop()
+
+
+def create_app() -> FastAPI:
+    """Build the application with its middleware and routers.
+
+    Returns:
+        FastAPI: The application, connecting to nothing until it starts.
+    """
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.staticfiles import StaticFiles
+
+    from internals.latency import LatencyMiddleware
+    from internals.profiler import ProfilerMiddleware
+    from routers.admin import router as admin_router
+    from routers.auth import router as auth_router
+    from routers.chat import router as chat_router
+    from routers.comments import router as comments_router
+    from routers.events import router as events_router
+    from routers.ideas import router as ideas_router
+    from routers.metrics import router as metrics_router
+    from routers.suggestions import router as suggestions_router
+    from routers.uploads import UPLOAD_DIR, router as uploads_router
+    from routers.users import router as users_router
+
+    app = FastAPI(lifespan=lifespan)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=ORIGINS,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.add_middleware(LatencyMiddleware)
+    app.add_middleware(ProfilerMiddleware)
+
+    # The directory is created by the lifespan.
+    app.mount("/api/uploads",
+              StaticFiles(directory=UPLOAD_DIR, check_dir=False),
+              name="uploads")
+
+    app.include_router(admin_router, prefix="/api")
+    app.include_router(auth_router, prefix="/api")
+    app.include_router(chat_router, prefix="/api")
+    app.include_router(ideas_router, prefix="/api")
+    app.include_router(comments_router, prefix="/api")
+    app.include_router(events_router, prefix="/api")
+    app.include_router(suggestions_router, prefix="/api")
+    app.include_router(uploads_router, prefix="/api")
+    app.include_router(users_router, prefix="/api")
+    app.include_router(metrics_router)
+
+    return app
+
+
+def __getattr__(name: str) -> Any:
+    """Create `app` on first access.
+
+    Args:
+        name (str): Name of the missing module attribute.
+
+    Raises:
+        AttributeError: For any other name.
+
+    Returns:
+        Any: The application.
+    """
+    if name == "app":
+        globals()["app"] = create_app()
+
+        return globals()["app"]
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run("main:app", port=8000, log_level="info")
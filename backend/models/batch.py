@@ -0,0 +1,16 @@
+"""Module defining Pydantic models for batch lookups."""
+
+from pydantic import Field
+from typing import List
+
+from .base import CamelModel
+from settings import Settings
+
+settings = Settings()
+
+
+class BatchRequest(CamelModel):
+    """Model with the ids of the documents to fetch at once."""
+    ids: List[str] = Field(...,
+                           min_length=1,
+                           max_length=settings.MAX_BATCH_IDS)
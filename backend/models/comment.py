@@ -36,3 +36,10 @@ class CommentUpdate(CamelModel):
 class CommentFilter(CommentUpdate):
     id: Optional[PyObjectId] = Field(alias="_id", default=None)
     idea_id: Optional[PyObjectId] = Field(default=None)
+
+
+class CommentSummary(CamelModel):
+    """Model with the comment count and the latest comments of an idea."""
+    idea_id: PyObjectId
+    count: int = Field(default=0)
+    latest: List[Comment] = Field(default_factory=list)
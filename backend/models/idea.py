@@ -77,3 +77,10 @@ class IdeaFilter(IdeaUpdate):
     """Model returned in API responses (z long_description)."""
     id: Optional[str] = Field(alias="_id", default=None)
 
+
+class IdeaChanges(CamelModel):
+    """Model with the ideas changed since a sync version."""
+    version: int
+    updated: List[IdeaGet] = Field(default_factory=list)
+    deleted: List[str] = Field(default_factory=list)
+    has_more: bool = Field(default=False)
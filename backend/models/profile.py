@@ -0,0 +1,17 @@
+"""Module defining Pydantic models for request profiles."""
+
+from datetime import datetime
+
+from .base import CamelModel
+
+
+class ProfileInfo(CamelModel):
+    """Model with the metadata of one stored request profile."""
+    name: str
+    method: str
+    route: str
+    path: str
+    status: int
+    duration_ms: float
+    samples: int
+    created_at: datetime
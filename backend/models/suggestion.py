@@ -0,0 +1,9 @@
+"""Module defining Pydantic models for autocomplete suggestions."""
+
+from .base import CamelModel
+
+
+class Suggestion(CamelModel):
+    """Model of a single autocomplete suggestion."""
+    id: str
+    label: str
@@ -0,0 +1,12 @@
+"""Module defining Pydantic models for collection exports and imports."""
+
+from pydantic import Field
+
+from .base import CamelModel
+
+
+class ImportResult(CamelModel):
+    """Model with the outcome of an NDJSON import."""
+    inserted: int = Field(default=0)
+    skipped: int = Field(default=0)
+    checkpoint: int = Field(default=0)
@@ -22,13 +22,16 @@ class User(CamelModel):
 
 
 class UserCreate(CamelModel):
-    """Model for creating new users."""
+    """Model for creating new users.
+
+    It has no admin flag, new users are never admins. Admin rights are
+    granted with `python -m cli.admin`.
+    """
     username: str = Field(..., min_length=3)
     email: EmailStr = Field(..., min_length=5)
     password: str = Field(..., min_length=8)
     name: str = Field(..., min_length=1, max_length=100)
     surname: str = Field(..., min_length=1, max_length=100)
-    is_admin: bool = Field(default=False)
 
 
 class UserGet(CamelModel):
@@ -41,6 +44,16 @@ class UserGet(CamelModel):
     is_admin: bool = Field(default=False)
 
 
+class UserPublic(CamelModel):
+    """Model for responses about other users. Sends only what any logged in
+    user may see, no email or admin flag.
+    """
+    id: Optional[PyObjectId] = Field(alias="_id", default=None)
+    username: str = Field(..., min_length=3)
+    name: str = Field(..., min_length=1, max_length=100)
+    surname: str = Field(..., min_length=1, max_length=100)
+
+
 class UserUpdate(CamelModel):
     """Model for updating user information.
 
@@ -0,0 +1,131 @@
+"""Storage of the users, ideas and comments behind interchangeable backends.
+
+The backend is selected with the STORAGE_BACKEND setting:
+- "mongo": the MongoDB database of the MONGODB_URI setting.
+- "memory": process memory, the API runs without any external service.
+
+Every getter returns the same repository on each call, so all modules of a
+process share the stored data.
+
+Example:
+    ideas = get_idea_repository()
+    idea = await ideas.get(idea_id)
+"""
+
+from typing import Any, Callable, Dict
+
+from repositories.base import (
+    CommentRepository,
+    CounterRepository,
+    IdeaRepository,
+    PropagationRepository,
+    UserRepository,
+)
+from settings import Settings
+
+_repositories: Dict[str, Any] = {}
+
+
+def uses_memory() -> bool:
+    """Check whether the data is kept in process memory.
+
+    Returns:
+        bool: True for the memory backend.
+    """
+    return _backend() == "memory"
+
+
+def get_counter_repository() -> CounterRepository:
+    """Return the repository of the counters.
+
+    Returns:
+        CounterRepository: The repository of the selected backend.
+    """
+    return _get("counters", lambda module, db: (
+        module.MemoryCounterRepository() if db is None
+        else module.MongoCounterRepository(db)))
+
+
+def get_propagation_repository() -> PropagationRepository:
+    """Return the repository of the username propagations.
+
+    Returns:
+        PropagationRepository: The repository of the selected backend.
+    """
+    return _get("propagations", lambda module, db: (
+        module.MemoryPropagationRepository() if db is None
+        else module.MongoPropagationRepository(db)))
+
+
+def get_user_repository() -> UserRepository:
+    """Return the repository of the users.
+
+    Returns:
+        UserRepository: The repository of the selected backend.
+    """
+    return _get("users", lambda module, db: (
+        module.MemoryUserRepository() if db is None
+        else module.MongoUserRepository(db)))
+
+
+def get_idea_repository() -> IdeaRepository:
+    """Return the repository of the ideas.
+
+    Returns:
+        IdeaRepository: The repository of the selected backend.
+    """
+    return _get("ideas", lambda module, db: (
+        module.MemoryIdeaRepository(get_counter_repository()) if db is None
+        else module.MongoIdeaRepository(db, get_counter_repository())))
+
+
+def get_comment_repository() -> CommentRepository:
+    """Return the repository of the comments.
+
+    Returns:
+        CommentRepository: The repository of the selected backend.
+    """
+    return _get("comments", lambda module, db: (
+        module.MemoryCommentRepository() if db is None
+        else module.MongoCommentRepository(db)))
+
+
+def _backend() -> str:
+    """Return the selected backend.
+
+    Raises:
+        ValueError: If the STORAGE_BACKEND setting is unknown.
+
+    Returns:
+        str: "mongo" or "memory".
+    """
+    backend = Settings().STORAGE_BACKEND
+
+    if backend not in ("mongo", "memory"):
+        raise ValueError(f"Unknown storage backend '{backend}', "
+                         "expected 'mongo' or 'memory'.")
+
+    return backend
+
+
+def _get(name: str, build: Callable[[Any, Any], Any]) -> Any:
+    """Return the repository, creating it on first use.
+
+    Args:
+        name (str): Name of the repository.
+        build (Callable[[Any, Any], Any]): Creates the repository from the
+        backend module and the database, which is None in memory.
+
+    Returns:
+        Any: The repository.
+    """
+    if name not in _repositories:
+        if uses_memory():
+            from repositories import memory
+            _repositories[name] = build(memory, None)
+        else:
+            from crud.mongodb_connector import MongoDBConnector
+            from repositories import mongo
+            _repositories[name] = build(mongo, MongoDBConnector().get_db())
+
+    return _repositories[name]
@@ -0,0 +1,601 @@
+"""Interfaces of the storage of users, ideas and comments.
+
+The CRUD modules keep the application logic (validation, caches, events,
+in-memory search indexes) and call a repository for every read and write.
+Documents are plain dicts shaped like the MongoDB documents: the id is an
+`ObjectId` under "_id" and the field names are camelCase. Queries are dicts
+of field -> value that all have to match, where a list field matches if it
+contains the value, like an equality filter in MongoDB.
+
+Every implementation has to behave the same, e.g. a taken email or username
+raises `pymongo.errors.DuplicateKeyError` with the `keyPattern` of the
+unique index in its details, so callers do not depend on the backend.
+"""
+
+from abc import ABC, abstractmethod
+from bson import ObjectId
+from datetime import datetime
+from typing import (
+    Any,
+    AsyncIterator,
+    Collection,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+Document = Dict[str, Any]
+Fields = Optional[Collection[str]]
+
+# Fields that identify a user, unique among all users.
+UNIQUE_FIELDS = ("email", "username")
+
+# Counter the sync versions of the ideas are reserved from.
+SYNC_COUNTER = "ideas"
+
+
+class AuthoredRepository(ABC):
+    """Documents carrying a copy of the username of their author.
+
+    Attributes:
+        author_field (str): Field with the copied username.
+    """
+    author_field: str = ""
+
+    @abstractmethod
+    async def find_stale_copies(
+        self,
+        user_id: str,
+        username: str,
+        after: Optional[ObjectId],
+        limit: int,
+    ) -> List[Document]:
+        """Find documents of the user with a different username, by id.
+
+        Args:
+            user_id (str): Id of the author.
+            username (str): The current username.
+            after (Optional[ObjectId]): Only documents with a greater id.
+            limit (int): Maximum number of documents.
+
+        Returns:
+            List[Document]: The "_id" and "ideaId" of the documents.
+        """
+
+
+    @abstractmethod
+    async def set_many(self, user_id: str,
+                       updates: List[Tuple[ObjectId, Document]]) -> None:
+        """Set fields of many documents of the user.
+
+        Args:
+            user_id (str): Id of the author, documents of others are skipped.
+            updates (List[Tuple[ObjectId, Document]]): Id of each document
+            and the fields to set.
+        """
+
+
+class CounterRepository(ABC):
+    """Named counters of the storage, shared by every process using it."""
+
+    @abstractmethod
+    async def get(self, name: str) -> int:
+        """Read a counter.
+
+        Args:
+            name (str): Name of the counter.
+
+        Returns:
+            int: Its value, 0 if it was never incremented.
+        """
+
+
+    @abstractmethod
+    async def increment(self, name: str, count: int = 1) -> int:
+        """Increment a counter atomically.
+
+        Args:
+            name (str): Name of the counter.
+            count (int): Amount to add.
+
+        Returns:
+            int: The value after the increment.
+        """
+
+
+class PropagationRepository(ABC):
+    """Pending username propagations with the progress made on them, one per
+    user, see `crud.propagation`."""
+
+    @abstractmethod
+    async def start(self, user_id: str, username: str) -> None:
+        """Record a rename, replacing a pending one of the same user.
+
+        Args:
+            user_id (str): Id of the renamed user.
+            username (str): The new username.
+        """
+
+
+    @abstractmethod
+    async def get(self, user_id: str) -> Optional[Document]:
+        """Read the pending propagation of the user.
+
+        Args:
+            user_id (str): Id of the renamed user.
+
+        Returns:
+            Optional[Document]: The propagation with its "username" and its
+            "progress", the last processed id by target, None if there is
+            none.
+        """
+
+
+    @abstractmethod
+    async def save_progress(self, user_id: str, username: str, target: str,
+                            last_id: ObjectId) -> bool:
+        """Save the last processed id of a target.
+
+        Args:
+            user_id (str): Id of the renamed user.
+            username (str): Username of the propagation.
+            target (str): Name of the target.
+            last_id (ObjectId): Last processed id.
+
+        Returns:
+            bool: False if a newer rename replaced the propagation.
+        """
+
+
+    @abstractmethod
+    async def finish(self, user_id: str, username: str) -> None:
+        """Remove a completed propagation, unless a newer rename replaced it.
+
+        Args:
+            user_id (str): Id of the renamed user.
+            username (str): Username of the propagation.
+        """
+
+
+class UserRepository(ABC):
+    """Storage of the users, with unique emails and usernames."""
+
+    @abstractmethod
+    async def insert(self, doc: Document) -> ObjectId:
+        """Insert a user.
+
+        Args:
+            doc (Document): The user, without "_id".
+
+        Raises:
+            DuplicateKeyError: If the email or username is taken.
+
+        Returns:
+            ObjectId: Id of the user.
+        """
+
+
+    @abstractmethod
+    async def insert_many(self, docs: List[Document]) -> None:
+        """Insert many users, in any order.
+
+        Args:
+            docs (List[Document]): The users.
+        """
+
+
+    @abstractmethod
+    async def get_many(self, user_ids: List[ObjectId]) -> List[Document]:
+        """Read the users with the ids, without their password hashes.
+
+        Args:
+            user_ids (List[ObjectId]): Ids of the users.
+
+        Returns:
+            List[Document]: The users that exist.
+        """
+
+
+    @abstractmethod
+    async def find(self, query: Document) -> List[Document]:
+        """Read the users matching the query.
+
+        Args:
+            query (Document): Field -> required value.
+
+        Returns:
+            List[Document]: The matching users.
+        """
+
+
+    @abstractmethod
+    def scan(self, fields: Fields = None) -> AsyncIterator[Document]:
+        """Iterate over all users.
+
+        Args:
+            fields (Fields): Fields to read besides "_id", all if None.
+
+        Returns:
+            AsyncIterator[Document]: The users.
+        """
+
+
+    @abstractmethod
+    async def update(self, user_id: ObjectId,
+                     data: Document) -> Optional[Document]:
+        """Set fields of a user.
+
+        Args:
+            user_id (ObjectId): Id of the user.
+            data (Document): Fields to set.
+
+        Raises:
+            DuplicateKeyError: If the new email or username is taken.
+
+        Returns:
+            Optional[Document]: The user after the update, None if it does
+            not exist or nothing changed.
+        """
+
+
+    @abstractmethod
+    async def delete(self, user_id: ObjectId) -> bool:
+        """Delete a user.
+
+        Args:
+            user_id (ObjectId): Id of the user.
+
+        Returns:
+            bool: True if the user was deleted.
+        """
+
+
+    @abstractmethod
+    async def create_indexes(self) -> None:
+        """Create the unique indexes of the emails and usernames."""
+
+
+    @abstractmethod
+    async def clear(self) -> None:
+        """Delete all users."""
+
+
+class IdeaRepository(AuthoredRepository):
+    """Storage of the ideas, their trending scores and sync versions.
+
+    Every write of an idea gets a new `syncVersion` from `reserve_versions`,
+    which increments the `SYNC_COUNTER` counter. Deleted ideas leave a
+    tombstone with the version of the deletion, so clients syncing changes
+    learn about them. The time of every like is kept in `likedAt`, user id
+    -> datetime, so an unlike removes what the like added to the score.
+    """
+    author_field = "author"
+
+    @abstractmethod
+    async def insert(self, doc: Document) -> Document:
+        """Insert an idea.
+
+        Args:
+            doc (Document): The idea, without "_id".
+
+        Returns:
+            Document: The stored idea.
+        """
+
+
+    @abstractmethod
+    async def insert_many(self, docs: List[Document]) -> None:
+        """Insert many ideas, in any order.
+
+        Args:
+            docs (List[Document]): The ideas.
+        """
+
+
+    @abstractmethod
+    async def get(self, idea_id: ObjectId) -> Optional[Document]:
+        """Read an idea.
+
+        Args:
+            idea_id (ObjectId): Id of the idea.
+
+        Returns:
+            Optional[Document]: The idea, None if it does not exist.
+        """
+
+
+    @abstractmethod
+    async def get_many(self, idea_ids: List[ObjectId],
+                       fields: Fields = None) -> List[Document]:
+        """Read the ideas with the ids, in any order.
+
+        Args:
+            idea_ids (List[ObjectId]): Ids of the ideas.
+            fields (Fields): Fields to read besides "_id", all if None.
+
+        Returns:
+            List[Document]: The ideas that exist.
+        """
+
+
+    @abstractmethod
+    async def find(self, query: Document) -> List[Document]:
+        """Read the ideas matching the query.
+
+        Args:
+            query (Document): Field -> required value.
+
+        Returns:
+            List[Document]: The matching ideas.
+        """
+
+
+    @abstractmethod
+    def scan(self, fields: Fields = None) -> AsyncIterator[Document]:
+        """Iterate over all ideas.
+
+        Args:
+            fields (Fields): Fields to read besides "_id", all if None.
+
+        Returns:
+            AsyncIterator[Document]: The ideas.
+        """
+
+
+    @abstractmethod
+    def stream_json(self, reader: Any,
+                    chunk_size: int) -> AsyncIterator[bytes]:
+        """Stream all ideas as a JSON array.
+
+        Args:
+            reader (TrustedReader): Reader of the response model.
+            chunk_size (int): Ideas per chunk.
+
+        Returns:
+            AsyncIterator[bytes]: Consecutive parts of the array.
+        """
+
+
+    @abstractmethod
+    async def top_by_score(self, limit: int) -> List[Document]:
+        """Read the ideas with the highest trending score.
+
+        Args:
+            limit (int): Maximum number of ideas.
+
+        Returns:
+            List[Document]: The ideas, highest score first.
+        """
+
+
+    @abstractmethod
+    async def changes_since(
+        self,
+        since: int,
+        limit: int,
+    ) -> Tuple[List[Document], List[Document]]:
+        """Read the ideas and tombstones written after the sync version.
+
+        Args:
+            since (int): Sync version already known.
+            limit (int): Maximum number of ideas and of tombstones.
+
+        Returns:
+            Tuple[List[Document], List[Document]]: Ideas and tombstones,
+            each by ascending version. Tombstones only have "_id",
+            "syncVersion" and "updatedAt".
+        """
+
+
+    @abstractmethod
+    async def count(self) -> int:
+        """Count the ideas.
+
+        Returns:
+            int: Number of ideas.
+        """
+
+
+    @abstractmethod
+    async def update(self, idea_id: ObjectId,
+                     data: Document) -> Optional[Document]:
+        """Set fields of an idea.
+
+        Args:
+            idea_id (ObjectId): Id of the idea.
+            data (Document): Fields to set, including the sync fields.
+
+        Returns:
+            Optional[Document]: The idea after the update, None if it does
+            not exist.
+        """
+
+
+    @abstractmethod
+    async def add_like(
+        self,
+        idea_id: ObjectId,
+        user_id: str,
+        weight: float,
+        sync: Document,
+    ) -> Tuple[Optional[Document], bool]:
+        """Add the user to the likes and the like happening now to the
+        trending score and `likedAt`, unless the user already likes the idea.
+
+        Args:
+            idea_id (ObjectId): Id of the idea.
+            user_id (str): Id of the user.
+            weight (float): Weight of the like in the score.
+            sync (Document): Sync fields set if the idea changes.
+
+        Returns:
+            Tuple[Optional[Document], bool]: The idea afterwards, None if it
+            does not exist, and whether it changed.
+        """
+
+
+    @abstractmethod
+    async def remove_like(
+        self,
+        idea_id: ObjectId,
+        user_id: str,
+        weight: float,
+        sync: Document,
+    ) -> Tuple[Optional[Document], bool]:
+        """Remove the user from the likes and `likedAt` and the like from
+        the trending score, if the user likes the idea. A like without a
+        recorded time is valued at the creation of the idea, like the
+        backfill of the score counts it.
+
+        Args:
+            idea_id (ObjectId): Id of the idea.
+            user_id (str): Id of the user.
+            weight (float): Weight of the like in the score.
+            sync (Document): Sync fields set if the idea changes.
+
+        Returns:
+            Tuple[Optional[Document], bool]: The idea afterwards, None if it
+            does not exist, and whether it changed.
+        """
+
+
+    @abstractmethod
+    async def add_score(self, idea_id: ObjectId, weight: float) -> None:
+        """Add an event happening now to the trending score.
+
+        Args:
+            idea_id (ObjectId): Id of the idea.
+            weight (float): Weight of the event.
+        """
+
+
+    @abstractmethod
+    async def remove_score(self, idea_id: ObjectId, weight: float,
+                           when: datetime) -> None:
+        """Remove an undone event from the trending score.
+
+        Args:
+            idea_id (ObjectId): Id of the idea.
+            weight (float): Weight of the event.
+            when (datetime): Time the event happened.
+        """
+
+
+    @abstractmethod
+    async def delete(self, idea_id: ObjectId,
+                     sync: Document) -> Optional[Document]:
+        """Delete an idea and leave a tombstone.
+
+        Args:
+            idea_id (ObjectId): Id of the idea.
+            sync (Document): Sync fields of the tombstone.
+
+        Returns:
+            Optional[Document]: "_id" and "userId" of the deleted idea, None
+            if it did not exist.
+        """
+
+
+    @abstractmethod
+    async def reserve_versions(self, count: int) -> int:
+        """Reserve consecutive sync versions.
+
+        Args:
+            count (int): Number of versions.
+
+        Returns:
+            int: The first reserved version.
+        """
+
+
+    @abstractmethod
+    async def create_indexes(self) -> None:
+        """Create the indexes and fill in the trending score and sync
+        version of ideas created before those fields existed.
+
+        Every such idea gets a version of its own from `reserve_versions`,
+        also ideas still having the version 0 an earlier backfill gave them.
+        """
+
+
+    @abstractmethod
+    async def clear(self) -> None:
+        """Delete all ideas and tombstones."""
+
+
+class CommentRepository(AuthoredRepository):
+    """Storage of the comments of the ideas."""
+    author_field = "username"
+
+    @abstractmethod
+    async def insert(self, doc: Document) -> ObjectId:
+        """Insert a comment.
+
+        Args:
+            doc (Document): The comment, without "_id".
+
+        Returns:
+            ObjectId: Id of the comment.
+        """
+
+
+    @abstractmethod
+    async def insert_many(self, docs: List[Document]) -> None:
+        """Insert many comments, in any order.
+
+        Args:
+            docs (List[Document]): The comments.
+        """
+
+
+    @abstractmethod
+    async def find(self, query: Document) -> List[Document]:
+        """Read the comments matching the query.
+
+        Args:
+            query (Document): Field -> required value.
+
+        Returns:
+            List[Document]: The matching comments.
+        """
+
+
+    @abstractmethod
+    async def summaries(self, idea_ids: List[str],
+                        latest: int) -> List[Document]:
+        """Count the comments of the ideas.
+
+        Args:
+            idea_ids (List[str]): Ids of the ideas.
+            latest (int): Number of newest comments to include per idea.
+
+        Returns:
+            List[Document]: "_id" (the idea id), "count" and, if `latest` is
+            positive, "latest" newest first, for ideas with comments.
+        """
+
+
+    @abstractmethod
+    async def delete_owned(self, comment_id: ObjectId,
+                           user_id: str) -> Optional[Document]:
+        """Delete a comment of the user.
+
+        Args:
+            comment_id (ObjectId): Id of the comment.
+            user_id (str): Id of its author.
+
+        Returns:
+            Optional[Document]: "_id" and "ideaId" of the deleted comment,
+            None if the user has no such comment.
+        """
+
+
+    @abstractmethod
+    async def create_indexes(self) -> None:
+        """Create the indexes of the comment queries."""
+
+
+    @abstractmethod
+    async def clear(self) -> None:
+        """Delete all comments."""
@@ -0,0 +1,871 @@
+"""Repositories keeping the users, ideas and comments in process memory.
+
+They let the API, tests and benchmarks run without a database. Each
+operation runs without awaiting anything in between, so it is atomic for the
+event loop like a single MongoDB update. The data is lost when the process
+exits and every worker process has its own copy.
+
+Besides the documents by id they keep the indexes their queries need:
+- Users: the ids by email and by username, which also enforce uniqueness.
+- Ideas: the ids by author and a log of sync versions shared by ideas and
+  tombstones, so a delta sync only reads the changed documents.
+- Comments: the ids by idea in creation order and by author.
+
+Stored documents are never changed in place, every write stores a new dict.
+Readers get copies whose lists and dicts, e.g. `likedByUser`, `likedAt` or
+`links`, are copied as well, so they can not change the stored documents.
+
+The documentation of the methods is on the interfaces in `repositories.base`.
+"""
+
+import copy
+import heapq
+
+from abc import abstractmethod
+from bisect import bisect_right, insort
+from bson import ObjectId
+from datetime import datetime, timezone
+from pymongo.errors import DuplicateKeyError
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from internals.serialization import json_array_chunks
+from internals.trending import (
+    SCORE_FIELD,
+    add_event,
+    backfill_score,
+    creation_score,
+    remove_event,
+)
+from repositories.base import (
+    AuthoredRepository,
+    CommentRepository,
+    CounterRepository,
+    Document,
+    Fields,
+    IdeaRepository,
+    PropagationRepository,
+    SYNC_COUNTER,
+    UNIQUE_FIELDS,
+    UserRepository,
+)
+
+# Greater than every ObjectId, to search the log after all ids of a version.
+_MAX_ID = ObjectId("f" * 24)
+
+
+def _matches(doc: Document, query: Document) -> bool:
+    """Check the document against an equality query.
+
+    Args:
+        doc (Document): The document.
+        query (Document): Field -> required value.
+
+    Returns:
+        bool: True if every field matches, a list field matches if it
+        contains the value.
+    """
+    for field, value in query.items():
+        current = doc.get(field)
+
+        if current == value:
+            continue
+
+        if isinstance(current, list) and not isinstance(value, list):
+            if value in current:
+                continue
+
+        return False
+
+    return True
+
+
+def _copy(doc: Document, fields: Fields = None) -> Document:
+    """Return a copy of the document for a reader.
+
+    Args:
+        doc (Document): The stored document.
+        fields (Fields): Fields to copy besides "_id", all if None.
+
+    Returns:
+        Document: The copy, lists and dicts in it are copied too.
+    """
+    return {key: _copy_value(value) for key, value in doc.items()
+            if fields is None or key == "_id" or key in fields}
+
+
+def _copy_value(value: Any) -> Any:
+    """Return a copy of a mutable field value, other values as they are.
+
+    Args:
+        value (Any): Value of a stored document.
+
+    Returns:
+        Any: The value or its deep copy.
+    """
+    if isinstance(value, (list, dict)):
+        return copy.deepcopy(value)
+
+    return value
+
+
+def _created(doc_id: ObjectId) -> datetime:
+    """Return the creation time stored in the id.
+
+    Args:
+        doc_id (ObjectId): Id of a document.
+
+    Returns:
+        datetime: The creation time.
+    """
+    return doc_id.generation_time
+
+
+def _duplicate(field: str, value: Any) -> DuplicateKeyError:
+    """Build the error MongoDB raises for a taken unique value.
+
+    Args:
+        field (str): The unique field.
+        value (Any): The taken value.
+
+    Returns:
+        DuplicateKeyError: The error, with the key in its details.
+    """
+    message = (f"E11000 duplicate key error collection: users index: "
+               f"{field}_unique dup key: {{ {field}: {value!r} }}")
+
+    return DuplicateKeyError(message, 11000, {
+        "code": 11000,
+        "errmsg": message,
+        "keyPattern": {field: 1},
+        "keyValue": {field: value},
+    })
+
+
+class _MemoryAuthored(AuthoredRepository):
+    """Rewrites of the copied usernames.
+
+    Attributes:
+        _docs (Dict[ObjectId, Document]): Documents by id.
+        _by_user (Dict[str, Set[ObjectId]]): Ids by the id of the author.
+    """
+    _docs: Dict[ObjectId, Document]
+    _by_user: Dict[str, Set[ObjectId]]
+
+    async def find_stale_copies(
+        self,
+        user_id: str,
+        username: str,
+        after: Optional[ObjectId],
+        limit: int,
+    ) -> List[Document]:
+        ids = sorted(doc_id for doc_id in self._by_user.get(user_id, ())
+                     if after is None or doc_id > after)
+        found = []
+
+        for doc_id in ids:
+            doc = self._docs[doc_id]
+
+            if doc.get(self.author_field) == username:
+                continue
+
+            found.append(_copy(doc, ("ideaId",)))
+
+            if len(found) == limit:
+                break
+
+        return found
+
+
+    async def set_many(self, user_id: str,
+                       updates: List[Tuple[ObjectId, Document]]) -> None:
+        for doc_id, update in updates:
+            doc = self._docs.get(doc_id)
+
+            if doc is not None and doc.get("userId") == user_id:
+                self._store({**doc, **copy.deepcopy(update)})
+
+
+    @abstractmethod
+    def _store(self, doc: Document) -> None:
+        """Store the new version of the document and update the indexes.
+
+        Args:
+            doc (Document): The document.
+        """
+
+
+class MemoryCounterRepository(CounterRepository):
+    """Counters in memory.
+
+    Attributes:
+        _values (Dict[str, int]): Counter name -> value.
+    """
+
+    def __init__(self) -> None:
+        """Create the repository with all counters at 0."""
+        self._values: Dict[str, int] = {}
+
+
+    async def get(self, name: str) -> int:
+        return self._values.get(name, 0)
+
+
+    async def increment(self, name: str, count: int = 1) -> int:
+        self._values[name] = self._values.get(name, 0) + count
+
+        return self._values[name]
+
+
+class MemoryPropagationRepository(PropagationRepository):
+    """Propagations in memory.
+
+    Attributes:
+        _docs (Dict[str, Document]): User id -> propagation.
+    """
+
+    def __init__(self) -> None:
+        """Create the repository without propagations."""
+        self._docs: Dict[str, Document] = {}
+
+
+    async def start(self, user_id: str, username: str) -> None:
+        self._docs[user_id] = {
+            "_id": user_id,
+            "username": username,
+            "progress": {},
+            "createdAt": datetime.now(timezone.utc),
+        }
+
+
+    async def get(self, user_id: str) -> Optional[Document]:
+        doc = self._docs.get(user_id)
+
+        return None if doc is None else _copy(doc)
+
+
+    async def save_progress(self, user_id: str, username: str, target: str,
+                            last_id: ObjectId) -> bool:
+        doc = self._docs.get(user_id)
+
+        if doc is None or doc["username"] != username:
+            return False
+
+        self._docs[user_id] = {
+            **doc,
+            "progress": {**doc["progress"], target: last_id},
+        }
+
+        return True
+
+
+    async def finish(self, user_id: str, username: str) -> None:
+        doc = self._docs.get(user_id)
+
+        if doc is not None and doc["username"] == username:
+            del self._docs[user_id]
+
+
+class MemoryUserRepository(UserRepository):
+    """Users in memory.
+
+    Attributes:
+        _docs (Dict[ObjectId, Document]): Users by id.
+        _unique (Dict[str, Dict[Any, ObjectId]]): Unique field -> value ->
+        id of the user.
+    """
+
+    def __init__(self) -> None:
+        """Create an empty repository."""
+        self._docs: Dict[ObjectId, Document] = {}
+        self._unique: Dict[str, Dict[Any, ObjectId]] = {
+            field: {} for field in UNIQUE_FIELDS
+        }
+
+
+    async def insert(self, doc: Document) -> ObjectId:
+        doc = copy.deepcopy(doc)
+        doc.setdefault("_id", ObjectId())
+        self._check_unique(doc)
+        self._store(doc)
+
+        return doc["_id"]
+
+
+    async def insert_many(self, docs: List[Document]) -> None:
+        for doc in docs:
+            await self.insert(doc)
+
+
+    async def get_many(self, user_ids: List[ObjectId]) -> List[Document]:
+        found = []
+
+        for user_id in user_ids:
+            doc = self._docs.get(user_id)
+
+            if doc is not None:
+                found.append({key: _copy_value(value)
+                              for key, value in doc.items()
+                              if key != "password"})
+
+        return found
+
+
+    async def find(self, query: Document) -> List[Document]:
+        for field in UNIQUE_FIELDS:
+            if field in query:
+                user_id = self._unique[field].get(query[field])
+                docs = [self._docs[user_id]] if user_id else []
+                break
+        else:
+            docs = list(self._docs.values())
+
+        return [_copy(doc) for doc in docs if _matches(doc, query)]
+
+
+    async def scan(self, fields: Fields = None) -> AsyncIterator[Document]:
+        for doc in list(self._docs.values()):
+            yield _copy(doc, fields)
+
+
+    async def update(self, user_id: ObjectId,
+                     data: Document) -> Optional[Document]:
+        doc = self._docs.get(user_id)
+
+        if doc is None:
+            return None
+
+        updated = {**doc, **copy.deepcopy(data)}
+
+        if updated == doc:
+            return None
+
+        self._check_unique(updated)
+        self._store(updated)
+
+        return _copy(updated)
+
+
+    async def delete(self, user_id: ObjectId) -> bool:
+        doc = self._docs.pop(user_id, None)
+
+        if doc is None:
+            return False
+
+        self._unindex(doc)
+
+        return True
+
+
+    async def create_indexes(self) -> None:
+        # The unique indexes always exist.
+        return None
+
+
+    async def clear(self) -> None:
+        self._docs.clear()
+
+        for values in self._unique.values():
+            values.clear()
+
+
+    def _check_unique(self, doc: Document) -> None:
+        """Make sure no other user has the email or username of the user.
+
+        Args:
+            doc (Document): The new or updated user.
+
+        Raises:
+            DuplicateKeyError: If a value is taken.
+        """
+        for field in UNIQUE_FIELDS:
+            owner = self._unique[field].get(doc.get(field))
+
+            if owner is not None and owner != doc["_id"]:
+                raise _duplicate(field, doc.get(field))
+
+
+    def _store(self, doc: Document) -> None:
+        """Store the user and update the unique indexes.
+
+        Args:
+            doc (Document): The user.
+        """
+        old = self._docs.get(doc["_id"])
+
+        if old is not None:
+            self._unindex(old)
+
+        self._docs[doc["_id"]] = doc
+
+        for field in UNIQUE_FIELDS:
+            self._unique[field][doc.get(field)] = doc["_id"]
+
+
+    def _unindex(self, doc: Document) -> None:
+        """Remove the user from the unique indexes.
+
+        Args:
+            doc (Document): The user.
+        """
+        for field in UNIQUE_FIELDS:
+            if self._unique[field].get(doc.get(field)) == doc["_id"]:
+                del self._unique[field][doc.get(field)]
+
+
+class MemoryIdeaRepository(_MemoryAuthored, IdeaRepository):
+    """Ideas and tombstones in memory.
+
+    Attributes:
+        _docs (Dict[ObjectId, Document]): Ideas by id.
+        _tombstones (Dict[ObjectId, Document]): Tombstones by id.
+        _by_user (Dict[str, Set[ObjectId]]): Ids of the ideas by author id.
+        _log (List[Tuple[int, ObjectId]]): Sync version and id of every
+        written idea and tombstone in ascending order, including versions
+        replaced by later writes.
+        _logged (Set[Tuple[int, ObjectId]]): The entries of the log.
+        _counters (CounterRepository): Counters holding the sync version.
+    """
+
+    def __init__(self, counters: CounterRepository) -> None:
+        """Create an empty repository.
+
+        Args:
+            counters (CounterRepository): Counters holding the sync version.
+        """
+        self._docs: Dict[ObjectId, Document] = {}
+        self._tombstones: Dict[ObjectId, Document] = {}
+        self._by_user: Dict[str, Set[ObjectId]] = {}
+        self._log: List[Tuple[int, ObjectId]] = []
+        self._logged: Set[Tuple[int, ObjectId]] = set()
+        self._counters = counters
+
+
+    async def insert(self, doc: Document) -> Document:
+        doc = copy.deepcopy(doc)
+        doc.setdefault("_id", ObjectId())
+        self._store(doc)
+
+        return _copy(doc)
+
+
+    async def insert_many(self, docs: List[Document]) -> None:
+        for doc in docs:
+            await self.insert(doc)
+
+
+    async def get(self, idea_id: ObjectId) -> Optional[Document]:
+        doc = self._docs.get(idea_id)
+
+        return None if doc is None else _copy(doc)
+
+
+    async def get_many(self, idea_ids: List[ObjectId],
+                       fields: Fields = None) -> List[Document]:
+        return [_copy(self._docs[idea_id], fields) for idea_id in idea_ids
+                if idea_id in self._docs]
+
+
+    async def find(self, query: Document) -> List[Document]:
+        if "_id" in query:
+            docs = [self._docs[query["_id"]]] if query["_id"] in self._docs \
+                else []
+        elif "userId" in query:
+            docs = [self._docs[idea_id]
+                    for idea_id in self._by_user.get(query["userId"], ())]
+        else:
+            docs = list(self._docs.values())
+
+        return [_copy(doc) for doc in docs if _matches(doc, query)]
+
+
+    async def scan(self, fields: Fields = None) -> AsyncIterator[Document]:
+        for doc in list(self._docs.values()):
+            yield _copy(doc, fields)
+
+
+    def stream_json(self, reader: Any,
+                    chunk_size: int) -> AsyncIterator[bytes]:
+        return json_array_chunks(self.scan(reader.projection), reader,
+                                 chunk_size)
+
+
+    async def top_by_score(self, limit: int) -> List[Document]:
+        # Ideas without a score yet sort last, like missing fields in MongoDB.
+        top = heapq.nlargest(
+            limit, self._docs.values(),
+            key=lambda doc: doc.get(SCORE_FIELD, float("-inf")),
+        )
+
+        return [_copy(doc) for doc in top]
+
+
+    async def changes_since(
+        self,
+        since: int,
+        limit: int,
+    ) -> Tuple[List[Document], List[Document]]:
+        updated: List[Document] = []
+        deleted: List[Document] = []
+
+        start = bisect_right(self._log, (since, _MAX_ID))
+
+        for index in range(start, len(self._log)):
+            version, doc_id = self._log[index]
+            doc = self._docs.get(doc_id)
+            tombstone = self._tombstones.get(doc_id)
+
+            # Entries replaced by a later write of the document are skipped.
+            if doc is not None and doc.get("syncVersion") == version:
+                if len(updated) < limit:
+                    updated.append(_copy(doc))
+            elif (tombstone is not None
+                  and tombstone.get("syncVersion") == version):
+                if len(deleted) < limit:
+                    deleted.append(_copy(tombstone))
+
+            if len(updated) == limit and len(deleted) == limit:
+                break
+
+        return updated, deleted
+
+
+    async def count(self) -> int:
+        return len(self._docs)
+
+
+    async def update(self, idea_id: ObjectId,
+                     data: Document) -> Optional[Document]:
+        doc = self._docs.get(idea_id)
+
+        if doc is None:
+            return None
+
+        updated = {**doc, **copy.deepcopy(data)}
+        self._store(updated)
+
+        return _copy(updated)
+
+
+    async def add_like(
+        self,
+        idea_id: ObjectId,
+        user_id: str,
+        weight: float,
+        sync: Document,
+    ) -> Tuple[Optional[Document], bool]:
+        doc = self._docs.get(idea_id)
+
+        if doc is None:
+            return None, False
+
+        likes = doc.get("likedByUser") or []
+
+        if user_id in likes:
+            return _copy(doc), False
+
+        now = datetime.now(timezone.utc)
+        updated = {
+            **doc,
+            "likedByUser": [*likes, user_id],
+            "likedAt": {**(doc.get("likedAt") or {}), user_id: now},
+            SCORE_FIELD: add_event(self._score(doc), weight, now),
+            **sync,
+        }
+        self._store(updated)
+
+        return _copy(updated), True
+
+
+    async def remove_like(
+        self,
+        idea_id: ObjectId,
+        user_id: str,
+        weight: float,
+        sync: Document,
+    ) -> Tuple[Optional[Document], bool]:
+        doc = self._docs.get(idea_id)
+
+        if doc is None:
+            return None, False
+
+        likes = doc.get("likedByUser") or []
+
+        if user_id not in likes:
+            return _copy(doc), False
+
+        liked_at = dict(doc.get("likedAt") or {})
+        when = liked_at.pop(user_id, None) or _created(idea_id)
+        updated = {
+            **doc,
+            "likedByUser": [like for like in likes if like != user_id],
+            "likedAt": liked_at,
+            SCORE_FIELD: remove_event(self._score(doc), weight, when,
+                                      creation_score(_created(idea_id))),
+            **sync,
+        }
+        self._store(updated)
+
+        return _copy(updated), True
+
+
+    async def add_score(self, idea_id: ObjectId, weight: float) -> None:
+        doc = self._docs.get(idea_id)
+
+        if doc is None:
+            return
+
+        # The score alone does not change the synced fields of the idea.
+        self._docs[idea_id] = {
+            **doc,
+            SCORE_FIELD: add_event(self._score(doc), weight),
+        }
+
+
+    async def remove_score(self, idea_id: ObjectId, weight: float,
+                           when: datetime) -> None:
+        doc = self._docs.get(idea_id)
+
+        if doc is None:
+            return
+
+        self._docs[idea_id] = {
+            **doc,
+            SCORE_FIELD: remove_event(self._score(doc), weight, when,
+                                      creation_score(_created(idea_id))),
+        }
+
+
+    async def delete(self, idea_id: ObjectId,
+                     sync: Document) -> Optional[Document]:
+        doc = self._docs.pop(idea_id, None)
+
+        if doc is None:
+            return None
+
+        self._by_user.get(doc.get("userId"), set()).discard(idea_id)
+        tombstone = {"_id": idea_id, **sync}
+        self._tombstones[idea_id] = tombstone
+        self._log_version(tombstone)
+
+        return {"_id": idea_id, "userId": doc.get("userId")}
+
+
+    async def reserve_versions(self, count: int) -> int:
+        return await self._counters.increment(SYNC_COUNTER, count) - count + 1
+
+
+    async def create_indexes(self) -> None:
+        # The indexes always exist, only the fields of ideas inserted without
+        # them are filled in. Versions start at 1, like in MongoDB 0 is
+        # treated as missing.
+        for doc in list(self._docs.values()):
+            if SCORE_FIELD in doc and doc.get("syncVersion"):
+                continue
+
+            updated = dict(doc)
+
+            if SCORE_FIELD not in doc:
+                updated[SCORE_FIELD] = backfill_score(
+                    _created(doc["_id"]), len(doc.get("likedByUser") or []))
+
+            if not doc.get("syncVersion"):
+                updated["syncVersion"] = await self.reserve_versions(1)
+                updated.setdefault("updatedAt", _created(doc["_id"]))
+
+            self._store(updated)
+
+
+    async def clear(self) -> None:
+        self._docs.clear()
+        self._tombstones.clear()
+        self._by_user.clear()
+        self._log.clear()
+        self._logged.clear()
+
+
+    def _score(self, doc: Document) -> float:
+        """Return the current trending score of the idea.
+
+        Args:
+            doc (Document): The idea.
+
+        Returns:
+            float: The stored score, the creation score if there is none.
+        """
+        score = doc.get(SCORE_FIELD)
+
+        if score is None:
+            return creation_score(_created(doc["_id"]))
+
+        return score
+
+
+    def _store(self, doc: Document) -> None:
+        """Store the new version of the idea and update the indexes.
+
+        Args:
+            doc (Document): The idea.
+        """
+        old = self._docs.get(doc["_id"])
+
+        if old is not None:
+            self._by_user.get(old.get("userId"), set()).discard(doc["_id"])
+
+        self._docs[doc["_id"]] = doc
+        self._by_user.setdefault(doc.get("userId"), set()).add(doc["_id"])
+        self._log_version(doc)
+
+
+    def _log_version(self, doc: Document) -> None:
+        """Add the sync version of the idea or tombstone to the log.
+
+        Args:
+            doc (Document): The idea or tombstone.
+        """
+        version = doc.get("syncVersion")
+        entry = (version, doc["_id"])
+
+        if version is None or entry in self._logged:
+            return
+
+        self._logged.add(entry)
+        insort(self._log, entry)
+        current = len(self._docs) + len(self._tombstones)
+
+        # Replaced entries stay in the log until they are the majority.
+        if len(self._log) > 2 * current + 64:
+            self._logged = {
+                (stored["syncVersion"], stored["_id"])
+                for stored in (*self._docs.values(),
+                               *self._tombstones.values())
+                if stored.get("syncVersion") is not None
+            }
+            self._log = sorted(self._logged)
+
+
+class MemoryCommentRepository(_MemoryAuthored, CommentRepository):
+    """Comments in memory.
+
+    Attributes:
+        _docs (Dict[ObjectId, Document]): Comments by id.
+        _by_idea (Dict[str, List[ObjectId]]): Ids of the comments by idea
+        id, in ascending order.
+        _by_user (Dict[str, Set[ObjectId]]): Ids of the comments by author
+        id.
+    """
+
+    def __init__(self) -> None:
+        """Create an empty repository."""
+        self._docs: Dict[ObjectId, Document] = {}
+        self._by_idea: Dict[str, List[ObjectId]] = {}
+        self._by_user: Dict[str, Set[ObjectId]] = {}
+
+
+    async def insert(self, doc: Document) -> ObjectId:
+        doc = copy.deepcopy(doc)
+        doc.setdefault("_id", ObjectId())
+        self._store(doc)
+
+        return doc["_id"]
+
+
+    async def insert_many(self, docs: List[Document]) -> None:
+        for doc in docs:
+            await self.insert(doc)
+
+
+    async def find(self, query: Document) -> List[Document]:
+        if "_id" in query:
+            docs = [self._docs[query["_id"]]] if query["_id"] in self._docs \
+                else []
+        elif "ideaId" in query:
+            docs = [self._docs[comment_id]
+                    for comment_id in self._by_idea.get(query["ideaId"], ())]
+        else:
+            docs = list(self._docs.values())
+
+        return [_copy(doc) for doc in docs if _matches(doc, query)]
+
+
+    async def summaries(self, idea_ids: List[str],
+                        latest: int) -> List[Document]:
+        found = []
+
+        for idea_id in dict.fromkeys(idea_ids):
+            ids = self._by_idea.get(idea_id)
+
+            if not ids:
+                continue
+
+            summary: Document = {"_id": idea_id, "count": len(ids)}
+
+            if latest > 0:
+                summary["latest"] = [_copy(self._docs[comment_id])
+                                     for comment_id in ids[:-latest - 1:-1]]
+
+            found.append(summary)
+
+        return found
+
+
+    async def delete_owned(self, comment_id: ObjectId,
+                           user_id: str) -> Optional[Document]:
+        doc = self._docs.get(comment_id)
+
+        if doc is None or doc.get("userId") != user_id:
+            return None
+
+        del self._docs[comment_id]
+        self._unindex(doc)
+
+        return {"_id": comment_id, "ideaId": doc.get("ideaId")}
+
+
+    async def create_indexes(self) -> None:
+        # The indexes always exist.
+        return None
+
+
+    async def clear(self) -> None:
+        self._docs.clear()
+        self._by_idea.clear()
+        self._by_user.clear()
+
+
+    def _store(self, doc: Document) -> None:
+        """Store the new version of the comment and update the indexes.
+
+        Args:
+            doc (Document): The comment.
+        """
+        old = self._docs.get(doc["_id"])
+
+        if old is not None:
+            self._unindex(old)
+
+        self._docs[doc["_id"]] = doc
+        ids = self._by_idea.setdefault(doc.get("ideaId"), [])
+        insort(ids, doc["_id"])
+        self._by_user.setdefault(doc.get("userId"), set()).add(doc["_id"])
+
+
+    def _unindex(self, doc: Document) -> None:
+        """Remove the comment from the indexes.
+
+        Args:
+            doc (Document): The comment.
+        """
+        ids = self._by_idea.get(doc.get("ideaId"), [])
+
+        if doc["_id"] in ids:
+            ids.remove(doc["_id"])
+
+        self._by_user.get(doc.get("userId"), set()).discard(doc["_id"])
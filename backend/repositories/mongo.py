@@ -0,0 +1,537 @@
+"""Repositories storing the users, ideas and comments in MongoDB.
+
+The queries are the ones the CRUD modules used to run themselves: updates
+that depend on the current document, like likes and trending scores, are
+single pipeline updates, so they stay atomic under concurrent requests.
+
+The documentation of the methods is on the interfaces in `repositories.base`.
+"""
+
+from bson import ObjectId
+from datetime import datetime, timezone
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.database import Database
+from typing import Any, AsyncIterator, List, Optional, Tuple
+
+from internals.serialization import stream_json_array
+from internals.trending import (
+    SCORE_FIELD,
+    add_event_expr,
+    backfill_expr,
+    remove_event_expr,
+)
+from repositories.base import (
+    AuthoredRepository,
+    CommentRepository,
+    CounterRepository,
+    Document,
+    Fields,
+    IdeaRepository,
+    PropagationRepository,
+    SYNC_COUNTER,
+    UNIQUE_FIELDS,
+    UserRepository,
+)
+
+# Ideas given a sync version per bulk write of the backfill.
+BACKFILL_CHUNK_SIZE = 1000
+
+
+def _projection(fields: Fields) -> Optional[Document]:
+    """Build the projection reading the fields.
+
+    Args:
+        fields (Fields): Field names, None for all.
+
+    Returns:
+        Optional[Document]: The projection.
+    """
+    return None if fields is None else {field: 1 for field in fields}
+
+
+class _MongoAuthored(AuthoredRepository):
+    """Rewrites of the copied usernames in a collection.
+
+    Attributes:
+        collection (AsyncCollection): The collection.
+    """
+    collection: Any
+
+    async def find_stale_copies(
+        self,
+        user_id: str,
+        username: str,
+        after: Optional[ObjectId],
+        limit: int,
+    ) -> List[Document]:
+        query = {"userId": user_id, self.author_field: {"$ne": username}}
+
+        if after is not None:
+            query["_id"] = {"$gt": after}
+
+        return await self.collection.find(
+            query,
+            {"_id": 1, "ideaId": 1},
+            sort=[("_id", 1)],
+            limit=limit,
+        ).to_list()
+
+
+    async def set_many(self, user_id: str,
+                       updates: List[Tuple[ObjectId, Document]]) -> None:
+        if not updates:
+            return
+
+        await self.collection.bulk_write(
+            [
+                UpdateOne({"_id": doc_id, "userId": user_id},
+                          {"$set": update})
+                for doc_id, update in updates
+            ],
+            ordered=False,
+        )
+
+
+class MongoCounterRepository(CounterRepository):
+    """Counters in the 'counters' collection, one document per counter.
+
+    Attributes:
+        collection (AsyncCollection): The collection.
+    """
+
+    def __init__(self, db: Database) -> None:
+        """Use the collection of the database.
+
+        Args:
+            db (Database): The database.
+        """
+        self.collection = db["counters"]
+
+
+    async def get(self, name: str) -> int:
+        counter = await self.collection.find_one({"_id": name})
+
+        return 0 if counter is None else counter["seq"]
+
+
+    async def increment(self, name: str, count: int = 1) -> int:
+        counter = await self.collection.find_one_and_update(
+            {"_id": name},
+            {"$inc": {"seq": count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+
+        return counter["seq"]
+
+
+class MongoPropagationRepository(PropagationRepository):
+    """Propagations in the 'propagations' collection, by user id.
+
+    Attributes:
+        collection (AsyncCollection): The collection.
+    """
+
+    def __init__(self, db: Database) -> None:
+        """Use the collection of the database.
+
+        Args:
+            db (Database): The database.
+        """
+        self.collection = db["propagations"]
+
+
+    async def start(self, user_id: str, username: str) -> None:
+        await self.collection.replace_one(
+            {"_id": user_id},
+            {
+                "username": username,
+                "progress": {},
+                "createdAt": datetime.now(timezone.utc),
+            },
+            upsert=True,
+        )
+
+
+    async def get(self, user_id: str) -> Optional[Document]:
+        return await self.collection.find_one({"_id": user_id})
+
+
+    async def save_progress(self, user_id: str, username: str, target: str,
+                            last_id: ObjectId) -> bool:
+        saved = await self.collection.update_one(
+            {"_id": user_id, "username": username},
+            {"$set": {f"progress.{target}": last_id}},
+        )
+
+        return saved.matched_count > 0
+
+
+    async def finish(self, user_id: str, username: str) -> None:
+        await self.collection.delete_one({"_id": user_id,
+                                          "username": username})
+
+
+class MongoUserRepository(UserRepository):
+    """Users in the 'users' collection.
+
+    Attributes:
+        collection (AsyncCollection): The collection.
+    """
+
+    def __init__(self, db: Database) -> None:
+        """Use the collection of the database.
+
+        Args:
+            db (Database): The database.
+        """
+        self.collection = db["users"]
+
+
+    async def insert(self, doc: Document) -> ObjectId:
+        result = await self.collection.insert_one(doc)
+
+        return result.inserted_id
+
+
+    async def insert_many(self, docs: List[Document]) -> None:
+        await self.collection.insert_many(docs, ordered=False)
+
+
+    async def get_many(self, user_ids: List[ObjectId]) -> List[Document]:
+        return await self.collection.find(
+            {"_id": {"$in": user_ids}}, {"password": 0}).to_list()
+
+
+    async def find(self, query: Document) -> List[Document]:
+        return await self.collection.find(query).to_list()
+
+
+    async def scan(self, fields: Fields = None) -> AsyncIterator[Document]:
+        async for doc in self.collection.find({}, _projection(fields)):
+            yield doc
+
+
+    async def update(self, user_id: ObjectId,
+                     data: Document) -> Optional[Document]:
+        result = await self.collection.update_one({"_id": user_id},
+                                                  {"$set": data})
+
+        if result.modified_count != 1:
+            return None
+
+        return await self.collection.find_one({"_id": user_id})
+
+
+    async def delete(self, user_id: ObjectId) -> bool:
+        result = await self.collection.delete_one({"_id": user_id})
+
+        return result.deleted_count == 1
+
+
+    async def create_indexes(self) -> None:
+        # Fails if the collection already contains duplicates, they have to
+        # be resolved by hand first.
+        for field in UNIQUE_FIELDS:
+            await self.collection.create_index(field, unique=True,
+                                               name=f"{field}_unique")
+
+
+    async def clear(self) -> None:
+        await self.collection.delete_many({})
+
+
+class MongoIdeaRepository(_MongoAuthored, IdeaRepository):
+    """Ideas in the 'ideas' collection and the tombstones of deleted ideas
+    in 'idea_tombstones'.
+
+    Attributes:
+        collection (AsyncCollection): The ideas.
+        tombstones (AsyncCollection): The tombstones.
+        counters (CounterRepository): Counters holding the sync version.
+    """
+
+    def __init__(self, db: Database, counters: CounterRepository) -> None:
+        """Use the collections of the database.
+
+        Args:
+            db (Database): The database.
+            counters (CounterRepository): Counters holding the sync version.
+        """
+        self.collection = db["ideas"]
+        self.tombstones = db["idea_tombstones"]
+        self.counters = counters
+
+
+    async def insert(self, doc: Document) -> Document:
+        result = await self.collection.insert_one(doc)
+
+        return await self.collection.find_one({"_id": result.inserted_id})
+
+
+    async def insert_many(self, docs: List[Document]) -> None:
+        await self.collection.insert_many(docs, ordered=False)
+
+
+    async def get(self, idea_id: ObjectId) -> Optional[Document]:
+        return await self.collection.find_one({"_id": idea_id})
+
+
+    async def get_many(self, idea_ids: List[ObjectId],
+                       fields: Fields = None) -> List[Document]:
+        return await self.collection.find(
+            {"_id": {"$in": idea_ids}}, _projection(fields)).to_list()
+
+
+    async def find(self, query: Document) -> List[Document]:
+        return await self.collection.find(query).to_list()
+
+
+    async def scan(self, fields: Fields = None) -> AsyncIterator[Document]:
+        async for doc in self.collection.find({}, _projection(fields)):
+            yield doc
+
+
+    def stream_json(self, reader: Any,
+                    chunk_size: int) -> AsyncIterator[bytes]:
+        return stream_json_array(self.collection, reader, {}, chunk_size)
+
+
+    async def top_by_score(self, limit: int) -> List[Document]:
+        return await self.collection.find().sort(SCORE_FIELD, -1).limit(
+            limit).to_list()
+
+
+    async def changes_since(
+        self,
+        since: int,
+        limit: int,
+    ) -> Tuple[List[Document], List[Document]]:
+        query = {"syncVersion": {"$gt": since}}
+        order = [("syncVersion", 1)]
+        updated = await self.collection.find(query, sort=order,
+                                             limit=limit).to_list()
+        deleted = await self.tombstones.find(query, sort=order,
+                                             limit=limit).to_list()
+
+        return updated, deleted
+
+
+    async def count(self) -> int:
+        return await self.collection.count_documents({})
+
+
+    async def update(self, idea_id: ObjectId,
+                     data: Document) -> Optional[Document]:
+        return await self.collection.find_one_and_update(
+            {"_id": idea_id},
+            {"$set": data},
+            return_document=ReturnDocument.AFTER,
+        )
+
+
+    async def add_like(
+        self,
+        idea_id: ObjectId,
+        user_id: str,
+        weight: float,
+        sync: Document,
+    ) -> Tuple[Optional[Document], bool]:
+        # The filter makes repeated likes a no-op, so they do not raise the
+        # score.
+        now = datetime.now(timezone.utc)
+        result = await self.collection.update_one(
+            {"_id": idea_id, "likedByUser": {"$ne": user_id}},
+            [{"$set": {
+                "likedByUser": {"$concatArrays": [
+                    {"$ifNull": ["$likedByUser", []]},
+                    [user_id],
+                ]},
+                "likedAt": {"$setField": {
+                    "field": {"$literal": user_id},
+                    "input": {"$ifNull": ["$likedAt", {}]},
+                    "value": {"$literal": now},
+                }},
+                SCORE_FIELD: add_event_expr(weight, now),
+                **sync,
+            }}],
+        )
+
+        return (await self.get(idea_id), result.modified_count == 1)
+
+
+    async def remove_like(
+        self,
+        idea_id: ObjectId,
+        user_id: str,
+        weight: float,
+        sync: Document,
+    ) -> Tuple[Optional[Document], bool]:
+        liked_at = {"$ifNull": ["$likedAt", {}]}
+        # All fields of the stage are computed from the document before it,
+        # so the score still reads the time of the like.
+        result = await self.collection.update_one(
+            {"_id": idea_id, "likedByUser": user_id},
+            [{"$set": {
+                "likedByUser": {"$filter": {
+                    "input": "$likedByUser",
+                    "cond": {"$ne": ["$$this", user_id]},
+                }},
+                "likedAt": {"$unsetField": {
+                    "field": {"$literal": user_id},
+                    "input": liked_at,
+                }},
+                SCORE_FIELD: remove_event_expr(weight, {"$ifNull": [
+                    {"$getField": {
+                        "field": {"$literal": user_id},
+                        "input": liked_at,
+                    }},
+                    {"$toDate": "$_id"},
+                ]}),
+                **sync,
+            }}],
+        )
+
+        return (await self.get(idea_id), result.modified_count == 1)
+
+
+    async def add_score(self, idea_id: ObjectId, weight: float) -> None:
+        await self.collection.update_one(
+            {"_id": idea_id},
+            [{"$set": {SCORE_FIELD: add_event_expr(weight)}}],
+        )
+
+
+    async def remove_score(self, idea_id: ObjectId, weight: float,
+                           when: datetime) -> None:
+        await self.collection.update_one(
+            {"_id": idea_id},
+            [{"$set": {SCORE_FIELD: remove_event_expr(weight, when)}}],
+        )
+
+
+    async def delete(self, idea_id: ObjectId,
+                     sync: Document) -> Optional[Document]:
+        deleted = await self.collection.find_one_and_delete(
+            {"_id": idea_id},
+            projection={"userId": 1},
+        )
+
+        if deleted is not None:
+            await self.tombstones.replace_one({"_id": idea_id}, sync,
+                                              upsert=True)
+
+        return deleted
+
+
+    async def reserve_versions(self, count: int) -> int:
+        return await self.counters.increment(SYNC_COUNTER, count) - count + 1
+
+
+    async def create_indexes(self) -> None:
+        await self.collection.create_index([(SCORE_FIELD, -1)])
+        await self.collection.create_index([("syncVersion", 1)])
+        await self.tombstones.create_index([("syncVersion", 1)])
+        await self.collection.update_many(
+            {SCORE_FIELD: {"$exists": False}},
+            [{"$set": {SCORE_FIELD: backfill_expr()}}],
+        )
+        await self._backfill_versions()
+
+
+    async def clear(self) -> None:
+        await self.collection.delete_many({})
+        await self.tombstones.delete_many({})
+
+
+    async def _backfill_versions(self) -> None:
+        """Give every idea without a sync version a version of its own."""
+        # Versions start at 1, 0 was given by an earlier backfill.
+        query = {"syncVersion": {"$in": [None, 0]}}
+
+        while True:
+            docs = await self.collection.find(
+                query, {"_id": 1}, limit=BACKFILL_CHUNK_SIZE).to_list()
+
+            if not docs:
+                return
+
+            first = await self.reserve_versions(len(docs))
+            await self.collection.bulk_write(
+                [
+                    UpdateOne({"_id": doc["_id"], **query}, [{"$set": {
+                        "syncVersion": first + i,
+                        "updatedAt": {"$ifNull": ["$updatedAt",
+                                                  {"$toDate": "$_id"}]},
+                    }}])
+                    for i, doc in enumerate(docs)
+                ],
+                ordered=False,
+            )
+
+
+class MongoCommentRepository(_MongoAuthored, CommentRepository):
+    """Comments in the 'comments' collection.
+
+    Attributes:
+        collection (AsyncCollection): The collection.
+    """
+
+    def __init__(self, db: Database) -> None:
+        """Use the collection of the database.
+
+        Args:
+            db (Database): The database.
+        """
+        self.collection = db["comments"]
+
+
+    async def insert(self, doc: Document) -> ObjectId:
+        result = await self.collection.insert_one(doc)
+
+        return result.inserted_id
+
+
+    async def insert_many(self, docs: List[Document]) -> None:
+        await self.collection.insert_many(docs, ordered=False)
+
+
+    async def find(self, query: Document) -> List[Document]:
+        return await self.collection.find(query).to_list()
+
+
+    async def summaries(self, idea_ids: List[str],
+                        latest: int) -> List[Document]:
+        group = {"_id": "$ideaId", "count": {"$sum": 1}}
+
+        if latest > 0:
+            group["latest"] = {
+                "$topN": {
+                    "n": latest,
+                    "sortBy": {"_id": -1},
+                    "output": "$$ROOT",
+                }
+            }
+
+        pipeline = [
+            {"$match": {"ideaId": {"$in": list(idea_ids)}}},
+            {"$group": group},
+        ]
+
+        return await (await self.collection.aggregate(pipeline)).to_list()
+
+
+    async def delete_owned(self, comment_id: ObjectId,
+                           user_id: str) -> Optional[Document]:
+        return await self.collection.find_one_and_delete(
+            {"_id": comment_id, "userId": user_id},
+            projection={"ideaId": 1},
+        )
+
+
+    async def create_indexes(self) -> None:
+        await self.collection.create_index([("ideaId", 1), ("_id", -1)])
+
+
+    async def clear(self) -> None:
+        await self.collection.delete_many({})
@@ -0,0 +1,213 @@
+"""FastAPI router for administrative tasks: streaming NDJSON exports and
+batched imports of whole collections, and the stored request profiles.
+"""
+
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import FileResponse, StreamingResponse
+from typing import List
+from pymongo.errors import BulkWriteError
+
+from crud.ideas import (
+    create_indexes as create_idea_indexes,
+    idea_cache,
+    rebuild_search_index,
+    rebuild_title_index,
+)
+from crud.transfer import (
+    EXPORT_PROJECTIONS,
+    export_ndjson,
+    import_ndjson,
+    iter_lines,
+)
+from crud.user import rebuild_username_index
+from repositories import uses_memory
+from internals.auth import get_current_admin
+from internals.profiler import profile_store
+from internals.versions import IDEAS_SCOPE, versions
+from models.profile import ProfileInfo
+from models.transfer import ImportResult
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(get_current_admin)],
+)
+
+
+def _check_collection(name: str) -> None:
+    """Make sure the collection can be exported and imported.
+
+    Raises:
+        HTTPException: If the storage backend has no collections to transfer
+        or the collection is not supported.
+    """
+    # The transfers read and write MongoDB directly, with the memory backend
+    # they would wait for a server that is not there.
+    if uses_memory():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Transfers need STORAGE_BACKEND=mongo",
+        )
+
+    if name not in EXPORT_PROJECTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown collection '{name}'",
+        )
+
+
+@router.get(
+    "/export/{collection}",
+    response_description="The collection as NDJSON, one document per line."
+)
+async def export_collection(
+    collection: str,
+    batch_size: int = Query(default=1000, ge=1, le=10000),
+) -> StreamingResponse:
+    """Stream all documents of the collection as NDJSON.
+
+    Users are exported without their password hashes.
+
+    Args:
+        collection (str): One of "ideas", "users" or "comments".
+        batch_size (int): Documents read from the cursor at once.
+
+    Raises:
+        HTTPException: If the storage backend is not MongoDB or the
+        collection is not supported.
+
+    Returns:
+        StreamingResponse: MongoDB Extended JSON lines.
+    """
+    _check_collection(collection)
+
+    return StreamingResponse(
+        export_ndjson(collection, batch_size),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.post(
+    "/import/{collection}",
+    response_model=ImportResult,
+    response_description="Counts of imported documents and the checkpoint."
+)
+async def import_collection(
+    collection: str,
+    request: Request,
+    batch_size: int = Query(default=1000, ge=1, le=10000),
+    ordered: bool = Query(default=True),
+    resume_from: int = Query(default=0, ge=0),
+) -> ImportResult:
+    """Insert the NDJSON request body into the collection in batches.
+
+    If the import fails, the error reports the checkpoint of the last written
+    batch. Sending the same body again with `resume_from` set to it skips the
+    lines that were already imported. Users need a password, a plain-text
+    one is hashed, and ideas get new sync versions.
+
+    Args:
+        collection (str): One of "ideas", "users" or "comments".
+        batch_size (int): Documents per insert.
+        ordered (bool): Whether documents of a batch are inserted in order.
+        resume_from (int): Number of input lines to skip.
+
+    Raises:
+        HTTPException: If the storage backend is not MongoDB, the collection
+        is not supported or the body can not be imported.
+
+    Returns:
+        ImportResult: Counts of inserted and skipped documents and the
+        checkpoint.
+    """
+    _check_collection(collection)
+
+    checkpoint = resume_from
+
+    async def save_checkpoint(line: int) -> None:
+        nonlocal checkpoint
+        checkpoint = line
+
+    try:
+        result = await import_ndjson(
+            collection,
+            iter_lines(request.stream()),
+            batch_size=batch_size,
+            ordered=ordered,
+            resume_from=resume_from,
+            on_checkpoint=save_checkpoint,
+        )
+    except (ValueError, BulkWriteError) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": str(exc), "checkpoint": checkpoint},
+        ) from exc
+    finally:
+        await _refresh_derived_state(collection)
+
+    return result
+
+
+@router.get(
+    "/profiles",
+    response_model=List[ProfileInfo],
+    response_description="Stored request profiles, newest first."
+)
+async def list_profiles() -> List[ProfileInfo]:
+    """List the stored request profiles.
+
+    Requests are profiled when they carry the `X-Profile` header with an
+    admin token, or at random with `PROFILE_SAMPLE_RATE`.
+
+    Returns:
+        List[ProfileInfo]: Metadata of the profiles.
+    """
+    return await asyncio.to_thread(profile_store.list)
+
+
+@router.get(
+    "/profiles/{name}",
+    response_description="The profile as folded stacks."
+)
+async def download_profile(name: str) -> FileResponse:
+    """Download a request profile in the folded stack format, the input of
+    flamegraph.pl and speedscope.
+
+    Args:
+        name (str): Name of the profile.
+
+    Raises:
+        HTTPException: If the profile does not exist.
+
+    Returns:
+        FileResponse: One stack per line followed by its number of samples.
+    """
+    path = profile_store.path(name)
+
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found",
+        )
+
+    return FileResponse(path, media_type="text/plain",
+                        filename=f"{name}.folded")
+
+
+async def _refresh_derived_state(collection: str) -> None:
+    """Rebuild the in-memory indexes and caches after documents were written
+    around the CRUD functions.
+
+    Args:
+        collection (str): Name of the imported collection.
+    """
+    if collection == "ideas":
+        await create_idea_indexes()
+        await rebuild_search_index()
+        await rebuild_title_index()
+        idea_cache.clear()
+        await versions.bump(IDEAS_SCOPE)
+    elif collection == "users":
+        await rebuild_username_index()
@@ -4,10 +4,11 @@ and current user info.
 
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException
+from pymongo.errors import DuplicateKeyError
 
-from crud.user import create_user, get_users, get_user
+from crud.user import create_user, duplicate_field, get_users, get_user
 from internals.auth import authenticate_user, create_token, decode_token, get_current_user
-from models.user import User, UserGet, UserLogin, UserFilter
+from models.user import UserCreate, UserGet, UserLogin, UserFilter
 from models.token import TokenPair
 from settings import Settings
 
@@ -21,8 +22,8 @@ settings = Settings()
     response_model=UserGet,
     status_code=201
 )
-async def register(user: User) -> UserGet:
-    """Register a new user.
+async def register(user: UserCreate) -> UserGet:
+    """Register a new user, never as an admin.
 
     Raises:
         HTTPException: If the email or username is already taken.
@@ -30,14 +31,17 @@ async def register(user: User) -> UserGet:
     Returns:
         UserGet: Newly created user (without password).
     """
-    if await len(get_users(UserFilter(email=user.email))) > 0:
-        raise HTTPException(409, "Email already taken")
-    if await len(get_users(UserFilter(username=user.username))) > 0:
-        raise HTTPException(409, "Username already taken")
+    try:
+        return await create_user(user)
+    except DuplicateKeyError as exc:
+        field = duplicate_field(exc)
 
-    new_user = await create_user(user)
+        if field == "email":
+            raise HTTPException(409, "Email already taken") from exc
+        if field == "username":
+            raise HTTPException(409, "Username already taken") from exc
 
-    return new_user
+        raise
 
 
 @router.post(
@@ -1,14 +1,33 @@
 """FastAPI router for comments."""
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from pydantic import TypeAdapter
 from typing import List
 
-from crud.comments import get_comments, create_comment, delete_comment
-from models.comment import Comment, CommentCreate, CommentFilter
+from crud.comments import (
+    create_comment,
+    delete_comment,
+    get_comment_summaries,
+    get_comments,
+)
+from models.comment import Comment, CommentCreate, CommentFilter, CommentSummary
 from internals.auth import get_current_user
+from internals.versions import comments_scope, versioned_response
 
 router = APIRouter(prefix="/comments", tags=["comments"])
 
+MAX_SUMMARY_IDS = 100
+MAX_SUMMARY_LATEST = 10
+COMMENT_LIST_ADAPTER = TypeAdapter(List[Comment])
+
 
 @router.post(
     "/",
@@ -38,6 +57,37 @@ async def create(
     return comment
 
 
+@router.get(
+    "/summary",
+    response_description="Comment counts and latest comments for many ideas",
+    response_model=List[CommentSummary],
+)
+async def list_comment_summaries(
+    ids: List[str] = Query(...),
+    latest: int = Query(default=0, ge=0, le=MAX_SUMMARY_LATEST),
+) -> List[CommentSummary]:
+    """Return the comment count, and optionally the newest comments, for a
+    batch of ideas in one request.
+
+    Args:
+        ids (List[str]): Ids of the ideas, passed as repeated `ids` params.
+        latest (int): How many of the newest comments to include per idea.
+
+    Raises:
+        HTTPException: If too many ids were requested.
+
+    Returns:
+        List[CommentSummary]: One summary per requested idea.
+    """
+    if len(ids) > MAX_SUMMARY_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_SUMMARY_IDS} ids can be requested",
+        )
+
+    return await get_comment_summaries(ids, latest)
+
+
 @router.get(
     "/{idea_id}",
     response_description="List all comments for a given idea",
@@ -45,17 +95,27 @@ async def create(
 )
 async def list_comments_for_idea(
     idea_id: str,
-) -> List[Comment]:
+    request: Request,
+) -> Response:
     """Retrieve all comments for a specific idea.
 
+    Responds with 304 when the If-None-Match header carries the ETag of the
+    current version of the comments.
+
     Args:
         idea_id (str): ID of the idea.
 
     Returns:
-        List[Comment]: List of comments associated with the idea.
+        Response: Comments associated with the idea as JSON, or an empty 304
+        response.
     """
-    comments = await get_comments(CommentFilter(idea_id=idea_id))
-    return comments
+    return await versioned_response(
+        request,
+        comments_scope(idea_id),
+        lambda: get_comments(CommentFilter(idea_id=idea_id)),
+        lambda comments: COMMENT_LIST_ADAPTER.dump_json(comments,
+                                                        by_alias=True),
+    )
 
 
 @router.delete(
@@ -0,0 +1,146 @@
+"""Router for realtime idea and comment updates.
+
+This module defines a WebSocket endpoint that:
+- Lets clients subscribe to and unsubscribe from single ideas.
+- Sends the batched delta events of `internals.events` as JSON arrays.
+- Closes connections of clients that fall behind, with 1013 (try again
+  later), and all connections on shutdown, with 1012 (service restart).
+
+Client messages:
+    {"subscribe": ["<idea_id>", ...]}
+    {"unsubscribe": ["<idea_id>", ...]}
+
+Both keys may be sent in one message. Any other message closes the connection
+with 1003 (unsupported data).
+"""
+
+import asyncio
+
+from bson import ObjectId
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from typing import Any, List, Optional, Tuple
+
+from internals.events import Subscription, event_bus, idea_topic
+from settings import Settings
+
+router = APIRouter(prefix="/events", tags=["events"])
+settings = Settings()
+
+UNSUPPORTED_DATA = 1003
+
+
+@router.websocket("/ws")
+async def events(websocket: WebSocket) -> None:
+    """WebSocket endpoint streaming the updates of the subscribed ideas.
+
+    The events are public, like the REST endpoints returning the same data,
+    so no token is required.
+
+    Args:
+        websocket (WebSocket): WebSocket connection instance.
+    """
+    await websocket.accept()
+    sub = event_bus.subscribe()
+    receiver = asyncio.create_task(_receive(websocket, sub))
+    sender = asyncio.create_task(_send(websocket, sub))
+
+    try:
+        await asyncio.wait({receiver, sender},
+                           return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        receiver.cancel()
+        sender.cancel()
+        await asyncio.wait({receiver, sender})
+        event_bus.unsubscribe(sub)
+
+
+async def _receive(websocket: WebSocket, sub: Subscription) -> None:
+    """Apply the subscription changes sent by the client.
+
+    Args:
+        websocket (WebSocket): WebSocket connection instance.
+        sub (Subscription): Subscription of the connection.
+    """
+    try:
+        while True:
+            try:
+                message = _parse_message(await websocket.receive_json())
+            except (KeyError, TypeError, ValueError):
+                message = None
+
+            if message is None:
+                await websocket.close(code=UNSUPPORTED_DATA,
+                                      reason="Unsupported message")
+                return
+
+            subscribe, unsubscribe = message
+            event_bus.remove_topics(
+                sub, [idea_topic(idea_id) for idea_id in unsubscribe])
+
+            topics = [
+                idea_topic(idea_id)
+                for idea_id in subscribe
+                if ObjectId.is_valid(idea_id)
+            ]
+            new = set(topics) - sub.topics
+
+            if len(sub.topics) + len(new) > settings.EVENT_MAX_TOPICS:
+                await websocket.send_json({
+                    "type": "error",
+                    "detail": f"At most {settings.EVENT_MAX_TOPICS} ideas "
+                              "can be subscribed",
+                })
+                continue
+
+            event_bus.add_topics(sub, new)
+    except (WebSocketDisconnect, RuntimeError):
+        return
+
+
+def _parse_message(data: Any) -> Optional[Tuple[List[str], List[str]]]:
+    """Read the idea ids of a client message.
+
+    Args:
+        data (Any): The decoded JSON message.
+
+    Returns:
+        Optional[Tuple[List[str], List[str]]]: Ids to subscribe and to
+        unsubscribe, None if the message has an unsupported shape.
+    """
+    if not isinstance(data, dict):
+        return None
+
+    ids = []
+
+    for key in ("subscribe", "unsubscribe"):
+        value = data.get(key, [])
+
+        if (not isinstance(value, list)
+                or not all(isinstance(idea_id, str) for idea_id in value)):
+            return None
+
+        ids.append(value)
+
+    return ids[0], ids[1]
+
+
+async def _send(websocket: WebSocket, sub: Subscription) -> None:
+    """Send the event frames of the subscription to the client.
+
+    Args:
+        websocket (WebSocket): WebSocket connection instance.
+        sub (Subscription): Subscription of the connection.
+    """
+    try:
+        while True:
+            frame = await sub.next_frame()
+
+            if frame is None:
+                # Dropped by the bus or shut down, the client has to
+                # resubscribe and refetch.
+                await websocket.close(code=sub.close_code)
+                return
+
+            await websocket.send_text(frame.decode("utf-8"))
+    except (WebSocketDisconnect, RuntimeError):
+        return
@@ -2,23 +2,47 @@
 liking, unliking, and user-specific idea queries.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List
+from typing import Dict, List
 
 from crud.ideas import (
     create_idea,
     delete_idea,
     get_idea,
     get_ideas,
-    get_all_ideas,
+    get_all_ideas_trusted,
+    stream_all_ideas_json,
+    get_idea_changes,
+    get_ideas_by_ids,
     get_liked_ideas,
+    get_trending_ideas,
     like_idea,
+    search_ideas,
     unlike_idea,
     update_idea
 )
 from internals.auth import get_current_user
-from models.idea import Idea, IdeaCreate, IdeaFilter, IdeaGet, IdeaUpdate
+from internals.serialization import dumps
+from internals.versions import IDEAS_SCOPE, versioned_response
+from models.batch import BatchRequest
+from models.idea import (
+    Idea,
+    IdeaChanges,
+    IdeaCreate,
+    IdeaFilter,
+    IdeaGet,
+    IdeaUpdate,
+)
 
 router = APIRouter(prefix="/ideas", tags=["ideas"])
 
@@ -52,13 +76,113 @@ async def create_idea_endpoint(idea: IdeaCreate) -> Idea:
     response_model=list[IdeaGet],
     response_description="All ideas from the database."
 )
-async def list_ideas() -> List[IdeaGet]:
+async def list_ideas(
+    request: Request,
+    stream: bool = Query(default=False),
+) -> Response:
     """Return all ideas in a compact format.
 
+    Responds with 304 when the If-None-Match header carries the ETag of the
+    current version of the list. With `stream=true` the list is instead
+    streamed from the database cursor in chunks, which keeps the memory flat
+    for very large listings, but is sent without an ETag.
+
+    Returns:
+        Response: All stored ideas as JSON, or an empty 304 response.
+    """
+    if stream:
+        return StreamingResponse(stream_all_ideas_json(),
+                                 media_type="application/json")
+
+    return await versioned_response(
+        request,
+        IDEAS_SCOPE,
+        get_all_ideas_trusted,
+        dumps,
+    )
+
+
+@router.post(
+    "/batch",
+    response_model=Dict[str, IdeaGet],
+    response_description="Found ideas keyed by their id."
+)
+async def get_ideas_batch(request: BatchRequest) -> Dict[str, IdeaGet]:
+    """Fetch many ideas in the compact format with a single query.
+
+    Args:
+        request (BatchRequest): Ids of the ideas.
+
+    Returns:
+        Dict[str, IdeaGet]: Ideas by id. Ids that were not found are missing.
+    """
+    return await get_ideas_by_ids(request.ids)
+
+
+@router.get(
+    "/search",
+    response_model=list[IdeaGet],
+    response_description="Ideas matching the query, best match first."
+)
+async def search_ideas_endpoint(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(default=20, ge=1, le=100),
+) -> List[IdeaGet]:
+    """Full-text search over the title, description and long description.
+
+    Args:
+        q (str): Free text query.
+        limit (int): Maximum number of returned ideas.
+
+    Returns:
+        List[IdeaGet]: Ideas ranked by relevance.
+    """
+    return await search_ideas(q, limit)
+
+
+@router.get(
+    "/changes",
+    response_model=IdeaChanges,
+    response_description="Ideas changed or deleted since the given version."
+)
+async def list_idea_changes(
+    since: int = Query(default=-1, ge=-1),
+    limit: int = Query(default=500, ge=1, le=1000),
+) -> IdeaChanges:
+    """Return only what changed since the client's last sync.
+
+    Clients start with `since=-1`, store the returned `version` and pass it
+    as `since` on the next call. While `hasMore` is true there are more
+    changes ready to be fetched right away.
+
+    Args:
+        since (int): Last sync version the client has.
+        limit (int): Maximum number of returned changes.
+
+    Returns:
+        IdeaChanges: Changed ideas, ids of deleted ideas and the new version.
+    """
+    return await get_idea_changes(since, limit)
+
+
+@router.get(
+    "/trending",
+    response_model=list[IdeaGet],
+    response_description="Ideas with the most recent engagement."
+)
+async def list_trending_ideas(
+    limit: int = Query(default=20, ge=1, le=100),
+) -> List[IdeaGet]:
+    """Return the ideas ranked by likes, comments and recency, with older
+    engagement counting less.
+
+    Args:
+        limit (int): Maximum number of returned ideas.
+
     Returns:
-        List[IdeaGet]: All stored ideas.
+        List[IdeaGet]: Trending ideas, hottest first.
     """
-    return await get_all_ideas()
+    return await get_trending_ideas(limit)
 
 
 @router.get(
@@ -0,0 +1,60 @@
+"""Router exposing the metrics of the process for Prometheus."""
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from typing import List
+
+from crud.ideas import idea_cache, idea_loader
+from crud.jobs import get_job_counts
+from crud.user import user_loader
+from internals.events import event_bus
+from internals.jobs import job_runner
+from internals.loop_monitor import loop_monitor
+from internals.metrics import Sample, metrics, stats_samples
+from repositories import uses_memory
+
+router = APIRouter(tags=["metrics"])
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", response_class=PlainTextResponse,
+            include_in_schema=False)
+async def get_metrics() -> PlainTextResponse:
+    """Return the metrics in the Prometheus text format.
+
+    Besides the MongoDB command and pool metrics recorded by the driver
+    listeners and the CPU time and memory of the process, it contains the
+    statistics of the caches, batch loaders, job workers and event bus of
+    this process, the percentiles of the latest event loop lags in seconds
+    and the size of the job queue, which only exists with MongoDB.
+
+    Returns:
+        PlainTextResponse: The exposition text.
+    """
+    samples: List[Sample] = []
+    samples += stats_samples(
+        "idea_cache", idea_cache.stats(),
+        counters=("hits", "misses", "coalesced", "evictions"),
+    )
+
+    for name, loader in (("ideas", idea_loader), ("users", user_loader)):
+        samples += stats_samples("batch_loader", loader.stats(),
+                                 labels={"loader": name},
+                                 counters=("batches", "keys"))
+
+    samples += stats_samples("job_runner", job_runner.stats(),
+                             counters=("processed", "failed"))
+    samples += stats_samples(
+        "event_bus", event_bus.stats(),
+        counters=("published", "frames", "dropped"),
+    )
+
+    samples += stats_samples("event_loop_lag_recent", loop_monitor.stats())
+
+    if not uses_memory():
+        for state, count in (await get_job_counts()).items():
+            samples.append(("job_queue_jobs", "Jobs in the queue by state",
+                            "gauge", {"state": state}, count))
+
+    return PlainTextResponse(metrics.render(samples), media_type=CONTENT_TYPE)
@@ -0,0 +1,52 @@
+"""FastAPI router for autocomplete suggestions of idea titles and usernames."""
+
+from fastapi import APIRouter, Query
+from typing import List
+
+from crud.ideas import suggest_titles
+from crud.user import suggest_usernames
+from models.suggestion import Suggestion
+
+router = APIRouter(prefix="/suggest", tags=["suggest"])
+
+
+@router.get(
+    "/ideas",
+    response_model=List[Suggestion],
+    response_description="Ideas whose title starts with the prefix."
+)
+async def suggest_ideas_endpoint(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(default=10, ge=1, le=50),
+) -> List[Suggestion]:
+    """Suggest idea titles for the typed prefix, most liked first.
+
+    Args:
+        q (str): Typed prefix of any word of the title.
+        limit (int): Maximum number of suggestions.
+
+    Returns:
+        List[Suggestion]: Suggested ideas.
+    """
+    return await suggest_titles(q, limit)
+
+
+@router.get(
+    "/users",
+    response_model=List[Suggestion],
+    response_description="Users whose username starts with the prefix."
+)
+async def suggest_users_endpoint(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(default=10, ge=1, le=50),
+) -> List[Suggestion]:
+    """Suggest usernames for the typed prefix, most active users first.
+
+    Args:
+        q (str): Typed prefix of the username.
+        limit (int): Maximum number of suggestions.
+
+    Returns:
+        List[Suggestion]: Suggested users.
+    """
+    return await suggest_usernames(q, limit)
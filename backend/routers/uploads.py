@@ -0,0 +1,81 @@
+"""FastAPI router for uploading the images of an idea.
+
+The files are written to `UPLOAD_DIR`, which the app creates on startup and
+serves under /api/uploads.
+"""
+
+import asyncio
+import os
+import shutil
+
+from fastapi import APIRouter, File, HTTPException, UploadFile
+from uuid import uuid4
+from typing import BinaryIO, List
+
+from crud.ideas import get_idea, update_idea
+from models.idea import IdeaUpdate
+
+router = APIRouter(tags=["uploads"])
+
+UPLOAD_DIR = "uploads"
+
+IMAGE_MIME_TYPES = {
+    "image/png",
+    "image/jpeg",
+    "image/jpg",
+    "image/webp",
+    "image/gif",
+    "image/bmp"
+}
+
+
+def _save_upload(source: BinaryIO, path: str) -> None:
+    """Copy an uploaded file to disk, blocking, so run it in a thread.
+
+    Args:
+        source (BinaryIO): The spooled upload.
+        path (str): Destination path.
+    """
+    with open(path, "wb") as buffer:
+        shutil.copyfileobj(source, buffer)
+
+
+@router.post("/upload-images/{idea_id}")
+async def upload_image(idea_id: str, images: List[UploadFile] = File(...)):
+    """Save the images and make them the images of the idea.
+
+    Args:
+        idea_id (str): Id of the idea.
+        images (List[UploadFile]): The uploaded images.
+
+    Raises:
+        HTTPException: 404 if the idea does not exist, 400 if a file is not
+        an image.
+    """
+    idea = await get_idea(idea_id)
+
+    if not idea:
+        raise HTTPException(404, "Idea not found")
+
+    saved_paths = []
+
+    for image in images:
+        if image.content_type not in IMAGE_MIME_TYPES:
+            raise HTTPException(400, "File is not an image")
+
+        ext = image.filename.split(".")[-1].lower()
+
+        unique_name = f"{uuid4()}.{ext}"
+        file_path = os.path.join(UPLOAD_DIR, unique_name)
+
+        await asyncio.to_thread(_save_upload, image.file, file_path)
+
+        saved_paths.append(file_path)
+
+    # The idea returned by get_idea is shared with the cache, so only the
+    # changed field is sent to the update.
+    await update_idea(idea_id, IdeaUpdate(images=saved_paths))
+
+    return {
+        "ok": True,
+    }
@@ -0,0 +1,37 @@
+"""FastAPI router for reading public user information."""
+
+from fastapi import APIRouter, Depends
+from typing import Dict
+
+from crud.user import get_users_by_ids
+from internals.auth import get_current_user
+from models.batch import BatchRequest
+from models.user import UserPublic
+
+router = APIRouter(
+    prefix="/users",
+    tags=["users"],
+    dependencies=[Depends(get_current_user)],
+)
+
+
+@router.post(
+    "/batch",
+    response_model=Dict[str, UserPublic],
+    response_description="Found users keyed by their id."
+)
+async def get_users_batch(request: BatchRequest) -> Dict[str, UserPublic]:
+    """Fetch the public data of many users with a single query, e.g. to
+    resolve the authors of a list of ideas.
+
+    Args:
+        request (BatchRequest): Ids of the users.
+
+    Returns:
+        Dict[str, UserPublic]: Users by id. Ids that were not found are
+        missing.
+    """
+    users = await get_users_by_ids(request.ids)
+
+    return {user_id: UserPublic.model_validate(user.model_dump(by_alias=True))
+            for user_id, user in users.items()}
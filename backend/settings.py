@@ -21,6 +21,70 @@ class Settings:
         tokens.
         MONGODB_URI (str): MongoDB connection URI.
         MONGODB_DB (str): Name of the MongoDB database.
+        STORAGE_BACKEND (str): Storage of the users, ideas and comments,
+        "mongo" or "memory" to run without a database.
+        SEARCH_SNAPSHOT_PATH (str): File where the full-text search index is
+        saved between restarts.
+        TRENDING_HALF_LIFE_HOURS (float): Time after which the weight of a
+        like or comment in the trending score drops by half.
+        IDEA_CACHE_SIZE (int): Maximum number of ideas kept in the read-through
+        cache, 0 disables it.
+        IDEA_CACHE_WARMUP (int): Number of trending ideas loaded into the cache
+        at startup.
+        RESPONSE_CACHE_SIZE (int): Maximum number of serialized listing
+        responses kept for ETag revalidation.
+        SYNC_SETTLE_SECONDS (float): Age a change to an idea needs before the
+        delta sync returns it, longer than any single write can take.
+        BATCH_WINDOW_MS (float): Time during which single idea and user
+        lookups are collected into one query.
+        MAX_BATCH_IDS (int): Maximum number of ids in one batch lookup.
+        PROPAGATION_CHUNK_SIZE (int): Documents rewritten per bulk write when
+        a renamed username is propagated.
+        PROPAGATION_PAUSE_MS (float): Pause between two propagation chunks.
+        JOB_WORKERS (int): Number of background job workers started in each
+        API process, 0 when jobs run only in `python -m cli.worker`.
+        JOB_POLL_SECONDS (float): Time an idle worker waits before looking
+        for new jobs again.
+        JOB_LEASE_SECONDS (float): Time after which a job of a worker that
+        stopped renewing its lease is claimed by another worker.
+        JOB_MAX_ATTEMPTS (int): Default number of runs before a job is marked
+        as failed.
+        JOB_RETRY_BASE_SECONDS (float): Delay before the first retry of a
+        failed job, doubled with every further attempt.
+        JOB_RETENTION_HOURS (float): Time finished jobs are kept.
+        JOB_DRAIN_SECONDS (float): Time running jobs get to finish on
+        shutdown before they are put back into the queue.
+        EVENT_BATCH_MS (float): Time realtime events are collected before
+        they are sent to the subscribers.
+        EVENT_QUEUE_SIZE (int): Unsent event frames after which a slow
+        subscriber is disconnected.
+        EVENT_MAX_TOPICS (int): Maximum number of ideas one WebSocket can
+        subscribe to.
+        SLOW_REQUEST_MS (float): Duration above which a request is written to
+        the slow request log.
+        SERVER_TIMING (bool): Whether responses carry a Server-Timing header
+        with the time spent per phase.
+        PROFILE_SAMPLE_RATE (float): Fraction of requests profiled at random,
+        0 profiles only requests of admins with the X-Profile header.
+        PROFILE_INTERVAL_MS (float): Time between two stack samples of a
+        profiled request.
+        PROFILE_DIR (str): Directory the request profiles are written to.
+        PROFILE_MAX_FILES (int): Number of request profiles kept.
+        LOOP_LAG_INTERVAL_MS (float): Time between two measurements of the
+        event loop lag.
+        LOOP_LAG_WINDOW (int): Number of latest lag measurements the exported
+        percentiles are computed from.
+        LOOP_BLOCK_THRESHOLD_MS (float): Time a callback may block the event
+        loop before its stack is logged, 0 disables the check.
+        SERVER_WORKERS (int): Number of worker processes of `python -m
+        cli.serve`, 0 for one per available CPU core. Defaults to 1, the
+        in-memory caches and indexes are not shared between workers.
+        SERVER_KEEP_ALIVE_SECONDS (int): Time an idle keep-alive connection
+        is kept open, longer than the idle timeout of the load balancer.
+        SERVER_BACKLOG (int): Maximum number of connections waiting to be
+        accepted.
+        SHUTDOWN_TIMEOUT_SECONDS (float): Time in-flight requests get to
+        finish after a stop signal before they are cancelled.
     """
     _instance: Optional["Settings"] = None
 
@@ -50,7 +114,61 @@ class Settings:
             os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1"))
         self.MONGODB_URI: str = os.getenv(
             "MONGODB_URI", "mongodb://localhost:27017")
-        self.MONGODB_DB: str = "brain_bridge"
+        self.MONGODB_DB: str = os.getenv("MONGODB_DB", "brain_bridge")
+        self.STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "mongo")
+        self.SEARCH_SNAPSHOT_PATH: str = os.getenv(
+            "SEARCH_SNAPSHOT_PATH", "search_index.json")
+        self.TRENDING_HALF_LIFE_HOURS: float = float(
+            os.getenv("TRENDING_HALF_LIFE_HOURS", "24"))
+        self.IDEA_CACHE_SIZE: int = int(os.getenv("IDEA_CACHE_SIZE", "1024"))
+        self.IDEA_CACHE_WARMUP: int = int(os.getenv("IDEA_CACHE_WARMUP", "0"))
+        self.RESPONSE_CACHE_SIZE: int = int(
+            os.getenv("RESPONSE_CACHE_SIZE", "256"))
+        self.SYNC_SETTLE_SECONDS: float = float(
+            os.getenv("SYNC_SETTLE_SECONDS", "2"))
+        self.BATCH_WINDOW_MS: float = float(os.getenv("BATCH_WINDOW_MS", "1"))
+        self.MAX_BATCH_IDS: int = int(os.getenv("MAX_BATCH_IDS", "100"))
+        self.PROPAGATION_CHUNK_SIZE: int = int(
+            os.getenv("PROPAGATION_CHUNK_SIZE", "500"))
+        self.PROPAGATION_PAUSE_MS: float = float(
+            os.getenv("PROPAGATION_PAUSE_MS", "50"))
+        self.JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+        self.JOB_POLL_SECONDS: float = float(
+            os.getenv("JOB_POLL_SECONDS", "1"))
+        self.JOB_LEASE_SECONDS: float = float(
+            os.getenv("JOB_LEASE_SECONDS", "60"))
+        self.JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+        self.JOB_RETRY_BASE_SECONDS: float = float(
+            os.getenv("JOB_RETRY_BASE_SECONDS", "5"))
+        self.JOB_RETENTION_HOURS: float = float(
+            os.getenv("JOB_RETENTION_HOURS", "24"))
+        self.JOB_DRAIN_SECONDS: float = float(
+            os.getenv("JOB_DRAIN_SECONDS", "10"))
+        self.EVENT_BATCH_MS: float = float(os.getenv("EVENT_BATCH_MS", "50"))
+        self.EVENT_QUEUE_SIZE: int = int(os.getenv("EVENT_QUEUE_SIZE", "64"))
+        self.EVENT_MAX_TOPICS: int = int(
+            os.getenv("EVENT_MAX_TOPICS", "100"))
+        self.SLOW_REQUEST_MS: float = float(
+            os.getenv("SLOW_REQUEST_MS", "500"))
+        self.SERVER_TIMING: bool = os.getenv("SERVER_TIMING", "1") == "1"
+        self.PROFILE_SAMPLE_RATE: float = float(
+            os.getenv("PROFILE_SAMPLE_RATE", "0"))
+        self.PROFILE_INTERVAL_MS: float = float(
+            os.getenv("PROFILE_INTERVAL_MS", "5"))
+        self.PROFILE_DIR: str = os.getenv("PROFILE_DIR", "profiles")
+        self.PROFILE_MAX_FILES: int = int(
+            os.getenv("PROFILE_MAX_FILES", "50"))
+        self.LOOP_LAG_INTERVAL_MS: float = float(
+            os.getenv("LOOP_LAG_INTERVAL_MS", "100"))
+        self.LOOP_LAG_WINDOW: int = int(os.getenv("LOOP_LAG_WINDOW", "600"))
+        self.LOOP_BLOCK_THRESHOLD_MS: float = float(
+            os.getenv("LOOP_BLOCK_THRESHOLD_MS", "0"))
+        self.SERVER_WORKERS: int = int(os.getenv("SERVER_WORKERS", "1"))
+        self.SERVER_KEEP_ALIVE_SECONDS: int = int(
+            os.getenv("SERVER_KEEP_ALIVE_SECONDS", "75"))
+        self.SERVER_BACKLOG: int = int(os.getenv("SERVER_BACKLOG", "2048"))
+        self.SHUTDOWN_TIMEOUT_SECONDS: float = float(
+            os.getenv("SHUTDOWN_TIMEOUT_SECONDS", "20"))
 
 
     def __getattr__(self, name) -> NoReturn:
@@ -0,0 +1,90 @@
+"""Fixtures running the API on the memory storage backend.
+
+The settings are read when the modules are imported, so the environment is
+set up before anything from the backend is imported. The repositories are
+module globals shared by all tests, every test creates its own users and
+ideas instead of expecting an empty database.
+"""
+
+import os
+import tempfile
+
+from uuid import uuid4
+
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ["SYNC_SETTLE_SECONDS"] = "0"
+os.environ["SEARCH_SNAPSHOT_PATH"] = os.path.join(
+    tempfile.mkdtemp(prefix="brain_bridge_tests_"), "search_index.json")
+
+import pytest
+
+from fastapi.testclient import TestClient
+
+from main import create_app
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Client of an app started once for the whole session."""
+    with TestClient(create_app()) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def run(client):
+    """Run a coroutine function on the event loop of the app.
+
+    The batch loaders and caches are bound to that loop, so CRUD functions
+    are not awaited on a loop of their own.
+    """
+    return client.portal.call
+
+
+@pytest.fixture
+def user(client):
+    """Register a new user and return it with its authorization headers."""
+    name = f"user{uuid4().hex[:12]}"
+    data = {
+        "username": name,
+        "email": f"{name}@example.com",
+        "password": "password123",
+        "name": "Test",
+        "surname": "User",
+    }
+    response = client.post("/api/auth/register", json=data)
+    assert response.status_code == 201, response.text
+    user_id = response.json()["_id"]
+
+    response = client.post("/api/auth/login", json={
+        "email": data["email"],
+        "password": data["password"],
+    })
+    assert response.status_code == 200, response.text
+    token = response.json()["accessToken"]
+
+    return {
+        **data,
+        "id": user_id,
+        "headers": {"Authorization": f"Bearer {token}"},
+    }
+
+
+@pytest.fixture
+def new_idea(client, user):
+    """Return a function creating an idea of the user through the API."""
+    def create(**fields):
+        data = {
+            "title": f"Idea {uuid4().hex[:8]}",
+            "userId": user["id"],
+            "author": user["username"],
+            "description": "A description",
+            "links": [],
+            "wantedContributors": "Anyone",
+            **fields,
+        }
+        response = client.post("/api/ideas/", json=data)
+        assert response.status_code == 201, response.text
+
+        return response.json()
+
+    return create
@@ -0,0 +1,94 @@
+"""Tests of the registration relying on the unique indexes and of the
+login."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from pymongo.errors import DuplicateKeyError
+from uuid import uuid4
+
+from crud.user import duplicate_field
+
+CONCURRENT_REGISTRATIONS = 8
+
+
+def registration(username, email):
+    return {
+        "username": username,
+        "email": email,
+        "password": "password123",
+        "name": "Test",
+        "surname": "User",
+    }
+
+
+def register_at_once(client, payloads):
+    """Send the registrations concurrently to the app of the client."""
+    async def send_all():
+        transport = httpx.ASGITransport(app=client.app)
+
+        async with httpx.AsyncClient(transport=transport,
+                                     base_url="http://test") as http:
+            return await asyncio.gather(*(
+                http.post("/api/auth/register", json=payload)
+                for payload in payloads
+            ))
+
+    return client.portal.call(send_all)
+
+
+def assert_one_created(responses, detail):
+    codes = sorted(response.status_code for response in responses)
+
+    assert codes == [201] + [409] * (len(responses) - 1)
+
+    for response in responses:
+        if response.status_code == 409:
+            assert response.json()["detail"] == detail
+
+
+def test_concurrent_registrations_create_one_user(client):
+    name = f"user{uuid4().hex[:12]}"
+    payload = registration(name, f"{name}@example.com")
+    responses = register_at_once(client,
+                                 [payload] * CONCURRENT_REGISTRATIONS)
+
+    assert_one_created(responses, "Email already taken")
+
+
+def test_concurrent_registrations_of_one_username(client):
+    name = f"user{uuid4().hex[:12]}"
+    payloads = [registration(name, f"{name}.{i}@example.com")
+                for i in range(CONCURRENT_REGISTRATIONS)]
+    responses = register_at_once(client, payloads)
+
+    assert_one_created(responses, "Username already taken")
+
+
+@pytest.mark.parametrize("email, password", [
+    ("nobody@example.com", "password123"),
+    (None, "wrong-password"),
+])
+def test_login_with_bad_credentials(client, user, email, password):
+    response = client.post("/api/auth/login", json={
+        "email": email or user["email"],
+        "password": password,
+    })
+
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Incorrect email or password"
+
+
+@pytest.mark.parametrize("details, message, field", [
+    ({"keyPattern": {"email": 1}}, "", "email"),
+    ({"keyValue": {"username": "alice"}}, "", "username"),
+    (None, "E11000 duplicate key error collection: users "
+           "index: email_1 dup key: { email: \"a@example.com\" }", "email"),
+    ({"keyPattern": {"title": 1}}, "index: title_1", None),
+])
+def test_duplicate_field(details, message, field):
+    exc = DuplicateKeyError(message, 11000, details)
+
+    assert duplicate_field(exc) == field
@@ -0,0 +1,116 @@
+"""Tests of the CRUD modules on the memory storage backend."""
+
+from uuid import uuid4
+
+from bson import ObjectId
+
+from crud.comments import create_comment, delete_comment, get_comments
+from crud.ideas import (
+    create_idea,
+    delete_idea,
+    get_idea,
+    get_idea_changes,
+    get_ideas_by_ids,
+    like_idea,
+    search_ideas,
+    unlike_idea,
+    update_idea,
+)
+from crud.user import get_user, get_users_by_ids, update_user
+from models.comment import CommentCreate, CommentFilter
+from models.idea import IdeaCreate, IdeaUpdate
+from models.user import UserUpdate
+
+
+def make_idea(run, user, **fields):
+    data = {
+        "title": f"Idea {uuid4().hex[:8]}",
+        "userId": user["id"],
+        "author": user["username"],
+        "description": "A description",
+        "links": [],
+        "wantedContributors": "Anyone",
+        **fields,
+    }
+
+    return run(create_idea, IdeaCreate.model_validate(data))
+
+
+def test_idea_lifecycle(run, user):
+    idea = make_idea(run, user)
+    idea_id = str(idea.id)
+
+    assert run(get_idea, idea_id).title == idea.title
+
+    updated = run(update_idea, idea_id, IdeaUpdate(title="Renamed"))
+    assert updated.title == "Renamed"
+    assert run(get_idea, idea_id).title == "Renamed"
+
+    assert run(delete_idea, idea_id)
+    assert run(get_idea, idea_id) is None
+    assert not run(delete_idea, idea_id)
+
+
+def test_invalid_ids_are_not_found(run):
+    assert run(get_idea, "not-an-id") is None
+    assert run(update_idea, "not-an-id", IdeaUpdate(title="x")) is None
+    assert run(get_user, "not-an-id") is None
+    assert run(get_ideas_by_ids, ["not-an-id", str(ObjectId())]) == {}
+
+
+def test_changes_follow_updates_and_deletes(run, user):
+    since = run(get_idea_changes, -1, 1000).version
+    kept = make_idea(run, user)
+    dropped = make_idea(run, user)
+    run(delete_idea, str(dropped.id))
+
+    changes = run(get_idea_changes, since, 1000)
+
+    assert [str(idea.id) for idea in changes.updated] == [str(kept.id)]
+    assert changes.deleted == [str(dropped.id)]
+    assert changes.version > since
+    assert run(get_idea_changes, changes.version, 1000).updated == []
+
+
+def test_likes_are_idempotent(run, user):
+    idea_id = str(make_idea(run, user).id)
+
+    run(like_idea, idea_id, user["id"])
+    liked = run(like_idea, idea_id, user["id"])
+    assert [str(like) for like in liked.liked_by_user] == [user["id"]]
+
+    unliked = run(unlike_idea, idea_id, user["id"])
+    assert unliked.liked_by_user == []
+    assert run(like_idea, str(ObjectId()), user["id"]) is None
+
+
+def test_search_finds_new_and_updated_ideas(run, user):
+    word = f"word{uuid4().hex[:8]}"
+    idea_id = str(make_idea(run, user, description=f"About {word}").id)
+
+    assert [str(idea.id) for idea in run(search_ideas, word)] == [idea_id]
+
+    run(update_idea, idea_id, IdeaUpdate(description="Something else"))
+    assert run(search_ideas, word) == []
+
+
+def test_comments_are_deleted_by_their_author(run, user):
+    idea_id = str(make_idea(run, user).id)
+    comment = run(create_comment, user["id"], user["username"],
+                  CommentCreate(idea_id=idea_id, content="Nice"))
+    filters = CommentFilter(idea_id=idea_id)
+
+    assert [c.content for c in run(get_comments, filters)] == ["Nice"]
+    assert not run(delete_comment, str(comment.id), str(ObjectId()))
+    assert run(delete_comment, str(comment.id), user["id"])
+    assert run(get_comments, filters) == []
+
+
+def test_username_change_reaches_ideas(run, user):
+    idea_id = str(make_idea(run, user).id)
+    username = f"renamed{uuid4().hex[:8]}"
+
+    run(update_user, user["id"], UserUpdate(username=username))
+
+    assert run(get_users_by_ids, [user["id"]])[user["id"]].username == username
+    assert run(get_idea, idea_id).author == username
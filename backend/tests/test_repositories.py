@@ -0,0 +1,182 @@
+"""Tests of the semantics the memory repositories share with MongoDB."""
+
+import asyncio
+
+import pytest
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from repositories.memory import (
+    MemoryCommentRepository,
+    MemoryCounterRepository,
+    MemoryIdeaRepository,
+    MemoryPropagationRepository,
+    MemoryUserRepository,
+)
+
+
+def test_users_reject_taken_email_and_username():
+    users = MemoryUserRepository()
+
+    async def scenario():
+        await users.insert({"email": "a@example.com", "username": "a"})
+
+        with pytest.raises(DuplicateKeyError):
+            await users.insert({"email": "a@example.com", "username": "b"})
+
+        with pytest.raises(DuplicateKeyError):
+            await users.insert({"email": "b@example.com", "username": "a"})
+
+        return await users.find({"username": "b"})
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_users_update_keeps_unique_indexes():
+    users = MemoryUserRepository()
+
+    async def scenario():
+        first = await users.insert({"email": "a@example.com", "username": "a"})
+        await users.insert({"email": "b@example.com", "username": "b"})
+
+        with pytest.raises(DuplicateKeyError):
+            await users.update(first, {"username": "b"})
+
+        updated = await users.update(first, {"username": "c"})
+        await users.insert({"email": "d@example.com", "username": "a"})
+
+        return updated, await users.find({"username": "c"})
+
+    updated, found = asyncio.run(scenario())
+
+    assert updated["username"] == "c"
+    assert [doc["_id"] for doc in found] == [updated["_id"]]
+
+
+def test_returned_documents_are_copies():
+    users = MemoryUserRepository()
+
+    async def scenario():
+        user_id = await users.insert({"email": "a@example.com",
+                                      "username": "a"})
+        doc = (await users.get_many([user_id]))[0]
+        doc["username"] = "changed"
+
+        return (await users.get_many([user_id]))[0]
+
+    assert asyncio.run(scenario())["username"] == "a"
+
+
+def test_nested_values_of_returned_documents_are_copies():
+    ideas = MemoryIdeaRepository(MemoryCounterRepository())
+    user_id = str(ObjectId())
+
+    async def scenario():
+        idea = await ideas.insert({"title": "idea", "likedByUser": [],
+                                   "links": [{"url": "https://a.example"}]})
+        liked, _ = await ideas.add_like(idea["_id"], user_id, 1.0, {})
+        liked["likedByUser"].append("intruder")
+        liked["likedAt"].clear()
+        liked["links"][0]["url"] = "changed"
+
+        return await ideas.get(idea["_id"])
+
+    stored = asyncio.run(scenario())
+
+    assert stored["likedByUser"] == [user_id]
+    assert list(stored["likedAt"]) == [user_id]
+    assert stored["links"] == [{"url": "https://a.example"}]
+
+
+def test_idea_changes_skip_replaced_versions():
+    ideas = MemoryIdeaRepository(MemoryCounterRepository())
+
+    async def scenario():
+        first = await ideas.insert({"title": "first", "syncVersion": 1})
+        second = await ideas.insert({"title": "second", "syncVersion": 2})
+        await ideas.update(first["_id"], {"title": "again", "syncVersion": 3})
+        await ideas.delete(second["_id"], {"syncVersion": 4})
+
+        return await ideas.changes_since(0, 10)
+
+    updated, deleted = asyncio.run(scenario())
+
+    assert [doc["title"] for doc in updated] == ["again"]
+    assert [doc["syncVersion"] for doc in deleted] == [4]
+
+
+def test_likes_are_counted_once():
+    ideas = MemoryIdeaRepository(MemoryCounterRepository())
+    user_id = str(ObjectId())
+
+    async def scenario():
+        idea = await ideas.insert({"title": "idea", "likedByUser": []})
+        results = []
+
+        for _ in range(2):
+            results.append(await ideas.add_like(idea["_id"], user_id, 1.0,
+                                                {}))
+
+        for _ in range(2):
+            results.append(await ideas.remove_like(idea["_id"], user_id, 1.0,
+                                                   {}))
+
+        return results
+
+    results = asyncio.run(scenario())
+
+    assert [modified for _, modified in results] == [True, False, True, False]
+    assert results[1][0]["likedByUser"] == [user_id]
+    assert results[-1][0]["likedByUser"] == []
+
+
+def test_comments_are_deleted_by_their_author_only():
+    comments = MemoryCommentRepository()
+    idea_id = str(ObjectId())
+    author = str(ObjectId())
+
+    async def scenario():
+        comment_id = await comments.insert({
+            "ideaId": idea_id,
+            "userId": author,
+            "content": "hello",
+        })
+        refused = await comments.delete_owned(comment_id, str(ObjectId()))
+        deleted = await comments.delete_owned(comment_id, author)
+
+        return refused, deleted, await comments.find({"ideaId": idea_id})
+
+    refused, deleted, remaining = asyncio.run(scenario())
+
+    assert refused is None
+    assert deleted["ideaId"] == idea_id
+    assert remaining == []
+
+
+def test_newer_rename_replaces_a_pending_propagation():
+    propagations = MemoryPropagationRepository()
+    user_id = str(ObjectId())
+    last_id = ObjectId()
+
+    async def scenario():
+        await propagations.start(user_id, "old")
+        await propagations.save_progress(user_id, "old", "ideas", last_id)
+        saved = await propagations.get(user_id)
+
+        await propagations.start(user_id, "new")
+        stale = await propagations.save_progress(user_id, "old", "ideas",
+                                                 last_id)
+        await propagations.finish(user_id, "old")
+        pending = await propagations.get(user_id)
+
+        await propagations.finish(user_id, "new")
+
+        return saved, stale, pending, await propagations.get(user_id)
+
+    saved, stale, pending, finished = asyncio.run(scenario())
+
+    assert saved["progress"] == {"ideas": last_id}
+    assert not stale
+    assert pending["username"] == "new" and pending["progress"] == {}
+    assert finished is None
@@ -0,0 +1,125 @@
+"""Tests of the API endpoints on the memory storage backend."""
+
+from bson import ObjectId
+
+
+def test_idea_endpoints(client, new_idea):
+    idea = new_idea()
+    path = f"/api/ideas/{idea['_id']}"
+
+    assert client.get(path).json()["title"] == idea["title"]
+
+    response = client.put(path, json={"title": "Renamed"})
+    assert response.status_code == 200
+    assert response.json()["title"] == "Renamed"
+
+    assert client.delete(path).status_code == 204
+    assert client.get(path).status_code == 404
+    assert client.delete(path).status_code == 404
+
+
+def test_idea_list_etag(client, new_idea):
+    new_idea()
+    response = client.get("/api/ideas/")
+    etag = response.headers["etag"]
+
+    assert response.status_code == 200
+    assert client.get("/api/ideas/",
+                      headers={"If-None-Match": etag}).status_code == 304
+
+    new_idea()
+    response = client.get("/api/ideas/", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_comment_endpoints(client, user, new_idea):
+    idea_id = new_idea()["_id"]
+    path = f"/api/comments/{idea_id}"
+    etag = client.get(path).headers["etag"]
+
+    response = client.post("/api/comments/", headers=user["headers"],
+                           json={"ideaId": idea_id, "content": "Nice"})
+    assert response.status_code == 201
+    comment_id = response.json()["_id"]
+
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert [c["content"] for c in response.json()] == ["Nice"]
+
+    assert client.delete(f"/api/comments/{comment_id}",
+                         headers=user["headers"]).status_code == 204
+    assert client.get(path).json() == []
+
+
+def test_comments_need_a_login(client, new_idea):
+    response = client.post("/api/comments/",
+                           json={"ideaId": new_idea()["_id"], "content": "x"})
+
+    assert response.status_code == 401
+
+
+def test_changes_are_paged(client, new_idea):
+    since = client.get("/api/ideas/changes").json()["version"]
+    created = {new_idea()["_id"] for _ in range(3)}
+
+    first = client.get("/api/ideas/changes",
+                       params={"since": since, "limit": 2}).json()
+    assert first["hasMore"]
+    assert len(first["updated"]) == 2
+
+    second = client.get("/api/ideas/changes",
+                        params={"since": first["version"]}).json()
+    assert not second["hasMore"]
+
+    received = {idea["_id"] for idea in first["updated"] + second["updated"]}
+    assert received == created
+
+
+def test_like_endpoints(client, user, new_idea):
+    idea_id = new_idea()["_id"]
+
+    response = client.put(f"/api/ideas/{idea_id}/like",
+                          headers=user["headers"])
+    assert response.json()["likedByUser"] == [user["id"]]
+
+    liked = client.get(f"/api/ideas/liked/{user['id']}").json()
+    assert [idea["_id"] for idea in liked] == [idea_id]
+
+    response = client.put(f"/api/ideas/{idea_id}/unlike",
+                          headers=user["headers"])
+    assert response.json()["likedByUser"] == []
+
+    response = client.put(f"/api/ideas/{ObjectId()}/like",
+                          headers=user["headers"])
+    assert response.status_code == 404
+
+
+def test_user_batch_is_public(client, user):
+    missing = str(ObjectId())
+    response = client.post("/api/users/batch", headers=user["headers"],
+                           json={"ids": [user["id"], missing]})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        user["id"]: {
+            "_id": user["id"],
+            "username": user["username"],
+            "name": user["name"],
+            "surname": user["surname"],
+        },
+    }
+
+
+def test_registration_rejects_taken_username(client, user):
+    response = client.post("/api/auth/register", json={
+        "username": user["username"],
+        "email": "other@example.com",
+        "password": "password123",
+        "name": "Other",
+        "surname": "User",
+    })
+
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Username already taken"
@@ -0,0 +1,76 @@
+"""Tests of the ETags of the listings when writes interleave with loads."""
+
+import asyncio
+
+from starlette.requests import Request
+from uuid import uuid4
+
+from crud import ideas as crud_ideas
+from crud.ideas import create_idea, get_all_ideas_trusted, like_idea
+from internals.serialization import dumps
+from internals.versions import IDEAS_SCOPE, versioned_response, versions
+from models.idea import IdeaCreate
+
+
+def make_request(etag=None):
+    headers = [] if etag is None else [(b"if-none-match", etag.encode())]
+
+    return Request({"type": "http", "method": "GET", "headers": headers})
+
+
+def idea_data(user):
+    return IdeaCreate.model_validate({
+        "title": f"Idea {uuid4().hex[:8]}",
+        "userId": user["id"],
+        "author": user["username"],
+        "description": "A description",
+        "links": [],
+        "wantedContributors": "Anyone",
+    })
+
+
+def test_list_loaded_during_a_write_is_not_tagged_newer(run, user,
+                                                        monkeypatch):
+    insert = crud_ideas.ideas.insert
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow_insert(doc):
+        started.set()
+        await release.wait()
+
+        return await insert(doc)
+
+    monkeypatch.setattr(crud_ideas.ideas, "insert", slow_insert)
+
+    async def scenario():
+        writer = asyncio.create_task(create_idea(idea_data(user)))
+        await started.wait()
+
+        # The list is loaded while the write is reserved but not stored.
+        stale = await versioned_response(make_request(), IDEAS_SCOPE,
+                                         get_all_ideas_trusted, dumps)
+        release.set()
+        created = await writer
+
+        fresh = await versioned_response(make_request(stale.headers["etag"]),
+                                         IDEAS_SCOPE, get_all_ideas_trusted,
+                                         dumps)
+
+        return str(created.id), stale, fresh
+
+    idea_id, stale, fresh = run(scenario)
+
+    assert idea_id.encode() not in stale.body
+    assert fresh.status_code == 200
+    assert idea_id.encode() in fresh.body
+
+
+def test_repeated_like_keeps_the_list_version(run, user):
+    idea_id = str(run(create_idea, idea_data(user)).id)
+
+    run(like_idea, idea_id, user["id"])
+    version = run(versions.version, IDEAS_SCOPE)
+    run(like_idea, idea_id, user["id"])
+
+    assert run(versions.version, IDEAS_SCOPE) == version
@@ -23,6 +23,7 @@
                 email-validator
                 fastapi
                 httptools
+                orjson
                 pwdlib
                 pydantic
                 pyjwt
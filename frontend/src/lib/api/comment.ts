@@ -1,4 +1,4 @@
-import type { Comment, CommentFilter } from "$lib/models/comment";
+import type { Comment, CommentFilter, CommentSummary } from "$lib/models/comment";
 import { getTokens } from "./token";
 
 /**
@@ -70,6 +70,40 @@ export async function getComments(ideaId: string): Promise<Comment[] | Error> {
   }
 }
 
+/**
+ * Fetches comment counts, and optionally the newest comments, for many ideas
+ * in a single request.
+ *
+ * @param {string[]} ideaIds - The IDs of the ideas to summarize.
+ * @param {number} latest - How many of the newest comments to include per idea.
+ * @returns {Promise<CommentSummary[] | Error>}
+ * Resolves with one summary per idea on success, or an Error on failure.
+ */
+export async function getCommentSummaries(ideaIds: string[], latest: number = 0): Promise<CommentSummary[] | Error> {
+  const params = new URLSearchParams();
+
+  ideaIds.forEach(id => params.append('ids', id));
+  params.append('latest', latest.toString());
+
+  try {
+    const response = await fetch(`${API_ENDPOINT}/summary?${params}`, {
+      method: 'GET',
+      headers: {
+        'Accept': 'application/json'
+      }
+    });
+
+    if (response.ok) {
+      return await response.json();
+    }
+
+    const error = await response.text();
+    return new Error(`Server error (${response.status}): ${error}`);
+  } catch (e) {
+    return new Error("Connection error");
+  }
+}
+
 /**
  * Deletes a comment by its ID.
  *
@@ -0,0 +1,66 @@
+import type { IdeaEvent } from "$lib/models/event";
+
+/**
+ * WebSocket endpoint streaming realtime idea and comment updates.
+ */
+const WS_ENDPOINT = "ws://localhost:8000/api/events/ws";
+
+/**
+ * Handle of an open event subscription.
+ */
+export interface EventSubscription {
+  /** Starts receiving the events of more ideas. */
+  subscribe: (ideaIds: string[]) => void;
+  /** Stops receiving the events of the ideas. */
+  unsubscribe: (ideaIds: string[]) => void;
+  /** Closes the connection. */
+  close: () => void;
+}
+
+/**
+ * Opens a WebSocket receiving likes, edits and comments of the given ideas.
+ *
+ * Events are delivered in small batches. When the connection is closed by
+ * the server, e.g. because the client fell behind, `onClose` is called and
+ * the data should be fetched again before resubscribing.
+ *
+ * @param {string[]} ideaIds - The IDs of the ideas to follow.
+ * @param {(events: IdeaEvent[]) => void} onEvents - Called with every batch.
+ * @param {() => void} [onClose] - Called when the connection is closed.
+ * @returns {EventSubscription} Handle to change the followed ideas.
+ */
+export function subscribeToIdeas(
+  ideaIds: string[],
+  onEvents: (events: IdeaEvent[]) => void,
+  onClose?: () => void
+): EventSubscription {
+  const socket = new WebSocket(WS_ENDPOINT);
+  const send = (message: object) => {
+    if (socket.readyState === WebSocket.OPEN) {
+      socket.send(JSON.stringify(message));
+    }
+  };
+  const followed = new Set(ideaIds);
+
+  socket.onopen = () => send({ subscribe: [...followed] });
+  socket.onmessage = (message) => {
+    const data = JSON.parse(message.data);
+
+    if (Array.isArray(data)) {
+      onEvents(data);
+    }
+  };
+  socket.onclose = () => onClose?.();
+
+  return {
+    subscribe: (ids) => {
+      ids.forEach((id) => followed.add(id));
+      send({ subscribe: ids });
+    },
+    unsubscribe: (ids) => {
+      ids.forEach((id) => followed.delete(id));
+      send({ unsubscribe: ids });
+    },
+    close: () => socket.close(),
+  };
+}
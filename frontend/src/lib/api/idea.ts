@@ -60,6 +60,91 @@ export async function getIdeas(): Promise<IdeaGet[] | Error> {
   }
 }
 
+/**
+ * Searches ideas by their title, description and long description.
+ *
+ * @param {string} query - The free text query.
+ * @param {number} limit - Maximum number of returned ideas.
+ * @returns {Promise<IdeaGet[] | Error>}
+ * Resolves with the matching ideas, best match first, or an Error on failure.
+ */
+export async function searchIdeas(query: string, limit: number = 20): Promise<IdeaGet[] | Error> {
+  const params = new URLSearchParams({ q: query, limit: limit.toString() });
+
+  try {
+    const response = await fetch(`${API_ENDPOINT}/search?${params}`, {
+      method: 'GET',
+      headers: {
+        'Accept': 'application/json'
+      },
+    });
+
+    if (response.ok) {
+      return await response.json();
+    }
+
+    const error = await response.text();
+    return new Error(`Server error (${response.status}): ${error}`);
+  } catch (e) {
+    return new Error("Connection error");
+  }
+}
+
+/**
+ * Fetches the trending ideas, ranked by recent likes and comments.
+ *
+ * @param {number} limit - Maximum number of returned ideas.
+ * @returns {Promise<IdeaGet[] | Error>}
+ * Resolves with the trending ideas, hottest first, or an Error on failure.
+ */
+export async function getTrendingIdeas(limit: number = 20): Promise<IdeaGet[] | Error> {
+  try {
+    const response = await fetch(`${API_ENDPOINT}/trending?limit=${limit}`, {
+      method: 'GET',
+      headers: {
+        'Accept': 'application/json'
+      },
+    });
+
+    if (response.ok) {
+      return await response.json();
+    }
+
+    const error = await response.text();
+    return new Error(`Server error (${response.status}): ${error}`);
+  } catch (e) {
+    return new Error("Connection error");
+  }
+}
+
+/**
+ * Fetches many ideas with a single request.
+ *
+ * @param {string[]} ids - The IDs of the ideas.
+ * @returns {Promise<Record<string, IdeaGet> | Error>}
+ * Resolves with the found ideas keyed by ID, or an Error on failure.
+ */
+export async function getIdeasBatch(ids: string[]): Promise<Record<string, IdeaGet> | Error> {
+  try {
+    const response = await fetch(`${API_ENDPOINT}/batch`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json'
+      },
+      body: JSON.stringify({ ids })
+    });
+
+    if (response.ok) {
+      return await response.json();
+    }
+
+    const error = await response.text();
+    return new Error(`Server error (${response.status}): ${error}`);
+  } catch (e) {
+    return new Error("Connection error");
+  }
+}
+
 /**
  * Fetches a single idea by its ID.
  *
@@ -0,0 +1,61 @@
+import type { Suggestion } from "$lib/models/suggestion";
+
+/**
+ * Base API endpoint for autocomplete suggestions.
+ */
+const API_ENDPOINT = "http://localhost:8000/api/suggest";
+
+/**
+ * Fetches suggestions of the given kind for the typed prefix.
+ *
+ * @param {'ideas' | 'users'} kind - Whether to suggest idea titles or usernames.
+ * @param {string} prefix - The typed text.
+ * @param {number} limit - Maximum number of suggestions.
+ * @returns {Promise<Suggestion[] | Error>}
+ * Resolves with the suggestions, most popular first, or an Error on failure.
+ */
+async function suggest(kind: 'ideas' | 'users', prefix: string, limit: number): Promise<Suggestion[] | Error> {
+  const params = new URLSearchParams({ q: prefix, limit: limit.toString() });
+
+  try {
+    const response = await fetch(`${API_ENDPOINT}/${kind}?${params}`, {
+      method: 'GET',
+      headers: {
+        'Accept': 'application/json'
+      },
+    });
+
+    if (response.ok) {
+      return await response.json();
+    }
+
+    const error = await response.text();
+    return new Error(`Server error (${response.status}): ${error}`);
+  } catch (e) {
+    return new Error("Connection error");
+  }
+}
+
+/**
+ * Suggests idea titles that contain a word starting with the prefix.
+ *
+ * @param {string} prefix - The typed text.
+ * @param {number} limit - Maximum number of suggestions.
+ * @returns {Promise<Suggestion[] | Error>}
+ * Resolves with the most liked matching ideas, or an Error on failure.
+ */
+export async function suggestIdeas(prefix: string, limit: number = 10): Promise<Suggestion[] | Error> {
+  return suggest('ideas', prefix, limit);
+}
+
+/**
+ * Suggests usernames that start with the prefix.
+ *
+ * @param {string} prefix - The typed text.
+ * @param {number} limit - Maximum number of suggestions.
+ * @returns {Promise<Suggestion[] | Error>}
+ * Resolves with the most active matching users, or an Error on failure.
+ */
+export async function suggestUsers(prefix: string, limit: number = 10): Promise<Suggestion[] | Error> {
+  return suggest('users', prefix, limit);
+}
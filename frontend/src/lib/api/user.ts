@@ -1,12 +1,17 @@
 import type { TokenPair } from "$lib/models/token";
 import type { UserCreate, UserGet, UserLogin } from "$lib/models/user";
-import { setTokens } from "./token";
+import { getTokens, setTokens } from "./token";
 
 /**
  * Base API route for authentication endpoints.
  */
 const API_ROUTE = "http://localhost:8000/api/auth";
 
+/**
+ * Base API route for user endpoints.
+ */
+const USERS_ROUTE = "http://localhost:8000/api/users";
+
 /**
  * Authenticates a user and retrieves an access/refresh token pair.
  *
@@ -65,3 +70,40 @@ export async function register(user: UserCreate): Promise<UserGet | Error> {
     return new Error("Connection error.");
   }
 }
+
+/**
+ * Fetches many users with a single request, e.g. the authors of a list of ideas.
+ *
+ * Requires a valid access token for authentication.
+ *
+ * @param {string[]} ids - The IDs of the users.
+ * @returns {Promise<Record<string, UserGet> | Error>}
+ * Resolves with the found users keyed by ID, or an Error on failure.
+ */
+export async function getUsersBatch(ids: string[]): Promise<Record<string, UserGet> | Error> {
+  const tokens = getTokens();
+
+  if (!tokens) {
+    return new Error("No tokens");
+  }
+
+  try {
+    const response = await fetch(`${USERS_ROUTE}/batch`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Authorization': `Bearer ${tokens.accessToken}`
+      },
+      body: JSON.stringify({ ids })
+    });
+
+    if (response.ok) {
+      return await response.json();
+    }
+
+    const error = await response.text();
+    return new Error(`Server error (${response.status}): ${error}`);
+  } catch (e) {
+    return new Error("Connection error");
+  }
+}
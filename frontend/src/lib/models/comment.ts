@@ -20,4 +20,9 @@ export interface CommentFilter {
   content?: string;
   createdAt?: number;
   replies?: Comment[];
-}
\ No newline at end of file
+}
+export interface CommentSummary {
+  ideaId: string;
+  count: number;
+  latest: Comment[];
+}
@@ -0,0 +1,9 @@
+import type { Comment } from "./comment";
+import type { Idea } from "./idea";
+
+export type IdeaEvent =
+  | { type: 'likes'; ideaId: string; likes: number }
+  | { type: 'idea'; ideaId: string; changes: Partial<Idea> }
+  | { type: 'idea_deleted'; ideaId: string }
+  | { type: 'comment'; ideaId: string; comment: Comment }
+  | { type: 'comment_deleted'; ideaId: string; commentId: string };
@@ -0,0 +1,4 @@
+export interface Suggestion {
+  id: string;
+  label: string;
+}